@@ -1,24 +1,25 @@
 from django.http import HttpResponseRedirect
 from django.urls import reverse
+from django.utils.deprecation import MiddlewareMixin
 
 
-class EmailConfirmationMiddleware:
+class EmailConfirmationMiddleware(MiddlewareMixin):
     """
     Middleware для проверки подтверждения email.
     Перенаправляет пользователей с неподтвержденным email на страницу с уведомлением.
+    MiddlewareMixin работает и в синхронном, и в асинхронном режиме: под ASGI
+    цепочка middleware остается асинхронной и асинхронные представления /api/
+    не занимают поток на весь запрос.
     """
 
-    def __init__(self, get_response):
-        self.get_response = get_response
-
-    def __call__(self, request):
-        response = self.get_response(request)
-        return response
-
     def process_view(self, request, view_func, view_args, view_kwargs):
-        if (not request.user.is_authenticated or
-                request.path.startswith('/admin/') or
-                request.path.startswith('/api/')):
+        # Путь проверяется до request.user: пользователь загружается из
+        # сессии запросом к БД, а /api/ должен отвечать 304 без запросов.
+        # Клиенту API нужен JSON, а не редирект на профиль, поэтому
+        # представления /api/ проверяют подтверждение email сами (403)
+        if (request.path.startswith('/admin/') or
+                request.path.startswith('/api/') or
+                not request.user.is_authenticated):
             return None
 
         if (hasattr(request.user, 'profile') and
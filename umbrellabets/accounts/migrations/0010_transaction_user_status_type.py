@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_notification'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'status', 'transaction_type'], name='transaction_user_status_type'),
+        ),
+    ]
@@ -257,6 +257,10 @@ class Transaction(models.Model):
         verbose_name = "Транзакция"
         verbose_name_plural = "Транзакции"
         ordering = ['-created_at']
+        indexes = [
+            # Ожидающие бонусы пользователя при подтверждении email
+            models.Index(fields=['user', 'status', 'transaction_type'], name='transaction_user_status_type'),
+        ]
 
     def __str__(self):
         return f"{self.transaction_id} - {self.get_transaction_type_display()} {self.amount}"
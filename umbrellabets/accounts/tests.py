@@ -1,3 +1,11 @@
-from django.test import TestCase
+from django.core.handlers.asgi import ASGIHandler
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+
+class EmailConfirmationMiddlewareTests(TestCase):
+    @override_settings(DEBUG=True)
+    def test_asgi_chain_is_not_adapted(self):
+        # Синхронная middleware в асинхронной цепочке записала бы в django.request
+        # "... handler adapted for middleware ...", а /api/ занимал бы поток
+        with self.assertNoLogs('django.request', level='DEBUG'):
+            ASGIHandler()
@@ -4,7 +4,11 @@ from django.urls import reverse, path
 from django.contrib import messages
 from django.http import HttpResponseRedirect
 from django.shortcuts import render
-from .models import Sport, Match, Bookmaker, Odds, Bet
+from django.db.models import OuterRef, Subquery
+from .models import Sport, Match, Bookmaker, Odds, Bet, SettlementJob, PlatformCounter
+from .services.settlement import SettlementQueue, SettlementService
+from .services.odds_analytics import odds_analytics
+from .services.versions import BOARD_VERSION, bump_version_on_commit
 
 
 @admin.register(Sport)
@@ -56,7 +60,8 @@ class BetInline(admin.TabularInline):
 class MatchAdmin(admin.ModelAdmin):
     list_display = [
         'match_title', 'sport', 'commence_time_formatted',
-        'status_colored', 'result_colored', 'bets_count', 'actions_column'
+        'status_colored', 'result_colored', 'overround', 'bets_count', 'settlement_progress',
+        'actions_column'
     ]
     list_filter = ['sport', 'status', 'result', 'commence_time']
     search_fields = ['home_team', 'away_team', 'api_id']
@@ -125,6 +130,15 @@ class MatchAdmin(admin.ModelAdmin):
 
     result_colored.short_description = 'Результат'
 
+    def overround(self, obj):
+        # Метрики всей линии считаются один раз на версию синхронизации
+        analytics = odds_analytics.get(obj.id)
+        if not analytics or analytics['overround'] is None:
+            return '-'
+        return f"{analytics['overround']}% / {analytics['best_overround']}%"
+
+    overround.short_description = 'Маржа (средняя / лучшая)'
+
     def bets_count(self, obj):
         count = obj.bets.count()
         if count > 0:
@@ -147,57 +161,63 @@ class MatchAdmin(admin.ModelAdmin):
 
     actions_column.short_description = 'Действия'
 
-    def finish_match_home(self, request, queryset):
-        """Завершить матчи победой хозяев"""
-        count = 0
-        for match in queryset:
-            if match.status != 'completed':
-                success, message = match.finish_match('home')
-                if success:
-                    count += 1
-                    self.message_user(request, f"Матч {match} завершен победой хозяев. {message}")
-                else:
-                    self.message_user(request, f"Ошибка в матче {match}: {message}", level=messages.ERROR)
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        last_job = SettlementJob.objects.filter(match=OuterRef('pk')).order_by('-created_at', '-id')
+        return queryset.annotate(
+            settlement_status=Subquery(last_job.values('status')[:1]),
+            settlement_message=Subquery(last_job.values('message')[:1]),
+        )
+
+    def settlement_progress(self, obj):
+        status = getattr(obj, 'settlement_status', None)
+        if not status:
+            return format_html('<span style="color: #94a3b8;">—</span>')
 
+        colors = {
+            'queued': '#94a3b8',
+            'running': '#f59e42',
+            'done': '#10b981',
+            'failed': '#ef4444'
+        }
+        labels = dict(SettlementJob.STATUS_CHOICES)
+        return format_html(
+            '<span style="color: {}; font-weight: bold;" title="{}">{}</span>',
+            colors.get(status, '#64748b'),
+            obj.settlement_message or '',
+            labels.get(status, status)
+        )
+
+    settlement_progress.short_description = 'Расчет'
+
+    def _enqueue_settlement(self, request, queryset, result):
+        """Поставить матчи в очередь расчета, расчет выполняют воркеры"""
+        count = SettlementQueue().enqueue(queryset, result)
         if count > 0:
-            self.message_user(request, f"Завершено {count} матчей победой хозяев")
+            self.message_user(
+                request,
+                f"Поставлено в очередь расчета {count} матчей. "
+                f"Прогресс отображается в колонке «Расчет»"
+            )
+        else:
+            self.message_user(request, "Нет матчей для расчета", level=messages.WARNING)
+
+    def finish_match_home(self, request, queryset):
+        """Завершить матчи победой хозяев"""
+        self._enqueue_settlement(request, queryset, 'home')
 
     finish_match_home.short_description = "🏠 Завершить победой хозяев"
 
     def finish_match_away(self, request, queryset):
         """Завершить матчи победой гостей"""
-        count = 0
-        for match in queryset:
-            if match.status != 'completed':
-                success, message = match.finish_match('away')
-                if success:
-                    count += 1
-                    self.message_user(request, f"Матч {match} завершен победой гостей. {message}")
-                else:
-                    self.message_user(request, f"Ошибка в матче {match}: {message}", level=messages.ERROR)
-
-        if count > 0:
-            self.message_user(request, f"Завершено {count} матчей победой гостей")
+        self._enqueue_settlement(request, queryset, 'away')
 
     finish_match_away.short_description = "✈️ Завершить победой гостей"
 
     def cancel_match(self, request, queryset):
         """Отменить матчи"""
-        count = 0
-        for match in queryset:
-            if match.status != 'completed':
-                success, message = match.finish_match('cancelled')
-                if success:
-                    count += 1
-                    # При отмене вернуть деньги
-                    for bet in match.bets.filter(status='pending'):
-                        bet.status = 'cancelled'
-                        bet.save()
-                        bet.user.profile.balance += bet.amount
-                        bet.user.profile.save()
-
-        if count > 0:
-            self.message_user(request, f"Отменено {count} матчей, деньги возвращены")
+        # Возврат денег выполняется при расчете ставок
+        self._enqueue_settlement(request, queryset, 'cancelled')
 
     cancel_match.short_description = "❌ Отменить матчи"
 
@@ -229,19 +249,21 @@ class MatchAdmin(admin.ModelAdmin):
                 return HttpResponseRedirect(reverse('admin:matches_match_changelist'))
 
         # Статистика ставок
-        pending_bets = match.bets.filter(status='pending')
-        home_bets = pending_bets.filter(outcome='home')
-        away_bets = pending_bets.filter(outcome='away')
+        preview = SettlementService().preview(match)
+        home = preview['outcomes']['home']
+        away = preview['outcomes']['away']
 
         context = {
             'match': match,
-            'pending_bets_count': pending_bets.count(),
-            'home_bets_count': home_bets.count(),
-            'away_bets_count': away_bets.count(),
-            'home_total_amount': sum(bet.amount for bet in home_bets),
-            'away_total_amount': sum(bet.amount for bet in away_bets),
-            'home_potential_payout': sum(bet.potential_win for bet in home_bets),
-            'away_potential_payout': sum(bet.potential_win for bet in away_bets),
+            'pending_bets_count': preview['pending_count'],
+            'home_bets_count': home['count'],
+            'away_bets_count': away['count'],
+            'home_total_amount': home['stake'],
+            'away_total_amount': away['stake'],
+            'home_potential_payout': home['payout'],
+            'away_potential_payout': away['payout'],
+            'total_stake': preview['total_stake'],
+            'house_pnl': preview['house_pnl'],
         }
 
         return render(request, 'admin/matches/finish_match.html', context)
@@ -292,6 +314,25 @@ class OddsAdmin(admin.ModelAdmin):
     last_update_formatted.short_description = 'Обновлено'
 
 
+@admin.register(PlatformCounter)
+class PlatformCounterAdmin(admin.ModelAdmin):
+    list_display = ['name', 'value', 'updated_at']
+    readonly_fields = ['name', 'value', 'updated_at']
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(SettlementJob)
+class SettlementJobAdmin(admin.ModelAdmin):
+    list_display = ['match', 'result', 'status', 'worker', 'created_at', 'started_at', 'finished_at']
+    list_filter = ['status', 'result']
+    search_fields = ['match__home_team', 'match__away_team']
+    readonly_fields = ['match', 'result', 'status', 'message', 'worker', 'created_at', 'started_at', 'finished_at']
+    list_select_related = ['match']
+    ordering = ['-created_at']
+
+
 @admin.register(Bet)
 class BetAdmin(admin.ModelAdmin):
     list_display = [
@@ -396,10 +437,12 @@ admin.site.index_title = "Управление платформой"
 @admin.action(description='Отметить матчи как завершенные')
 def mark_completed(modeladmin, request, queryset):
     queryset.update(status='completed')
+    bump_version_on_commit(BOARD_VERSION)
 
 @admin.action(description='Отметить матчи как предстоящие')
 def mark_upcoming(modeladmin, request, queryset):
     queryset.update(status='upcoming')
+    bump_version_on_commit(BOARD_VERSION)
 
 @admin.action(description='Активировать букмекеров')
 def activate_bookmakers(modeladmin, request, queryset):
@@ -410,6 +453,9 @@ def deactivate_bookmakers(modeladmin, request, queryset):
     queryset.update(active=False)
 
 # Добавить действия к админкам
-MatchAdmin.actions = [mark_completed, mark_upcoming]
+MatchAdmin.actions = [
+    'finish_match_home', 'finish_match_away', 'cancel_match',
+    mark_completed, mark_upcoming
+]
 BookmakerAdmin.actions = [activate_bookmakers, deactivate_bookmakers]
 
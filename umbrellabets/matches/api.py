@@ -0,0 +1,246 @@
+"""
+Асинхронный JSON API для ставок, баланса и чтения матчей.
+Рассчитан на запуск под ASGI-сервером (umbrellabets.asgi): медленные
+клиенты ждут ответа в event loop, не занимая рабочий поток каждый.
+Работа с БД по-прежнему синхронная и выполняется через sync_to_async.
+
+Чтение матчей (для виджетов партнеров) поддерживает условные запросы:
+ETag зависит только от версий синхронизации и доски в кеше и от
+интервала времени длиной API_CACHE_MAX_AGE, поэтому на If-None-Match
+с неизменившимися данными ответ 304 отдается без обращения к БД.
+"""
+import hashlib
+import json
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponseNotModified, JsonResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_cache_control
+from accounts.models import UserProfile
+from .models import Match
+from .services.betting import BetPlacementService, BetPlacementError
+from .services.board import match_board
+from .services.match_detail import MatchDetail
+from .services.versions import SYNC_VERSION, BOARD_VERSION, get_version
+
+
+def _authenticated_user(request):
+    user = request.user
+    return user if user.is_authenticated else None
+
+
+async def _get_user(request):
+    # request.user загружается лениво из сессии - это синхронный запрос к БД
+    return await sync_to_async(_authenticated_user)(request)
+
+
+def _unauthorized():
+    return JsonResponse({'error': "Требуется авторизация"}, status=401)
+
+
+def _email_not_confirmed():
+    return JsonResponse({'error': "Подтвердите email, чтобы делать ставки"}, status=403)
+
+
+def _method_not_allowed():
+    return JsonResponse({'error': "Метод не поддерживается"}, status=405)
+
+
+async def balance(request):
+    """Текущий баланс пользователя"""
+    if request.method != 'GET':
+        return _method_not_allowed()
+
+    user = await _get_user(request)
+    if user is None:
+        return _unauthorized()
+
+    current_balance = await UserProfile.objects.filter(user=user).values_list(
+        'balance', flat=True
+    ).aget()
+
+    # Выдать CSRF-cookie для последующих POST-запросов клиента
+    get_token(request)
+    return JsonResponse({'balance': str(current_balance)})
+
+
+async def place_bet(request):
+    """
+    Размещение ставки или купона.
+    Тело запроса: {"match_id": 1, "outcome": "home", "amount": "100"}
+    или {"selections": [{"match_id": 1, "outcome": "home", "amount": "100"}, ...]}
+    Проверки и лимиты те же, что у формы place_bet (BET_SETTINGS).
+    """
+    if request.method != 'POST':
+        return _method_not_allowed()
+
+    user = await _get_user(request)
+    if user is None:
+        return _unauthorized()
+
+    # EmailConfirmationMiddleware не перенаправляет /api/ на профиль,
+    # поэтому подтверждение email проверяется здесь, как у формы ставки
+    if not await UserProfile.objects.filter(user=user, email_confirmed=True).aexists():
+        return _email_not_confirmed()
+
+    try:
+        payload = json.loads(request.body)
+        selections = payload.get('selections', [payload])
+    except (ValueError, AttributeError):
+        selections = None
+
+    if not isinstance(selections, list):
+        return JsonResponse({'error': "Некорректные данные ставки"}, status=400)
+
+    try:
+        bets = await sync_to_async(BetPlacementService().place_slip)(user, selections)
+    except BetPlacementError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    current_balance = await UserProfile.objects.filter(user=user).values_list(
+        'balance', flat=True
+    ).aget()
+
+    return JsonResponse({
+        'bets': [
+            {
+                'id': bet.id,
+                'match_id': bet.match_id,
+                'outcome': bet.outcome,
+                'amount': str(bet.amount),
+                'odds': str(bet.odds),
+                'potential_win': str(bet.potential_win),
+            }
+            for bet in bets
+        ],
+        'balance': str(current_balance),
+    }, status=201)
+
+
+def _etag(request):
+    """
+    Сильный ETag ответа: версии данных, полный путь с параметрами и номер
+    интервала времени. Список status=upcoming меняется со временем и без смены
+    версий (начавшиеся матчи выпадают из него), поэтому ETag живет не дольше
+    max-age ответа
+    """
+    bucket = int(time.time()) // max(1, settings.BET_SETTINGS.get('API_CACHE_MAX_AGE', 5))
+    versions = f'{get_version(SYNC_VERSION)}:{get_version(BOARD_VERSION)}:{bucket}:{request.get_full_path()}'
+    return '"%s"' % hashlib.md5(versions.encode()).hexdigest()
+
+
+def _not_modified(request, etag):
+    if_none_match = request.headers.get('If-None-Match', '')
+    return any(tag.strip() in (etag, '*') for tag in if_none_match.split(','))
+
+
+def _cacheable(response, etag):
+    response['ETag'] = etag
+    max_age = settings.BET_SETTINGS.get('API_CACHE_MAX_AGE', 5)
+    patch_cache_control(response, public=True, max_age=max_age, s_maxage=max_age)
+    return response
+
+
+def _prices(best_odds):
+    return [
+        {
+            'outcome': odds['outcome'],
+            'price': str(odds['price']),
+            'probability': odds['probability'],
+            'consensus': odds['consensus'],
+        }
+        for odds in best_odds
+    ]
+
+
+def _match_json(entry):
+    return {
+        'id': entry['id'],
+        'home_team': entry['home_team'],
+        'away_team': entry['away_team'],
+        'commence_time': entry['commence_time'].isoformat(),
+        'best_odds': _prices(entry['best_odds']),
+    }
+
+
+def _matches_page(sport_key, status, after):
+    page = match_board.page(
+        sport_key, after=after, status=status, size=settings.BET_SETTINGS.get('API_PAGE_SIZE', 100)
+    )
+
+    # Группировка по виду спорта, как на доске matches_list
+    sports = {}
+    for entry in page['matches']:
+        sport = entry['sport']
+        if sport['key'] not in sports:
+            sports[sport['key']] = dict(sport, matches=[])
+        sports[sport['key']]['matches'].append(_match_json(entry))
+
+    return {'sports': list(sports.values()), 'next': page['next']}
+
+
+def _match_detail(match_id):
+    detail = MatchDetail(match_id)
+    match = detail.match
+    return {
+        'id': match.id,
+        'sport': {'key': match.sport.key, 'title': match.sport.title},
+        'home_team': match.home_team,
+        'away_team': match.away_team,
+        'commence_time': match.commence_time.isoformat(),
+        'status': match.status,
+        'result': match.result,
+        'best_odds': _prices(detail.best_odds),
+        'overround': detail.analytics.get('overround'),
+        'odds': [
+            {
+                'bookmaker': odds.bookmaker.key,
+                'outcome': odds.outcome,
+                'price': str(odds.price),
+                'last_update': odds.last_update.isoformat(),
+            }
+            for odds in detail.odds
+        ],
+    }
+
+
+async def matches(request):
+    """
+    Матчи по виду спорта и статусу: ?sport=cs-go&status=upcoming&after=<курсор>.
+    Страницы по (commence_time, id), курсор следующей страницы - в поле next
+    """
+    if request.method != 'GET':
+        return _method_not_allowed()
+
+    status = request.GET.get('status', 'upcoming')
+    if status not in dict(Match.STATUS_CHOICES):
+        return JsonResponse({'error': "Некорректный статус"}, status=400)
+
+    etag = await sync_to_async(_etag)(request)
+    if _not_modified(request, etag):
+        return _cacheable(HttpResponseNotModified(), etag)
+
+    try:
+        data = await sync_to_async(_matches_page)(request.GET.get('sport'), status, request.GET.get('after'))
+    except ValueError:
+        return JsonResponse({'error': "Некорректный курсор"}, status=400)
+
+    return _cacheable(JsonResponse(data), etag)
+
+
+async def match_detail(request, match_id):
+    """Матч с лучшими ценами и коэффициентами всех букмекеров"""
+    if request.method != 'GET':
+        return _method_not_allowed()
+
+    etag = await sync_to_async(_etag)(request)
+    if _not_modified(request, etag):
+        return _cacheable(HttpResponseNotModified(), etag)
+
+    try:
+        data = await sync_to_async(_match_detail)(match_id)
+    except Http404:
+        return JsonResponse({'error': "Матч не найден"}, status=404)
+
+    return _cacheable(JsonResponse(data), etag)
@@ -0,0 +1,11 @@
+from django.urls import path
+from . import api
+
+app_name = 'matches_api'
+
+urlpatterns = [
+    path('balance/', api.balance, name='balance'),
+    path('bets/', api.place_bet, name='place_bet'),
+    path('matches/', api.matches, name='matches'),
+    path('matches/<int:match_id>/', api.match_detail, name='match_detail'),
+]
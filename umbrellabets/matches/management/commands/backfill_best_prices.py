@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from matches.services.best_prices import backfill_best_prices
+from matches.services.versions import SYNC_VERSION, BOARD_VERSION, bump_version_on_commit
+
+
+class Command(BaseCommand):
+    help = 'Заполнить колонки лучших цен матчей по существующим коэффициентам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Матчей в одном UPDATE')
+
+    def handle(self, *args, **options):
+        updated = backfill_best_prices(options['batch_size'])
+        # Лучшие цены читают и индекс цен (SYNC_VERSION), и доска матчей (BOARD_VERSION)
+        bump_version_on_commit(SYNC_VERSION, BOARD_VERSION)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Лучшие цены пересчитаны для {updated} матчей'))
@@ -0,0 +1,74 @@
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from matches.models import Sport
+from matches.replay import ReplayServer, pandascore_corpus
+from matches.services.ingestion import IngestionService
+from matches.services.pandascore_service import PandaScoreService
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер загрузки предстоящих матчей PandaScore: один запрос на весь список '
+        'против постраничной потоковой загрузки (stream: следующая страница '
+        'загружается, пока пишется текущая). Ответы отдает локальный ReplayServer, '
+        'записи в БД откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--matches', type=int, default=5000, help='Размер набора матчей')
+        parser.add_argument('--per-page', type=int, default=PandaScoreService.PAGE_SIZE)
+        parser.add_argument('--latency', type=float, default=0.02, help='Задержка ответа сервера, секунды')
+        parser.add_argument('--game', default='cs-go')
+
+    def handle(self, *args, **options):
+        corpus = pandascore_corpus(options['matches'])
+        server = ReplayServer(
+            {'/matches/upcoming': corpus, '/matches/running': []},
+            latency=options['latency']
+        )
+
+        # Сервер в отдельном процессе: его память не попадает в tracemalloc
+        server.start_process()
+        try:
+            service = PandaScoreService(base_url=server.url)
+            for name, pages in (
+                ('single-page', lambda: [service.get_upcoming_matches(options['game'], per_page=len(corpus))]),
+                ('streaming', lambda: (
+                    page for game, page in service.stream([options['game']], per_page=options['per_page'])
+                )),
+            ):
+                self.report(name, self.run(service, options['game'], pages))
+        finally:
+            server.stop()
+
+    def run(self, service, game, pages):
+        stats = {'matches': 0, 'pages': 0, 'first_write': None}
+        ingestion = IngestionService()
+
+        with transaction.atomic():
+            sport, created = Sport.objects.get_or_create(key=game, defaults={'title': game.upper()})
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            for page in pages():
+                ingestion.ingest(sport, service.to_records(page))
+                stats['pages'] += 1
+                stats['matches'] += len(page)
+                if stats['first_write'] is None:
+                    stats['first_write'] = time.perf_counter() - started
+            stats['elapsed'] = time.perf_counter() - started
+            stats['peak'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            # Замер не должен оставлять данных
+            transaction.set_rollback(True)
+
+        return stats
+
+    def report(self, name, stats):
+        self.stdout.write(self.style.SUCCESS(f'=== {name} ==='))
+        self.stdout.write(f"Матчей: {stats['matches']}, страниц: {stats['pages']}")
+        self.stdout.write(f"Время: {stats['elapsed']:.2f} с, первая запись через {stats['first_write'] or 0:.2f} с")
+        self.stdout.write(f"Пик памяти: {stats['peak'] / 1024 / 1024:.1f} МБ")
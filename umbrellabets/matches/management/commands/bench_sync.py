@@ -0,0 +1,103 @@
+import json
+import resource
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from matches.replay import ReplayServer, load_corpus, scale_corpus
+from matches.services.odds_api_service import OddsAPIService
+from matches.services.pandascore_service import PandaScoreService
+
+
+PROVIDERS = {
+    'pandascore': PandaScoreService,
+    'oddsapi': OddsAPIService,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер пропускной способности синхронизации на записанных ответах провайдера: '
+        'матчей в секунду, запросов к БД на матч и пиковый RSS. Ответы отдает локальный '
+        'ReplayServer, записи в БД откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--provider', choices=list(PROVIDERS), default='pandascore')
+        parser.add_argument('--matches', type=int, default=None,
+                            help='Размножить набор до N предстоящих матчей (до 100000)')
+        parser.add_argument('--latency', type=float, default=0.0, help='Задержка ответа сервера, секунды')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов с ошибкой 500')
+        parser.add_argument('--concurrency', type=int, default=None)
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON (для сравнения в CI)')
+
+    def handle(self, *args, **options):
+        responses = load_corpus(options['provider'])
+        if options['provider'] == 'pandascore':
+            sport_keys = sorted({key[1] for key in responses if isinstance(key, tuple)})
+            match_paths = ['/matches/upcoming']
+        else:
+            match_paths = sorted(path for path in responses if path.endswith('/odds'))
+            sport_keys = [path.split('/')[2] for path in match_paths]
+
+        if options['matches']:
+            per_sport = -(-min(options['matches'], 100000) // len(sport_keys))
+            responses = scale_corpus(responses, per_sport, paths=match_paths)
+
+        server = ReplayServer(
+            responses,
+            latency=options['latency'],
+            error_rate=options['error_rate'],
+            seed=0,
+        )
+
+        # Сервер в отдельном процессе: его память и CPU не попадают в замер
+        server.start_process()
+        try:
+            provider = PROVIDERS[options['provider']](base_url=server.url, concurrency=options['concurrency'])
+            with transaction.atomic():
+                results = {
+                    # Первый проход создает все строки, второй проверяет пропуск неизмененных
+                    'cold': self.run(provider, sport_keys),
+                    'warm': self.run(provider, sport_keys),
+                }
+
+                # Замер не должен оставлять данных
+                transaction.set_rollback(True)
+        finally:
+            server.stop()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for name, stats in results.items():
+            self.stdout.write(self.style.SUCCESS(f'=== {name} ==='))
+            self.stdout.write(f"Матчей: {stats['matches']}, записано: {stats['written']}, за {stats['elapsed']:.2f} с")
+            self.stdout.write(f"Матчей в секунду: {stats['matches_per_second']:.0f}")
+            self.stdout.write(f"Запросов к БД на матч: {stats['queries_per_match']:.3f}")
+            self.stdout.write(f"Пиковый RSS: {stats['peak_rss_mb']:.1f} МБ")
+
+    def run(self, provider, sport_keys):
+        queries = []
+
+        def count_queries(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            started = time.perf_counter()
+            results = provider.sync(sport_keys, full=True)
+            elapsed = time.perf_counter() - started
+
+        matches = sum(stats['fetched'] for stats in results.values())
+        written = sum(stats['inserted'] + stats['updated'] for stats in results.values())
+        return {
+            'matches': matches,
+            'written': written,
+            'elapsed': elapsed,
+            'matches_per_second': matches / elapsed if elapsed else 0,
+            'queries': len(queries),
+            'queries_per_match': len(queries) / matches if matches else 0,
+            # ru_maxrss в Linux - в килобайтах
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }
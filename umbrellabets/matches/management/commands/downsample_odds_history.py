@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from matches.services.odds_history import OddsHistoryService
+
+
+class Command(BaseCommand):
+    help = 'Прорядить старую историю коэффициентов в поминутные свечи (open/high/low/close)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=None,
+            help="Сколько последних дней хранить без прореживания (по умолчанию BET_SETTINGS['ODDS_HISTORY_RAW_DAYS'])"
+        )
+
+    def handle(self, *args, **options):
+        stats = OddsHistoryService().downsample(options['older_than_days'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Прорежено дней: {stats['days']}, строк: {stats['ticks']}, свечей: {stats['candles']}"
+            )
+        )
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from matches.models import Match
+from matches.services.settlement import SettlementService
 
 
 class Command(BaseCommand):
@@ -8,6 +9,18 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('match_id', type=int, help='ID матча')
         parser.add_argument('winner', type=str, choices=['home', 'away', 'cancelled'], help='Победитель')
+        parser.add_argument(
+            '--stream',
+            action='store_true',
+            default=None,
+            help='Потоковый расчет частями с контрольными точками (для крупных матчей)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Количество ставок в одной транзакции потокового расчета'
+        )
 
     def handle(self, *args, **options):
         match_id = options['match_id']
@@ -15,7 +28,13 @@ class Command(BaseCommand):
 
         try:
             match = Match.objects.get(id=match_id)
-            success, message = match.finish_match(winner)
+
+            # Повторный запуск продолжает прерванный потоковый расчет
+            success, message = SettlementService().finish_match(
+                match, winner,
+                stream=options['stream'],
+                chunk_size=options['chunk_size']
+            )
 
             if success:
                 self.stdout.write(
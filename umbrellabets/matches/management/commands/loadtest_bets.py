@@ -0,0 +1,113 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест размещения ставок: JSON API (/api/bets/, ASGI) '
+        'против формы place_bet (WSGI). Запускается против локального сервера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('match_id', type=int, help='ID предстоящего матча с коэффициентами')
+        parser.add_argument('--api-url', default='http://127.0.0.1:8001', help='Адрес ASGI-сервера')
+        parser.add_argument('--form-url', default='http://127.0.0.1:8000', help='Адрес WSGI-сервера')
+        parser.add_argument('--mode', choices=['api', 'form', 'both'], default='both')
+        parser.add_argument('--username', required=True)
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--requests', type=int, default=500, help='Количество ставок')
+        parser.add_argument('--concurrency', type=int, default=50, help='Параллельных клиентов')
+        parser.add_argument('--amount', default='10', help='Сумма одной ставки')
+        parser.add_argument('--outcome', default='home', choices=['home', 'away'])
+
+    def handle(self, *args, **options):
+        modes = ['api', 'form'] if options['mode'] == 'both' else [options['mode']]
+
+        for mode in modes:
+            base_url = options['api_url'] if mode == 'api' else options['form_url']
+            stats = self.run(mode, base_url, options)
+            self.report(mode, base_url, stats)
+
+    def run(self, mode, base_url, options):
+        local = threading.local()
+
+        def session():
+            if not hasattr(local, 'session'):
+                local.session = self.login(base_url, options['username'], options['password'])
+            return local.session
+
+        def place(_):
+            client = session()
+            started = time.perf_counter()
+            try:
+                if mode == 'api':
+                    response = client.post(
+                        f"{base_url}/api/bets/",
+                        json={
+                            'match_id': options['match_id'],
+                            'outcome': options['outcome'],
+                            'amount': options['amount'],
+                        },
+                        headers={'X-CSRFToken': client.cookies.get('csrftoken', '')},
+                    )
+                    ok = response.status_code == 201
+                else:
+                    response = client.post(
+                        f"{base_url}/{options['match_id']}/bet/",
+                        data={
+                            'outcome': options['outcome'],
+                            'amount': options['amount'],
+                            'csrfmiddlewaretoken': client.cookies.get('csrftoken', ''),
+                        },
+                        allow_redirects=False,
+                    )
+                    # Успешная ставка перенаправляет в профиль
+                    ok = response.status_code == 302 and 'profile' in response.headers.get('Location', '')
+            except requests.RequestException:
+                ok = False
+            return ok, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(place, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for ok, latency in results)
+        return {
+            'elapsed': elapsed,
+            'ok': sum(1 for ok, latency in results if ok),
+            'failed': sum(1 for ok, latency in results if not ok),
+            'p50': statistics.median(latencies) if latencies else 0,
+            'p95': latencies[int(len(latencies) * 0.95) - 1] if latencies else 0,
+        }
+
+    def login(self, base_url, username, password):
+        client = requests.Session()
+        login_url = f"{base_url}/accounts/login/"
+        client.get(login_url)
+        response = client.post(
+            login_url,
+            data={
+                'username': username,
+                'password': password,
+                'csrfmiddlewaretoken': client.cookies.get('csrftoken', ''),
+            },
+            headers={'Referer': login_url},
+            allow_redirects=False,
+        )
+        if response.status_code != 302:
+            raise CommandError(f'Не удалось войти на {base_url}: {response.status_code}')
+        # Получить свежий CSRF-токен после входа
+        client.get(f"{base_url}/api/balance/")
+        return client
+
+    def report(self, mode, base_url, stats):
+        title = 'JSON API (ASGI)' if mode == 'api' else 'Форма place_bet (WSGI)'
+        self.stdout.write(f'\n=== {title}: {base_url} ===')
+        self.stdout.write(f"Успешно: {stats['ok']}, ошибок: {stats['failed']}")
+        self.stdout.write(f"Время: {stats['elapsed']:.2f} с, {stats['ok'] / stats['elapsed']:.1f} ставок/с")
+        self.stdout.write(f"Задержка p50: {stats['p50'] * 1000:.1f} мс, p95: {stats['p95'] * 1000:.1f} мс")
@@ -0,0 +1,184 @@
+import asyncio
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from decimal import Decimal
+from urllib.parse import urlsplit
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from matches.models import Odds
+from matches.services.best_prices import update_best_prices
+from matches.services.versions import SYNC_VERSION, bump_version
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест канала обновлений /stream/: открывает N простаивающих '
+        'SSE-соединений, замеряет память сервера на соединение и задержку доставки '
+        'изменения цены всем подписчикам. По умолчанию запускает локальный uvicorn.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=10000)
+        parser.add_argument('--url', default=None, help='Адрес работающего ASGI-сервера (иначе запускается свой)')
+        parser.add_argument('--server-pid', type=int, default=None, help='PID сервера для замера памяти (с --url)')
+        parser.add_argument('--port', type=int, default=8765, help='Порт запускаемого сервера')
+        parser.add_argument('--match', type=int, default=None,
+                            help='ID матча: подписаться на него и изменить его цену для замера доставки')
+        parser.add_argument('--sport', default='cs-go', help='Вид спорта подписки, если --match не указан')
+        parser.add_argument('--open-concurrency', type=int, default=500, help='Одновременно открываемых соединений')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Ожидание доставки, секунды')
+
+    def handle(self, *args, **options):
+        # Каждое соединение - дескриптор файла
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        if options['connections'] + 100 > hard:
+            raise CommandError(f'Лимит открытых файлов {hard} меньше числа соединений')
+
+        server = None
+        if options['url']:
+            url = urlsplit(options['url'])
+            host, port, pid = url.hostname, url.port or 80, options['server_pid']
+        else:
+            host, port = '127.0.0.1', options['port']
+            server = self.start_server(host, port)
+            pid = server.pid
+
+        try:
+            stats = asyncio.run(self.run(host, port, pid, options))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+        self.report(stats)
+
+    def start_server(self, host, port):
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'umbrellabets.asgi:application',
+             '--host', host, '--port', str(port), '--log-level', 'warning', '--no-access-log',
+             '--limit-concurrency', '1000000', '--backlog', '4096'],
+            env=dict(os.environ),
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection((host, port), timeout=1).close()
+                return server
+            except OSError:
+                if server.poll() is not None:
+                    raise CommandError('Сервер uvicorn не запустился')
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError('Сервер uvicorn не начал принимать соединения')
+
+    async def run(self, host, port, pid, options):
+        query = f"match={options['match']}" if options['match'] else f"sport={options['sport']}"
+        request = f'GET /stream/?{query} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n'.encode()
+        limit = asyncio.Semaphore(options['open_concurrency'])
+
+        async def connect():
+            async with limit:
+                try:
+                    reader, writer = await asyncio.open_connection(host, port)
+                    writer.write(request)
+                    await asyncio.wait_for(reader.readuntil(b': connected\n\n'), options['timeout'])
+                    return reader, writer
+                except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+                    return None
+
+        rss_before = self.rss_mb(pid)
+        started = time.perf_counter()
+        results = await asyncio.gather(*[connect() for _ in range(options['connections'])])
+        connections = [result for result in results if result is not None]
+        open_elapsed = time.perf_counter() - started
+
+        # Даем серверу освободить буферы рукопожатий
+        await asyncio.sleep(1)
+        rss_after = self.rss_mb(pid)
+
+        stats = {
+            'connections': len(connections),
+            'failed': len(results) - len(connections),
+            'open_elapsed': open_elapsed,
+            'rss_before_mb': rss_before,
+            'rss_after_mb': rss_after,
+            'latencies': [],
+        }
+
+        if options['match'] and connections:
+            stats['latencies'] = await self.measure_delivery(connections, options)
+
+        for reader, writer in connections:
+            writer.close()
+        return stats
+
+    async def measure_delivery(self, connections, options):
+        async def receive(reader):
+            try:
+                await asyncio.wait_for(reader.readuntil(b'event: update'), options['timeout'])
+                return time.perf_counter()
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+                return None
+
+        waiters = [asyncio.ensure_future(receive(reader)) for reader, writer in connections]
+        odds, price = await sync_to_async(self.change_price)(options['match'])
+        started = time.perf_counter()
+        try:
+            received = await asyncio.gather(*waiters)
+        finally:
+            await sync_to_async(self.restore_price)(odds, price)
+        return [moment - started for moment in received if moment is not None]
+
+    def change_price(self, match_id):
+        """Изменить одну цену матча так же, как это делает синхронизация"""
+        odds = Odds.objects.filter(match_id=match_id).order_by('-price').first()
+        if odds is None:
+            raise CommandError(f'У матча #{match_id} нет коэффициентов')
+        price = odds.price
+        Odds.objects.filter(pk=odds.pk).update(price=price + Decimal('0.01'), last_update=timezone.now())
+        update_best_prices([match_id])
+        bump_version(SYNC_VERSION)
+        return odds, price
+
+    def restore_price(self, odds, price):
+        Odds.objects.filter(pk=odds.pk).update(price=price, last_update=timezone.now())
+        update_best_prices([odds.match_id])
+        bump_version(SYNC_VERSION)
+
+    @staticmethod
+    def rss_mb(pid):
+        """Резидентная память процесса, МБ (Linux)"""
+        if not pid:
+            return None
+        try:
+            with open(f'/proc/{pid}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            return None
+        return None
+
+    def report(self, stats):
+        self.stdout.write(self.style.SUCCESS('=== /stream/ ==='))
+        self.stdout.write(f"Соединений открыто: {stats['connections']}, ошибок: {stats['failed']}, "
+                          f"за {stats['open_elapsed']:.2f} с")
+
+        if stats['rss_before_mb'] is not None and stats['rss_after_mb'] is not None:
+            per_connection = (stats['rss_after_mb'] - stats['rss_before_mb']) * 1024 / max(stats['connections'], 1)
+            self.stdout.write(f"Память сервера: {stats['rss_before_mb']:.1f} -> {stats['rss_after_mb']:.1f} МБ "
+                              f"({per_connection:.1f} КБ на соединение)")
+
+        latencies = sorted(stats['latencies'])
+        if latencies:
+            self.stdout.write(f"Доставлено: {len(latencies)} из {stats['connections']}")
+            self.stdout.write(f"Задержка доставки: медиана {statistics.median(latencies) * 1000:.0f} мс, "
+                              f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.0f} мс, "
+                              f"максимум {latencies[-1] * 1000:.0f} мс")
@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from matches.services.counters import platform_counters
+
+
+class Command(BaseCommand):
+    help = 'Сверить счетчики платформы (матчи, ставки, игроки) с таблицами и исправить расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=None,
+            help='Повторять сверку каждые N секунд (по умолчанию - один раз)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            drift = platform_counters.reconcile()
+            if drift:
+                details = ', '.join(f'{name}: {delta:+d}' for name, delta in drift.items())
+                self.stdout.write(self.style.WARNING(f'⚠️ Исправлены счетчики: {details}'))
+            else:
+                self.stdout.write(self.style.SUCCESS('✅ Счетчики совпадают с таблицами'))
+
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,57 @@
+import multiprocessing
+import os
+from django.core.management.base import BaseCommand
+from django.db import connections
+from matches.services.settlement import SettlementQueue
+
+
+def _worker(worker_name, stop_when_empty):
+    # Дочерний процесс не должен использовать соединения родителя
+    connections.close_all()
+    SettlementQueue().work(worker_name, stop_when_empty=stop_when_empty)
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Запустить воркеры очереди расчета матчей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Количество процессов-воркеров'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать очередь и завершиться'
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        stop_when_empty = options['once']
+
+        self.stdout.write(f'Запуск {workers} воркеров расчета...')
+
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(
+                target=_worker,
+                args=(f'{os.uname().nodename}:{os.getpid()}:{i}', stop_when_empty),
+            )
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
+
+        self.stdout.write(self.style.SUCCESS('Воркеры расчета остановлены'))
@@ -0,0 +1,46 @@
+import signal
+import threading
+from django.core.management.base import BaseCommand
+from matches.services.pandascore_service import PandaScoreService
+from matches.services.sync_scheduler import SyncScheduler
+
+
+class Command(BaseCommand):
+    help = (
+        'Демон синхронизации с PandaScore с адаптивным расписанием: матчи в прямом эфире '
+        'обновляются каждые несколько секунд, ближайшие - раз в минуту, остальные - редко'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--game',
+            type=str,
+            default='all',
+            help='Игра или список игр через запятую (cs-go, dota2, lol, valorant), all - все'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=None,
+            help='Максимум одновременных запросов к API'
+        )
+
+    def handle(self, *args, **options):
+        if options['game'] == 'all':
+            games = list(PandaScoreService.SPORT_TITLES)
+        else:
+            games = [game.strip() for game in options['game'].split(',') if game.strip()]
+
+        scheduler = SyncScheduler(games, service=PandaScoreService(concurrency=options['concurrency']))
+        stop_event = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write('Остановка после текущей синхронизации...')
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(f"🚀 Демон синхронизации запущен для {', '.join(games)}")
+        scheduler.run_forever(stop_event)
+        self.stdout.write(self.style.SUCCESS('Демон синхронизации остановлен'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from matches.services.odds_api_service import OddsAPIService
+
+
+class Command(BaseCommand):
+    help = 'Синхронизация матчей и коэффициентов из The Odds API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sport',
+            type=str,
+            default='cs2',
+            help='Ключ спорта или список ключей через запятую'
+        )
+        parser.add_argument(
+            '--regions',
+            type=str,
+            default='eu',
+            help='Регионы букмекеров (eu, uk, us, au)'
+        )
+
+    def handle(self, *args, **options):
+        sports = [sport.strip() for sport in options['sport'].split(',') if sport.strip()]
+
+        try:
+            results = OddsAPIService().sync(sports, regions=options['regions'])
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Ошибка синхронизации: {str(e)}')
+            )
+            return
+
+        for sport, stats in results.items():
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Синхронизация {sport} завершена! "
+                    f"Получено: {stats['fetched']}, создано: {stats['inserted']}, "
+                    f"изменено: {stats['updated']}, коэффициентов: {stats['odds']}"
+                )
+            )
@@ -1,4 +1,6 @@
+from datetime import timedelta
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 from matches.services.pandascore_service import PandaScoreService
 
 
@@ -10,7 +12,30 @@ class Command(BaseCommand):
             '--game',
             type=str,
             default='cs-go',
-            help='Игра для синхронизации (cs-go, dota2, lol, valorant)'
+            help='Игра или список игр через запятую (cs-go, dota2, lol, valorant), all - все'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=None,
+            help='Максимум одновременных запросов к API'
+        )
+        parser.add_argument(
+            '--max-pages',
+            type=int,
+            default=None,
+            help='Максимум страниц предстоящих матчей на игру (курсор синхронизации при этом не сдвигается)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Только матчи, начинающиеся в ближайшие N дней'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Загрузить все предстоящие матчи, а не только измененные с прошлой синхронизации'
         )
         parser.add_argument(
             '--list-games',
@@ -19,7 +44,7 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
-        service = PandaScoreService()
+        service = PandaScoreService(concurrency=options['concurrency'])
 
         if options['list_games']:
             self.stdout.write('Получение списка игр...')
@@ -30,15 +55,31 @@ class Command(BaseCommand):
                 self.stdout.write(f"- {game['slug']}: {game['name']}")
             return
 
-        game = options['game']
-        self.stdout.write(f'Синхронизация {game}...')
+        if options['game'] == 'all':
+            games = list(PandaScoreService.SPORT_TITLES)
+        else:
+            games = [game.strip() for game in options['game'].split(',') if game.strip()]
+
+        self.stdout.write(f"Синхронизация {', '.join(games)}...")
+
+        page_options = {'max_pages': options['max_pages'], 'full': options['full']}
+        if options['days']:
+            page_options['begin_at'] = timezone.now()
+            page_options['end_at'] = page_options['begin_at'] + timedelta(days=options['days'])
 
         try:
-            service.sync_matches_from_pandascore(game)
-            self.stdout.write(
-                self.style.SUCCESS(f'Синхронизация {game} завершена!')
-            )
+            results = service.sync(games, **page_options)
         except Exception as e:
             self.stdout.write(
                 self.style.ERROR(f'Ошибка синхронизации: {str(e)}')
             )
+            return
+
+        for game, stats in results.items():
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Синхронизация {game} завершена! "
+                    f"Получено: {stats['fetched']}, создано: {stats['inserted']}, "
+                    f"изменено: {stats['updated']}, без изменений: {stats['skipped']}"
+                )
+            )
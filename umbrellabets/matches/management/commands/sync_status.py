@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from matches.models import SyncState
+from matches.services.sync_scheduler import SyncScheduler
+
+
+class Command(BaseCommand):
+    help = 'Показать расписание демона синхронизации и курсоры игр'
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        states = {state.key: state for state in SyncState.objects.all()}
+
+        self.stdout.write('=== Расписание демона ===')
+        for tier in SyncScheduler.TIERS:
+            state = states.get(SyncScheduler.state_key(tier))
+            if state is None or state.next_run_at is None:
+                self.stdout.write(f"{tier:5} не запускался")
+                continue
+
+            due = (state.next_run_at - now).total_seconds()
+            line = (
+                f"{tier:5} каждые {state.interval} с, "
+                f"последний запуск {timezone.localtime(state.last_run_at):%d.%m.%Y %H:%M:%S}, "
+                f"следующий {'через ' + str(int(due)) + ' с' if due > 0 else 'сейчас'}"
+            )
+            if state.last_error:
+                self.stdout.write(self.style.ERROR(f"{line}, ошибка: {state.last_error.splitlines()[0]}"))
+                continue
+
+            changed = sum(stats.get('inserted', 0) + stats.get('updated', 0) for stats in state.last_result.values())
+            skipped = sum(stats.get('skipped', 0) for stats in state.last_result.values())
+            self.stdout.write(f"{line}, изменено {changed}, без изменений {skipped}")
+
+        self.stdout.write('\n=== Курсоры игр ===')
+        for key, state in sorted(states.items()):
+            if key.startswith('pandascore:'):
+                cursor = f"{timezone.localtime(state.cursor):%d.%m.%Y %H:%M:%S}" if state.cursor else 'нет'
+                self.stdout.write(f"{key.split(':', 1)[1]}: изменения после {cursor}")
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0003_match_result'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SettlementJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('result', models.CharField(choices=[('home', 'Победа хозяев'), ('away', 'Победа гостей'), ('cancelled', 'Отменен')], max_length=10)),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Рассчитан'), ('failed', 'Ошибка')], default='queued', max_length=20)),
+                ('message', models.TextField(blank=True)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='settlement_jobs', to='matches.match')),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0004_settlementjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SettlementCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('result', models.CharField(choices=[('home', 'Победа хозяев'), ('away', 'Победа гостей'), ('cancelled', 'Отменен')], max_length=10)),
+                ('last_bet_id', models.BigIntegerField(default=0)),
+                ('winners', models.PositiveIntegerField(default=0)),
+                ('losers', models.PositiveIntegerField(default=0)),
+                ('refunded', models.PositiveIntegerField(default=0)),
+                ('payout', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('completed', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('match', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='settlement_checkpoint', to='matches.match')),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0006_sync_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncstate',
+            name='interval',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='syncstate',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='syncstate',
+            name='last_result',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='syncstate',
+            name='last_run_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='syncstate',
+            name='next_run_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
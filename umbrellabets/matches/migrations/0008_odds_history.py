@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0007_syncstate_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OddsTick',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('match_id', models.IntegerField()),
+                ('bookmaker_id', models.IntegerField()),
+                ('outcome', models.PositiveSmallIntegerField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('recorded_at', models.DateTimeField()),
+                ('day', models.DateField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['match_id', 'recorded_at'], name='oddstick_match_time'), models.Index(fields=['day'], name='oddstick_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OddsCandle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('match_id', models.IntegerField()),
+                ('bookmaker_id', models.IntegerField()),
+                ('outcome', models.PositiveSmallIntegerField()),
+                ('minute', models.DateTimeField()),
+                ('open', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('high', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('low', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('close', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('ticks', models.PositiveIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['match_id', 'minute'], name='oddscandle_match_minute')],
+                'unique_together': {('match_id', 'bookmaker_id', 'outcome', 'minute')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0008_odds_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='best_away_bookmaker',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='matches.bookmaker'),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='best_away_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='best_home_bookmaker',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='matches.bookmaker'),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='best_home_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=6, null=True),
+        ),
+    ]
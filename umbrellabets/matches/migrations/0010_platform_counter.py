@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:04
+
+from django.db import migrations, models
+
+
+def fill_counters(apps, schema_editor):
+    # Начальные значения по существующим данным, дальше счетчики ведутся сервисами
+    Match = apps.get_model('matches', 'Match')
+    Bet = apps.get_model('matches', 'Bet')
+    PlatformCounter = apps.get_model('matches', 'PlatformCounter')
+    PlatformCounter.objects.bulk_create([
+        PlatformCounter(name='matches', value=Match.objects.count()),
+        PlatformCounter(name='bets', value=Bet.objects.count()),
+        PlatformCounter(name='bettors', value=Bet.objects.values('user_id').distinct().count()),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0009_match_best_prices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
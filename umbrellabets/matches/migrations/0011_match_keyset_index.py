@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0010_platform_counter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['sport', 'status', 'commence_time', 'id'], name='match_sport_status_time'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0011_match_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bet',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['match'], name='bet_pending_match'),
+        ),
+        migrations.AddIndex(
+            model_name='bet',
+            index=models.Index(fields=['match', 'outcome'], name='bet_match_outcome'),
+        ),
+        migrations.AddIndex(
+            model_name='bet',
+            index=models.Index(fields=['user', 'status'], name='bet_user_status'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['status', 'commence_time', 'id'], name='match_status_time'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['updated_at'], name='match_updated_at'),
+        ),
+        migrations.AddIndex(
+            model_name='odds',
+            index=models.Index(fields=['match', 'outcome', '-price'], name='odds_match_outcome_price'),
+        ),
+        migrations.AddIndex(
+            model_name='odds',
+            index=models.Index(fields=['last_update'], name='odds_last_update'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-16 22:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0012_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='oddscandle',
+            name='bookmaker_id',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='oddscandle',
+            name='match_id',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='oddstick',
+            name='bookmaker_id',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='oddstick',
+            name='match_id',
+            field=models.BigIntegerField(),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils import timezone
 
 
@@ -49,8 +51,31 @@ class Match(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Хэш данных провайдера: синхронизация пропускает неизмененные матчи
+    content_hash = models.CharField(max_length=32, blank=True, editable=False)
+
+    # Лучшие цены на победу каждой команды и букмекеры, которые их дают.
+    # Обновляются вместе с коэффициентами (services.best_prices), чтобы
+    # список матчей не читал таблицу коэффициентов
+    best_home_price = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True, editable=False)
+    best_home_bookmaker = models.ForeignKey(
+        'Bookmaker', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+'
+    )
+    best_away_price = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True, editable=False)
+    best_away_bookmaker = models.ForeignKey(
+        'Bookmaker', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+'
+    )
+
     class Meta:
         ordering = ['commence_time']
+        indexes = [
+            # Страницы предстоящих матчей вида спорта (keyset по времени начала и id)
+            models.Index(fields=['sport', 'status', 'commence_time', 'id'], name='match_sport_status_time'),
+            # Матчи по статусу и времени начала без вида спорта: доска, API, демон синхронизации
+            models.Index(fields=['status', 'commence_time', 'id'], name='match_status_time'),
+            # Матчи, измененные после отметки (PushPoller)
+            models.Index(fields=['updated_at'], name='match_updated_at'),
+        ]
 
     def __str__(self):
         return f"{self.home_team} vs {self.away_team}"
@@ -58,91 +83,24 @@ class Match(models.Model):
     # ДОБАВИТЬ ЭТИ МЕТОДЫ
     def finish_match(self, winner):
         """Завершить матч и рассчитать ставки"""
-        if self.status == 'completed' and self.result:
-            return False, "Матч уже завершен"
+        from .services.settlement import SettlementService
 
-        self.status = 'completed'
-        self.result = winner
-        self.save()
-
-        # Рассчитать ставки
-        return self.calculate_bets()
+        return SettlementService().finish_match(self, winner)
 
     def calculate_bets(self):
         """Рассчитать все ставки на матч"""
-        from accounts.models import Transaction
-
-        if not self.result:
-            return False, "Результат матча не установлен"
-
-        # Получить все активные ставки
-        pending_bets = self.bets.filter(status='pending')
-
-        winners_count = 0
-        losers_count = 0
-        total_payout = 0
-
-        for bet in pending_bets:
-            if self.result == 'cancelled':
-                # При отмене матча - вернуть деньги
-                bet.status = 'cancelled'
-                bet.save()
-
-                # Вернуть сумму ставки на баланс
-                bet.user.profile.balance += bet.amount
-                bet.user.profile.save()
-
-                # Создать транзакцию возврата
-                Transaction.objects.create(
-                    user=bet.user,
-                    amount=bet.amount,
-                    transaction_type='refund',
-                    status='completed',
-                    comment=f'Возврат за отмененный матч {self.home_team} vs {self.away_team}'
-                )
-
-            elif bet.outcome == self.result:
-                old_balance = bet.user.profile.balance
-
-                print(f"🔍 Bet ID: {bet.id}")
-                print(f"💰 Amount: {bet.amount}")
-                print(f"📊 Odds: {bet.odds}")
-                print(f"🎯 Potential win: {bet.potential_win}")
-                print(f"💳 Balance before: {old_balance}")
-
-                # Выигрышная ставка
-                bet.status = 'won'
-                bet.save()
-
-                # Перезагрузить из базы для проверки
-                bet.user.refresh_from_db()
-
-                print(f"💳 Balance after: {bet.user.profile.balance}")
-                print(f"➕ Added: {bet.user.profile.balance - old_balance}")
-                print("---")
-
-                # Создать транзакцию выигрыша
-                Transaction.objects.create(
-                    user=bet.user,
-                    amount=bet.potential_win,
-                    transaction_type='win',
-                    status='completed',
-                    comment=f'Выигрыш по ставке на {self.home_team} vs {self.away_team}'
-                )
-
-                winners_count += 1
-                total_payout += bet.potential_win
-
-            else:
-                # Проигрышная ставка
-                bet.status = 'lost'
-                bet.save()
-                losers_count += 1
-
-        if self.result == 'cancelled':
-            return True, f"Матч отменен. Возвращены деньги по {pending_bets.count()} ставкам"
-        else:
-            return True, f"Обработано ставок: {winners_count} выигрышных, {losers_count} проигрышных. Выплачено: {total_payout} 🪙"
+        from .services.settlement import SettlementService
+
+        return SettlementService().settle(self)
+
+    def best_prices(self):
+        """Лучшие цены из колонок матча: {outcome: {'price', 'bookmaker_id'}}"""
+        best = {}
+        for outcome in ('home', 'away'):
+            price = getattr(self, f'best_{outcome}_price')
+            if price is not None:
+                best[outcome] = {'price': price, 'bookmaker_id': getattr(self, f'best_{outcome}_bookmaker_id')}
+        return best
 
 
 class Bookmaker(models.Model):
@@ -170,9 +128,96 @@ class Odds(models.Model):
 
     # Мета
     last_update = models.DateTimeField()
+    content_hash = models.CharField(max_length=32, blank=True, editable=False)
 
     class Meta:
         unique_together = ['match', 'bookmaker', 'outcome']
+        indexes = [
+            # Лучшая цена исхода матча - первая строка индекса
+            models.Index(fields=['match', 'outcome', '-price'], name='odds_match_outcome_price'),
+            # Коэффициенты, измененные после отметки (PushPoller)
+            models.Index(fields=['last_update'], name='odds_last_update'),
+        ]
+
+
+@receiver(post_save, sender=Match)
+@receiver(post_delete, sender=Match)
+def match_changed(sender, instance, created=False, **kwargs):
+    """
+    Изменение матча (статус, расчет, правка в админке) сбрасывает доску матчей
+    после фиксации транзакции, новый матч увеличивает счетчик матчей
+    """
+    from .services.counters import MATCHES, platform_counters
+    from .services.versions import BOARD_VERSION, bump_version_on_commit
+
+    if created:
+        platform_counters.increment(MATCHES)
+    bump_version_on_commit(BOARD_VERSION)
+
+
+@receiver(post_save, sender=Odds)
+@receiver(post_delete, sender=Odds)
+def odds_changed(sender, instance, **kwargs):
+    """
+    Изменение коэффициента вручную (админка) пересчитывает лучшие цены матча
+    и сбрасывает индекс лучших цен
+    """
+    from .services.best_prices import update_best_prices
+    from .services.versions import SYNC_VERSION, BOARD_VERSION, bump_version_on_commit
+
+    update_best_prices([instance.match_id])
+    bump_version_on_commit(SYNC_VERSION, BOARD_VERSION)
+
+
+class OddsTick(models.Model):
+    """
+    История коэффициентов: одна строка на каждое изменение цены, только вставка.
+    Строки компактные: без внешних ключей (история переживает удаление
+    матча) и с кодом исхода вместо строки. Колонка day позволяет удалять
+    и прореживать историю целыми днями.
+    """
+    OUTCOME_CODES = {'home': 1, 'away': 2, 'draw': 3}
+
+    # id матча и букмекера: ключи этих таблиц - BigAutoField
+    match_id = models.BigIntegerField()
+    bookmaker_id = models.BigIntegerField()
+    outcome = models.PositiveSmallIntegerField()
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+    recorded_at = models.DateTimeField()
+    day = models.DateField()
+
+    class Meta:
+        indexes = [
+            # Ряд цен матча - один проход по индексу
+            models.Index(fields=['match_id', 'recorded_at'], name='oddstick_match_time'),
+            models.Index(fields=['day'], name='oddstick_day'),
+        ]
+
+    def __str__(self):
+        return f"#{self.match_id} {self.outcome}: {self.price} ({self.recorded_at})"
+
+
+class OddsCandle(models.Model):
+    """Поминутная свеча (open/high/low/close) из прореженной истории коэффициентов"""
+    match_id = models.BigIntegerField()
+    bookmaker_id = models.BigIntegerField()
+    outcome = models.PositiveSmallIntegerField()
+    minute = models.DateTimeField()
+
+    open = models.DecimalField(max_digits=6, decimal_places=2)
+    high = models.DecimalField(max_digits=6, decimal_places=2)
+    low = models.DecimalField(max_digits=6, decimal_places=2)
+    close = models.DecimalField(max_digits=6, decimal_places=2)
+    ticks = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ['match_id', 'bookmaker_id', 'outcome', 'minute']
+        indexes = [
+            models.Index(fields=['match_id', 'minute'], name='oddscandle_match_minute'),
+        ]
+
+    def __str__(self):
+        return f"#{self.match_id} {self.outcome} {self.minute}: {self.open}-{self.close}"
 
 
 class Bet(models.Model):
@@ -203,6 +248,101 @@ class Bet(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Расчет матча читает только ожидающие ставки: частичный индекс
+            # не растет за счет рассчитанных ставок
+            models.Index(fields=['match'], condition=models.Q(status='pending'), name='bet_pending_match'),
+            # Распределение ставок по исходам на странице матча
+            models.Index(fields=['match', 'outcome'], name='bet_match_outcome'),
+            # Ставки игрока по статусу (профиль)
+            models.Index(fields=['user', 'status'], name='bet_user_status'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.match} - {self.amount}"
+
+
+class SettlementJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Рассчитан'),
+        ('failed', 'Ошибка'),
+    ]
+
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='settlement_jobs')
+    result = models.CharField(max_length=10, choices=Match.RESULT_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+
+    # Итог расчета или текст ошибки
+    message = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.match} - {self.get_result_display()} ({self.get_status_display()})"
+
+
+class SettlementCheckpoint(models.Model):
+    """Прогресс потокового расчета матча, позволяет продолжить расчет после сбоя"""
+    match = models.OneToOneField(Match, on_delete=models.CASCADE, related_name='settlement_checkpoint')
+    result = models.CharField(max_length=10, choices=Match.RESULT_CHOICES)
+
+    # Последняя рассчитанная ставка (ставки обрабатываются по возрастанию id)
+    last_bet_id = models.BigIntegerField(default=0)
+
+    winners = models.PositiveIntegerField(default=0)
+    losers = models.PositiveIntegerField(default=0)
+    refunded = models.PositiveIntegerField(default=0)
+    payout = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+    completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.match} - ставка #{self.last_bet_id}"
+
+
+class SyncState(models.Model):
+    """
+    Состояние синхронизации с провайдером: курсор инкрементальной
+    загрузки игры (pandascore:cs-go) или расписание уровня демона (daemon:live)
+    """
+    key = models.CharField(max_length=100, unique=True)
+
+    # Наибольшее modified_at среди загруженных матчей: следующий запуск
+    # запрашивает только матчи, измененные после него
+    cursor = models.DateTimeField(null=True, blank=True)
+
+    # Расписание демона синхронизации
+    interval = models.PositiveIntegerField(null=True, blank=True)  # секунды
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    next_run_at = models.DateTimeField(null=True, blank=True)
+    last_result = models.JSONField(default=dict, blank=True)
+    last_error = models.TextField(blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key}: {self.cursor}"
+
+
+class PlatformCounter(models.Model):
+    """
+    Счетчик статистики платформы (services.counters): число матчей, ставок
+    и игроков со ставками. Увеличивается атомарным UPDATE при создании
+    матчей и размещении ставок, периодически сверяется с COUNT(*)
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
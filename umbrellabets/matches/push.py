@@ -0,0 +1,331 @@
+"""
+Канал обновлений матчей для браузера (Server-Sent Events) на ASGI.
+Клиент открывает GET /stream/?match=1,2 или /stream/?sport=cs-go,dota2
+и получает лучшие цены и смену статусов подписанных матчей без
+перезагрузки страницы.
+
+Обработчик - голое ASGI-приложение (umbrellabets.asgi направляет на него
+/stream/ в обход Django): простаивающее соединение - это одна корутина,
+ожидающая события, без потока и запросов к БД, поэтому один процесс
+держит десятки тысяч соединений.
+
+Обновления раздает брокер в памяти процесса (push_broker). Его наполняют
+синхронизация, запущенная в этом же процессе, и PushPoller, который раз
+в тик проверяет версии данных в общем кеше и читает из БД матчи,
+измененные другими процессами. Обновления одного матча, пришедшие за тик,
+сливаются в одно сообщение.
+"""
+import asyncio
+import json
+import threading
+from datetime import timedelta
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.utils import timezone
+from .models import Match, Odds
+from .services.versions import SYNC_VERSION, BOARD_VERSION, get_version
+
+# Подписок в одном соединении не больше, чем матчей и видов спорта в запросе
+MAX_SUBSCRIPTIONS = 100
+
+
+def push_settings():
+    return (
+        settings.BET_SETTINGS.get('PUSH_TICK', 1.0),
+        settings.BET_SETTINGS.get('PUSH_HEARTBEAT', 15.0),
+    )
+
+
+class Subscription:
+    """Подписка одного соединения: неотправленные обновления по ключу"""
+
+    def __init__(self, matches=(), sports=()):
+        self.matches = set(matches)
+        self.sports = set(sports)
+        self.pending = {}
+        self.ready = asyncio.Event()
+        self.closed = False
+
+    def push(self, key, event):
+        # Более новое обновление того же ключа заменяет неотправленное
+        self.pending[key] = event
+        self.ready.set()
+
+    def drain(self):
+        events = list(self.pending.values())
+        self.pending = {}
+        self.ready.clear()
+        return events
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+
+class PushBroker:
+    """
+    Подписки процесса по матчам и видам спорта.
+    publish() можно вызывать из любого потока: доставка выполняется
+    в event loop, в котором открыты подписки.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.by_match = {}
+        self.by_sport = {}
+        self.loop = None
+        self.poller = None
+
+    @property
+    def active(self):
+        return bool(self.by_match or self.by_sport)
+
+    def subscribe(self, matches=(), sports=()):
+        subscription = Subscription(matches, sports)
+        with self._lock:
+            for match_id in subscription.matches:
+                self.by_match.setdefault(match_id, set()).add(subscription)
+            for sport_key in subscription.sports:
+                self.by_sport.setdefault(sport_key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for index, keys in ((self.by_match, subscription.matches), (self.by_sport, subscription.sports)):
+                for key in keys:
+                    subscribers = index.get(key)
+                    if subscribers is not None:
+                        subscribers.discard(subscription)
+                        if not subscribers:
+                            del index[key]
+
+    def start(self):
+        """Привязать брокер к текущему event loop и запустить опрос БД"""
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.poller = PushPoller(self)
+            self.poller.task = loop.create_task(self.poller.run())
+
+    async def stop(self):
+        """Остановить опрос БД и закрыть его соединение"""
+        poller, self.poller, self.loop = self.poller, None, None
+        if poller is not None:
+            await poller.stop()
+
+    def publish(self, events):
+        """Разослать события [{'type', 'match', 'sport', ...}] подписчикам"""
+        if not events or not self.active:
+            return
+
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            self._deliver(events)
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(events)
+        else:
+            loop.call_soon_threadsafe(self._deliver, events)
+
+    def publish_matches(self, match_ids):
+        """Разослать текущие цены и статусы матчей (синхронный код, запрос к БД)"""
+        if self.active and match_ids:
+            self.publish(match_events(match_ids))
+
+    def _deliver(self, events):
+        with self._lock:
+            for event in events:
+                subscribers = self.by_match.get(event['match'], set()) | self.by_sport.get(event['sport'], set())
+                for subscription in subscribers:
+                    subscription.push((event['type'], event['match']), event)
+
+
+def match_events(match_ids):
+    """События 'prices' и 'status' по текущему состоянию матчей"""
+    events = []
+    rows = Match.objects.filter(id__in=match_ids).values(
+        'id', 'sport__key', 'status', 'result', 'best_home_price', 'best_away_price'
+    )
+    for row in rows:
+        events.append({
+            'type': 'prices',
+            'match': row['id'],
+            'sport': row['sport__key'],
+            'home': str(row['best_home_price']) if row['best_home_price'] is not None else None,
+            'away': str(row['best_away_price']) if row['best_away_price'] is not None else None,
+        })
+        events.append({
+            'type': 'status',
+            'match': row['id'],
+            'sport': row['sport__key'],
+            'status': row['status'],
+            'result': row['result'],
+        })
+    return events
+
+
+class PushPoller:
+    """
+    Доставка изменений из других процессов. Раз в тик сравнивает версии
+    синхронизации и доски с общим кешем; если они изменились, читает
+    матчи с коэффициентами или данными новее последнего просмотренного
+    времени и рассылает их. Пока подписчиков нет, БД не читается.
+
+    Время изменения берется до фиксации транзакции, поэтому строки,
+    зафиксированные позже более новых, оказались бы позади отметки:
+    каждый опрос перечитывает окно PUSH_OVERLAP до нее, а уже
+    разосланные строки окна пропускает.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.versions = None
+        self.watermark = timezone.now()
+        # Разосланные строки окна перекрытия: (модель, id) -> время изменения
+        self.seen = {}
+        self.task = None
+
+    async def run(self):
+        tick, heartbeat = push_settings()
+        while True:
+            await asyncio.sleep(tick)
+            if not self.broker.active:
+                continue
+            try:
+                events = await sync_to_async(self.poll_once)()
+            except Exception as e:
+                print(f"❌ Ошибка чтения обновлений для подписчиков: {e}")
+                continue
+            self.broker.publish(events)
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        # Соединение опроса принадлежит потоку sync_to_async - закрываем там же
+        await sync_to_async(connections.close_all)()
+
+    def poll_once(self):
+        """
+        Один опрос как отдельный запрос Django: соединение с БД,
+        сломанное ошибкой или перезапуском сервера, закрывается
+        до и после опроса, и следующий тик открывает новое
+        """
+        close_old_connections()
+        try:
+            return self.poll()
+        finally:
+            close_old_connections()
+
+    def poll(self):
+        versions = (get_version(SYNC_VERSION), get_version(BOARD_VERSION))
+        if versions == self.versions:
+            return []
+
+        overlap = timedelta(seconds=settings.BET_SETTINGS.get('PUSH_OVERLAP', 30.0))
+        since = self.watermark - overlap
+        rows = [
+            (('odds', odds_id), match_id, last_update)
+            for odds_id, match_id, last_update in Odds.objects.filter(
+                last_update__gt=since
+            ).order_by().values_list('id', 'match_id', 'last_update')
+        ]
+        rows += [
+            (('match', match_id), match_id, updated_at)
+            for match_id, updated_at in Match.objects.filter(
+                updated_at__gt=since
+            ).order_by().values_list('id', 'updated_at')
+        ]
+        # Версии запоминаются после чтения: ошибка запроса повторит опрос
+        self.versions = versions
+
+        changed = set()
+        for key, match_id, stamp in rows:
+            if self.seen.get(key) != stamp:
+                self.seen[key] = stamp
+                changed.add(match_id)
+            self.watermark = max(self.watermark, stamp)
+
+        since = self.watermark - overlap
+        self.seen = {key: stamp for key, stamp in self.seen.items() if stamp > since}
+
+        if not changed:
+            return []
+        return match_events(list(changed))
+
+
+# Брокер процесса
+push_broker = PushBroker()
+
+
+def parse_keys(values):
+    """'1,2' и повторяющиеся параметры в список значений"""
+    return [key for value in values for key in value.split(',') if key]
+
+
+async def stream(scope, receive, send):
+    """ASGI-обработчик GET /stream/?match=...&sport=..."""
+    query = parse_qs(scope.get('query_string', b'').decode())
+    try:
+        matches = {int(match_id) for match_id in parse_keys(query.get('match', []))}
+    except ValueError:
+        matches = None
+    sports = set(parse_keys(query.get('sport', [])))
+
+    if scope['method'] != 'GET' or matches is None or not (matches or sports) \
+            or len(matches) + len(sports) > MAX_SUBSCRIPTIONS:
+        await send({'type': 'http.response.start', 'status': 400,
+                    'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+        await send({'type': 'http.response.body', 'body': 'Укажите match или sport'.encode()})
+        return
+
+    tick, heartbeat = push_settings()
+    push_broker.start()
+    subscription = push_broker.subscribe(matches, sports)
+
+    async def wait_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        subscription.close()
+
+    watcher = asyncio.create_task(wait_disconnect())
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 3000\n: connected\n\n', 'more_body': True})
+
+        while not subscription.closed:
+            try:
+                await asyncio.wait_for(subscription.ready.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                # Комментарий не дает прокси закрыть простаивающее соединение
+                await send({'type': 'http.response.body', 'body': b': ping\n\n', 'more_body': True})
+                continue
+
+            events = subscription.drain()
+            if events:
+                data = json.dumps(events, separators=(',', ':'))
+                await send({'type': 'http.response.body', 'body': f'event: update\ndata: {data}\n\n'.encode(),
+                            'more_body': True})
+
+            # Обновления, пришедшие за тик, уйдут одним сообщением
+            await asyncio.sleep(tick)
+    finally:
+        push_broker.unsubscribe(subscription)
+        watcher.cancel()
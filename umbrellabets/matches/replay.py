@@ -0,0 +1,271 @@
+"""
+Локальный сервер, воспроизводящий записанные ответы API провайдеров.
+Нужен для тестов и замеров синхронизации без обращения к настоящим API
+(у них есть квоты). Поддерживает искусственную задержку ответа,
+случайные ошибки и размножение набора ответов.
+
+Набор ответов лежит в replay_corpus/<провайдер>/*.json, каждый файл - один
+ответ: {"path": ..., "params": {...}, "body": ...}.
+"""
+import copy
+import json
+import multiprocessing
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+CORPUS_DIR = Path(__file__).resolve().parent / 'replay_corpus'
+
+
+class ReplayServer:
+    """
+    HTTP-сервер в отдельном потоке.
+
+    responses: {путь: ответ} или {(путь, videogame): ответ}, где videogame -
+    значение параметра filter[videogame]. Ответ по ключу с игрой имеет
+    приоритет над ответом только по пути.
+
+    Списки отдаются постранично, как в PandaScore, если в запросе есть
+    per_page: параметр page, заголовки X-Total и Link с rel="next".
+    Поддерживаются фильтры range[поле] и сортировка sort.
+
+    error_rate - доля запросов, на которые сервер отвечает error_status
+    (по умолчанию 500) вместо записанного ответа; seed делает ошибки
+    воспроизводимыми.
+
+        with ReplayServer({'/matches/upcoming': [...]}, latency=0.1) as server:
+            PandaScoreService(base_url=server.url).get_upcoming_matches()
+    """
+
+    def __init__(self, responses, latency=0.0, error_rate=0.0, error_status=500, seed=None,
+                 host='127.0.0.1', port=0):
+        self.responses = responses
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = []
+        self.connections = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._filtered = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+        self._process = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def start_process(self):
+        """
+        Запустить сервер в дочернем процессе, чтобы его память и CPU
+        не попадали в замеры клиента. Счетчики requests/connections
+        в этом режиме не ведутся.
+        """
+        self._process = multiprocessing.get_context('fork').Process(
+            target=self._server.serve_forever, daemon=True
+        )
+        self._process.start()
+        return self
+
+    def stop(self):
+        if self._process:
+            self._process.terminate()
+            self._process.join()
+        else:
+            self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def resolve(self, path, params):
+        """Найти записанный ответ: (статус, тело, заголовки)"""
+        game = params.get('filter[videogame]', [None])[0]
+        key = (path, game) if (path, game) in self.responses else path
+        if key not in self.responses:
+            return 404, {'error': 'Not found'}, {}
+
+        payload = self.responses[key]
+        if isinstance(payload, list):
+            # Отфильтрованный список запоминается: на большом наборе
+            # страницы не должны каждый раз заново сортировать весь список
+            query = tuple(sorted(
+                (name, values[0]) for name, values in params.items()
+                if name == 'sort' or name.startswith('range[')
+            ))
+            if (key, query) not in self._filtered:
+                self._filtered[(key, query)] = self.filter(params, payload)
+            payload = self._filtered[(key, query)]
+
+        if isinstance(payload, list) and 'per_page' in params:
+            return self.paginate(path, params, payload)
+        return 200, payload, {}
+
+    def filter(self, params, items):
+        """Фильтры range[поле] и сортировка sort, как в PandaScore"""
+        for name, values in params.items():
+            if name.startswith('range[') and name.endswith(']'):
+                # Время в формате ISO 8601 UTC сравнивается как строка
+                field = name[len('range['):-1]
+                begin, end = values[0].split(',')
+                items = [item for item in items if begin <= (item.get(field) or '') <= end]
+
+        if 'sort' in params:
+            field = params['sort'][0]
+            items = sorted(items, key=lambda item: item.get(field) or '')
+        return items
+
+    def inject_error(self):
+        """Решить, ответить ли на запрос ошибкой"""
+        if not self.error_rate:
+            return False
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        return failed
+
+    def paginate(self, path, params, items):
+        """Страница списка с заголовками пагинации PandaScore"""
+        per_page = int(params['per_page'][0])
+        page = int(params.get('page', ['1'])[0])
+        start = (page - 1) * per_page
+
+        headers = {
+            'X-Page': str(page),
+            'X-Per-Page': str(per_page),
+            'X-Total': str(len(items)),
+        }
+        if start + per_page < len(items):
+            query = {name: values[0] for name, values in params.items()}
+            query['page'] = page + 1
+            headers['Link'] = f'<{self.url}{path}?{urlencode(query)}>; rel="next"'
+
+        return 200, items[start:start + per_page], headers
+
+    def _handler_class(self):
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive: клиент может переиспользовать соединение
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with replay._lock:
+                    replay.connections += 1
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                params = parse_qs(url.query)
+                with replay._lock:
+                    replay.requests.append((url.path, params))
+
+                if replay.latency:
+                    time.sleep(replay.latency)
+
+                if replay.inject_error():
+                    status, payload, headers = replay.error_status, {'error': 'Injected error'}, {}
+                else:
+                    status, payload, headers = replay.resolve(url.path, params)
+                body = json.dumps(payload).encode()
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def pandascore_corpus(count, start=None, step_minutes=10, modified_at=None):
+    """
+    Синтетический набор предстоящих матчей в формате PandaScore
+    для замеров: count матчей, начинающихся каждые step_minutes минут
+    """
+    start = start or datetime(2030, 1, 1, tzinfo=timezone.utc)
+    modified_at = modified_at or datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            'id': 100000 + number,
+            'status': 'not_started',
+            'begin_at': (start + timedelta(minutes=step_minutes * number)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'modified_at': modified_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'name': f'Team {number * 2} vs Team {number * 2 + 1}',
+            'opponents': [
+                {'opponent': {'id': number * 2, 'name': f'Team {number * 2}'}},
+                {'opponent': {'id': number * 2 + 1, 'name': f'Team {number * 2 + 1}'}},
+            ],
+        }
+        for number in range(count)
+    ]
+
+
+def load_corpus(provider):
+    """
+    Загрузить записанные ответы провайдера из replay_corpus/<provider>.
+    Возвращает словарь responses для ReplayServer
+    """
+    responses = {}
+    for path in sorted((CORPUS_DIR / provider).glob('*.json')):
+        with open(path, encoding='utf-8') as f:
+            recording = json.load(f)
+
+        game = recording.get('params', {}).get('filter[videogame]')
+        responses[(recording['path'], game) if game else recording['path']] = recording['body']
+    return responses
+
+
+def scale_corpus(responses, count, paths):
+    """
+    Размножить списки матчей в ответах на пути paths до count элементов
+    в каждом ответе. Копии получают новые id, остальные поля повторяют
+    записанные матчи
+    """
+    scaled = {}
+    for key, payload in responses.items():
+        path = key[0] if isinstance(key, tuple) else key
+        if path not in paths or not payload:
+            scaled[key] = payload
+            continue
+
+        items = []
+        for number in range(count):
+            template = payload[number % len(payload)]
+            copy_number = number // len(payload)
+            if not copy_number:
+                items.append(template)
+                continue
+
+            item = copy.deepcopy(template)
+            if isinstance(item['id'], int):
+                item['id'] += copy_number * 10_000_000
+            else:
+                item['id'] = f"{item['id']}-{copy_number}"
+            items.append(item)
+        scaled[key] = items
+    return scaled
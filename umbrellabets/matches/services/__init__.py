@@ -1,3 +1,20 @@
+from .providers import Provider, FetchIncomplete
 from .pandascore_service import PandaScoreService
+from .odds_api_service import OddsAPIService
+from .ingestion import IngestionService, MatchRecord, OddsRecord
+from .settlement import SettlementService, SettlementQueue
+from .betting import BetPlacementService, BetPlacementError
 
-__all__ = ['PandaScoreService']
\ No newline at end of file
+__all__ = [
+    'Provider',
+    'FetchIncomplete',
+    'PandaScoreService',
+    'OddsAPIService',
+    'IngestionService',
+    'MatchRecord',
+    'OddsRecord',
+    'SettlementService',
+    'SettlementQueue',
+    'BetPlacementService',
+    'BetPlacementError',
+]
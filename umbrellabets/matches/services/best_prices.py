@@ -0,0 +1,41 @@
+from django.db.models import OuterRef, Subquery
+from ..models import Match, Odds
+
+
+# Денормализованные колонки Match: исход -> (цена, букмекер)
+BEST_PRICE_FIELDS = {
+    'home': ('best_home_price', 'best_home_bookmaker'),
+    'away': ('best_away_price', 'best_away_bookmaker'),
+}
+
+
+def update_best_prices(match_ids):
+    """
+    Пересчитать лучшие цены матчей одним UPDATE с подзапросами к коэффициентам.
+    При равных ценах побеждает коэффициент, записанный раньше.
+    Возвращает количество обновленных матчей
+    """
+    if not match_ids:
+        return 0
+
+    values = {}
+    for outcome, (price_field, bookmaker_field) in BEST_PRICE_FIELDS.items():
+        best = Odds.objects.filter(match=OuterRef('pk'), outcome=outcome).order_by('-price', 'id')
+        values[price_field] = Subquery(best.values('price')[:1])
+        values[bookmaker_field] = Subquery(best.values('bookmaker_id')[:1])
+
+    return Match.objects.filter(id__in=match_ids).update(**values)
+
+
+def backfill_best_prices(batch_size=1000):
+    """Заполнить лучшие цены всех матчей пачками по id. Возвращает количество матчей"""
+    updated = 0
+    last_id = 0
+    while True:
+        match_ids = list(
+            Match.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not match_ids:
+            return updated
+        updated += update_best_prices(match_ids)
+        last_id = match_ids[-1]
@@ -0,0 +1,178 @@
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .counters import BETS, BETTORS, platform_counters
+from .odds_index import best_odds_index
+from ..models import Match, Bet
+
+
+class BetPlacementError(Exception):
+    """Ставка не принята. Текст исключения показывается пользователю"""
+
+
+class BetPlacementService:
+    """
+    Размещение ставок.
+    Проверка баланса и списание выполняются одним условным UPDATE
+    (balance >= amount), ставка и транзакция записываются в той же
+    транзакции БД, поэтому параллельные запросы не могут уйти в минус.
+    """
+
+    def place(self, user, match, outcome, amount):
+        """Разместить ставку. Возвращает созданную ставку"""
+        amount = self.clean_amount(amount)
+        self.check_match(match)
+
+        return self.place_slip(user, [
+            {'match_id': match.id, 'outcome': outcome, 'amount': amount}
+        ], matches={match.id: match})[0]
+
+    def place_slip(self, user, selections, matches=None):
+        """
+        Разместить купон из нескольких ставок на разные матчи.
+        Матчи читаются одним запросом, коэффициенты - из индекса лучших цен,
+        общая сумма списывается один раз, ставки и транзакции вставляются
+        bulk_create. Купон принимается или отклоняется целиком.
+        """
+        if not selections:
+            raise BetPlacementError("Купон пуст")
+
+        max_selections = settings.BET_SETTINGS.get('MAX_SLIP_SELECTIONS', 20)
+        if len(selections) > max_selections:
+            raise BetPlacementError(f"В купоне может быть не больше {max_selections} ставок")
+
+        cleaned = []
+        seen_matches = set()
+        for selection in selections:
+            match_id, outcome = self.clean_selection(selection)
+
+            if match_id in seen_matches:
+                raise BetPlacementError("В купоне может быть только одна ставка на матч")
+            seen_matches.add(match_id)
+
+            cleaned.append((match_id, outcome, self.clean_amount(selection.get('amount'))))
+
+        match_ids = [match_id for match_id, outcome, amount in cleaned]
+        if matches is None:
+            matches = Match.objects.in_bulk(match_ids)
+        prices = best_odds_index.get_many(match_ids)
+
+        bets = []
+        for match_id, outcome, amount in cleaned:
+            match = matches.get(match_id)
+            if match is None:
+                raise BetPlacementError(f"Матч #{match_id} не найден")
+            self.check_match(match)
+
+            best = prices[match_id].get(outcome)
+            if not best:
+                raise BetPlacementError(f"Коэффициент не найден (матч #{match_id})")
+
+            bets.append(Bet(
+                user=user,
+                match=match,
+                outcome=outcome,
+                amount=amount,
+                odds=best['price'],
+                potential_win=(amount * best['price']).quantize(Decimal('0.01'))
+            ))
+
+        with transaction.atomic():
+            self.debit(user, sum(bet.amount for bet in bets))
+
+            # Строка профиля заблокирована списанием, поэтому первую ставку
+            # игрока параллельные запросы не посчитают дважды
+            first_bet = not Bet.objects.filter(user=user).exists()
+            Bet.objects.bulk_create(bets)
+            self.record_transactions(user, [(bet.amount, bet.match) for bet in bets])
+
+            # Счетчики - общие строки для всех игроков: увеличиваются после
+            # фиксации, чтобы не держать их блокировку до конца транзакции
+            transaction.on_commit(lambda: self.count_bets(len(bets), first_bet))
+
+        return bets
+
+    def count_bets(self, count, first_bet):
+        """Учесть размещенные ставки в счетчиках платформы"""
+        platform_counters.increment(BETS, count)
+        if first_bet:
+            platform_counters.increment(BETTORS)
+
+    def clean_selection(self, selection):
+        """
+        Проверить матч и исход ставки купона. Данные приходят из JSON,
+        поэтому вместо строк и чисел могут быть списки и словари
+        """
+        if not isinstance(selection, dict):
+            raise BetPlacementError("Некорректные данные ставки")
+
+        match_id = selection.get('match_id')
+        outcome = selection.get('outcome')
+        if isinstance(match_id, str) and match_id.isdecimal():
+            match_id = int(match_id)
+
+        if (not isinstance(match_id, int) or isinstance(match_id, bool)
+                or not isinstance(outcome, str)
+                or outcome not in dict(Bet.OUTCOME_CHOICES)):
+            raise BetPlacementError("Некорректные данные ставки")
+
+        return match_id, outcome
+
+    def clean_amount(self, amount):
+        """Привести сумму к Decimal и проверить лимиты BET_SETTINGS"""
+        try:
+            amount = Decimal(amount)
+        except (InvalidOperation, ValueError, TypeError):
+            raise BetPlacementError("Некорректные данные ставки")
+        if not amount.is_finite():
+            raise BetPlacementError("Некорректные данные ставки")
+
+        min_amount = Decimal(str(settings.BET_SETTINGS['MIN_BET_AMOUNT']))
+        max_amount = Decimal(str(settings.BET_SETTINGS['MAX_BET_AMOUNT']))
+
+        if amount < min_amount:
+            raise BetPlacementError(f"Минимальная ставка: {min_amount:g} 🪙")
+        if amount > max_amount:
+            raise BetPlacementError(f"Максимальная ставка: {max_amount:g} 🪙")
+
+        return amount.quantize(Decimal('0.01'))
+
+    def check_match(self, match):
+        """Проверить, что матч еще не начался"""
+        if match.commence_time <= timezone.now() or match.status != 'upcoming':
+            raise BetPlacementError("Ставки на этот матч больше не принимаются")
+
+    def debit(self, user, amount):
+        """
+        Списать сумму с баланса, если ее хватает.
+        Вызывается внутри transaction.atomic().
+        """
+        from accounts.models import UserProfile
+
+        debited = UserProfile.objects.filter(
+            user=user,
+            balance__gte=amount
+        ).update(balance=F('balance') - amount)
+
+        if not debited:
+            raise BetPlacementError("Недостаточно средств на счете")
+
+    def record_transactions(self, user, stakes):
+        """
+        Записать транзакции списания по ставкам без сигналов:
+        баланс уже списан в debit()
+        """
+        from accounts.models import Transaction
+
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=user,
+                amount=-amount,  # Отрицательная сумма для списания
+                transaction_type='bet',
+                status='completed',
+                comment=f'Ставка на матч {match.home_team} vs {match.away_team}'
+            )
+            for amount, match in stakes
+        ])
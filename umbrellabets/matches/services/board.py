@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from .counters import MATCHES, BETS, BETTORS, platform_counters
+from .odds_analytics import odds_analytics
+from .versions import BOARD_VERSION, get_version
+from ..models import Match, Sport, Odds
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def best_odds_list(best, analytics=None):
+    """
+    Лучшие коэффициенты матча списком в порядке исходов, для шаблонов.
+    С analytics к исходу добавляются консенсус-вероятность и справедливая цена
+    """
+    labels = dict(Odds.OUTCOME_CHOICES)
+    outcomes = (analytics or {}).get('outcomes', {})
+    return [
+        dict(
+            best[outcome],
+            outcome=outcome,
+            label=labels[outcome],
+            probability=outcomes.get(outcome, {}).get('probability'),
+            consensus=outcomes.get(outcome, {}).get('consensus'),
+        )
+        for outcome, label in Odds.OUTCOME_CHOICES
+        if outcome in best
+    ]
+
+
+class MatchBoard:
+    """
+    Доска матчей для главной страницы: live матчи, предстоящие матчи по видам
+    спорта, фильтр видов спорта и общая статистика.
+    Доска собирается один раз на версию доски (BOARD_VERSION меняют
+    синхронизация, расчет матчей и смена статусов) и хранится в кеше 'board'
+    простыми словарями, поэтому запрос страницы не читает таблицы матчей.
+    Доска вида спорта выбирается из общей доски без обращения к БД.
+    Предстоящие матчи хранятся только первой страницей на вид спорта,
+    поэтому размер доски не растет с числом матчей.
+    Срок жизни записи (BET_SETTINGS['BOARD_CACHE_TIMEOUT']) ограничивает
+    отставание счетчиков ставок и начавшихся по времени матчей.
+    """
+
+    CACHE_KEY = 'matches:board:'
+    ALL = 'all'
+
+    def __init__(self, cache_alias='board'):
+        self.cache_alias = cache_alias
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get(self, sport_filter=ALL):
+        """Доска для фильтра вида спорта"""
+        version = get_version(BOARD_VERSION)
+        key = f'{self.CACHE_KEY}{sport_filter}:{version}'
+
+        board = self.cache.get(key)
+        if board is not None:
+            return board
+
+        if sport_filter == self.ALL:
+            board = self.build()
+        else:
+            board = self.filter(self.get(self.ALL), sport_filter)
+            # Произвольные значения фильтра не должны плодить записи в кеше
+            if sport_filter not in {sport['key'] for sport in board['sports']}:
+                return board
+
+        self.cache.set(key, board, timeout=settings.BET_SETTINGS.get('BOARD_CACHE_TIMEOUT', 60))
+        return board
+
+    def build(self):
+        """Собрать общую доску из БД"""
+        live_matches = list(Match.objects.filter(status='live').select_related('sport'))
+
+        # Предстоящие матчи: по виду спорта только первая страница и общее
+        # число матчей, остальные страницы догружаются при прокрутке
+        matches_by_sport = {}
+        upcoming = Match.objects.filter(commence_time__gte=timezone.now(), status='upcoming').order_by()
+        sections = upcoming.values('sport__key', 'sport__title').annotate(
+            count=Count('id'), first=Min('commence_time')
+        ).order_by('first', 'sport__key')
+        for section in sections:
+            sport_key = section['sport__key']
+            matches_by_sport[sport_key] = dict(
+                self.page(sport_key),
+                sport={'key': sport_key, 'title': section['sport__title']},
+                count=section['count'],
+            )
+
+        counters = platform_counters.get()
+        return {
+            'live_matches': self.entries(live_matches),
+            'matches_by_sport': matches_by_sport,
+            'sports': [
+                {'key': key, 'title': title}
+                for key, title in Sport.objects.filter(active=True).values_list('key', 'title')
+            ],
+            'total_matches': counters[MATCHES],
+            'total_bets': counters[BETS],
+            'total_users': counters[BETTORS],
+            'upcoming_count': sum(section['count'] for section in matches_by_sport.values()),
+        }
+
+    def page(self, sport_key=None, after=None, size=None, status='upcoming'):
+        """
+        Страница матчей после курсора (keyset по (commence_time, id)):
+        {'matches': [...], 'next': курсор или None}. По умолчанию - еще не
+        начавшиеся предстоящие матчи. Стоимость запроса не зависит от номера
+        страницы и числа матчей
+        """
+        size = size or settings.BET_SETTINGS.get('BOARD_PAGE_SIZE', 24)
+        matches = Match.objects.filter(status=status)
+        if sport_key:
+            matches = matches.filter(sport__key=sport_key)
+        if status == 'upcoming':
+            matches = matches.filter(commence_time__gte=timezone.now())
+        if after:
+            commence_time, match_id = decode_cursor(after)
+            matches = matches.filter(
+                Q(commence_time__gt=commence_time) | Q(commence_time=commence_time, id__gt=match_id)
+            )
+
+        matches = list(matches.select_related('sport').order_by('commence_time', 'id')[:size + 1])
+        has_next = len(matches) > size
+        matches = matches[:size]
+        return {
+            'matches': self.entries(matches),
+            'next': encode_cursor(matches[-1]) if has_next else None,
+        }
+
+    def entries(self, matches):
+        """Матчи словарями для шаблона: лучшие цены из колонок матча, аналитика из кеша"""
+        analytics = odds_analytics.get_many([match.id for match in matches])
+        sports = {}
+        entries = []
+        for match in matches:
+            # Один словарь на вид спорта: pickle хранит общие объекты один раз
+            sport = sports.setdefault(match.sport.key, {'key': match.sport.key, 'title': match.sport.title})
+            entries.append({
+                'id': match.id,
+                'home_team': match.home_team,
+                'away_team': match.away_team,
+                'commence_time': match.commence_time,
+                'sport': sport,
+                'best_odds': best_odds_list(match.best_prices(), analytics[match.id]),
+            })
+        return entries
+
+    @staticmethod
+    def filter(board, sport_key):
+        """Доска одного вида спорта из общей доски"""
+        matches_by_sport = {key: value for key, value in board['matches_by_sport'].items() if key == sport_key}
+        return dict(
+            board,
+            live_matches=[match for match in board['live_matches'] if match['sport']['key'] == sport_key],
+            matches_by_sport=matches_by_sport,
+            upcoming_count=sum(section['count'] for section in matches_by_sport.values()),
+        )
+
+
+def encode_cursor(match):
+    """Курсор страницы: время начала в микросекундах от эпохи и id последнего матча"""
+    return f'{(match.commence_time - EPOCH) // timedelta(microseconds=1)}.{match.id}'
+
+
+def decode_cursor(cursor):
+    """(commence_time, id) из курсора. ValueError, если курсор некорректный"""
+    microseconds, match_id = cursor.split('.')
+    match_id = int(match_id)
+    # id матча - BigAutoField: большее число не пройдет в запрос
+    if not 0 <= match_id < 2 ** 63:
+        raise ValueError(f'Некорректный курсор: {cursor}')
+    try:
+        # Время за пределами datetime - OverflowError, а не ValueError
+        return EPOCH + timedelta(microseconds=int(microseconds)), match_id
+    except (OverflowError, OSError) as e:
+        raise ValueError(f'Некорректный курсор: {cursor}') from e
+
+
+match_board = MatchBoard()
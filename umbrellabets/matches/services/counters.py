@@ -0,0 +1,71 @@
+from django.db import transaction
+from django.db.models import F
+from ..models import Match, Bet, PlatformCounter
+
+# Счетчики платформы
+MATCHES = 'matches'
+BETS = 'bets'
+BETTORS = 'bettors'  # игроки, сделавшие хотя бы одну ставку
+
+
+class PlatformCounters:
+    """
+    Счетчики статистики платформы вместо COUNT(*) на каждый запрос.
+    Создание матчей и размещение ставок увеличивают счетчики атомарным
+    UPDATE в своей транзакции, чтение всех счетчиков - один запрос по
+    маленькой таблице. Удаления и правки в обход сервисов счетчики не
+    отслеживают: их исправляет периодическая сверка (reconcile).
+    """
+
+    NAMES = [MATCHES, BETS, BETTORS]
+
+    def get(self):
+        """{счетчик: значение}, отсутствующие счетчики - 0"""
+        values = dict.fromkeys(self.NAMES, 0)
+        values.update(PlatformCounter.objects.filter(name__in=self.NAMES).values_list('name', 'value'))
+        return values
+
+    def increment(self, name, delta=1):
+        """Изменить счетчик на delta"""
+        if not delta:
+            return
+        updated = PlatformCounter.objects.filter(name=name).update(value=F('value') + delta)
+        if not updated:
+            PlatformCounter.objects.bulk_create([PlatformCounter(name=name)], ignore_conflicts=True)
+            PlatformCounter.objects.filter(name=name).update(value=F('value') + delta)
+
+    def count(self):
+        """Точные значения счетчиков по таблицам"""
+        return {
+            MATCHES: Match.objects.count(),
+            BETS: Bet.objects.count(),
+            BETTORS: Bet.objects.values('user_id').distinct().count(),
+        }
+
+    def reconcile(self):
+        """
+        Сверить счетчики с таблицами и исправить расхождения.
+        Возвращает {счетчик: расхождение} по исправленным счетчикам.
+        COUNT по таблицам выполняется без блокировок: строки счетчиков
+        блокируются только на короткую запись значений, и размещение ставок
+        не ждет окончания сканирования. Приращения ставок, попавших между
+        подсчетом и записью, могут дать расхождение в несколько единиц -
+        его исправит следующая сверка
+        """
+        counted = self.count()
+
+        with transaction.atomic():
+            for name in self.NAMES:
+                PlatformCounter.objects.get_or_create(name=name)
+            stored = dict(
+                PlatformCounter.objects.select_for_update().filter(name__in=self.NAMES).values_list('name', 'value')
+            )
+
+            drift = {}
+            for name, value in counted.items():
+                if stored[name] != value:
+                    drift[name] = value - stored[name]
+                    PlatformCounter.objects.filter(name=name).update(value=value)
+        return drift
+
+platform_counters = PlatformCounters()
@@ -0,0 +1,279 @@
+import hashlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from .best_prices import update_best_prices
+from .counters import MATCHES, platform_counters
+from .odds_history import OddsHistoryService
+from .odds_index import best_odds_index
+from .versions import SYNC_VERSION, BOARD_VERSION, bump_version, get_version
+from ..models import Sport, Match, Bookmaker, Odds, SyncState
+from ..push import push_broker
+
+
+@dataclass
+class OddsRecord:
+    """Нормализованный коэффициент от провайдера"""
+    bookmaker_key: str
+    bookmaker_title: str
+    outcome: str
+    price: Decimal
+
+    @property
+    def content_hash(self):
+        return content_hash(self.price.quantize(Decimal('0.01')))
+
+
+@dataclass
+class MatchRecord:
+    """Нормализованный матч от провайдера"""
+    api_id: str
+    home_team: str
+    away_team: str
+    commence_time: datetime
+    status: str
+    odds: list = field(default_factory=list)
+    modified_at: datetime = None  # время изменения у провайдера, если известно
+
+    @property
+    def content_hash(self):
+        return content_hash(self.home_team, self.away_team, self.commence_time.isoformat(), self.status)
+
+
+def content_hash(*values):
+    """Хэш значимых полей записи для обнаружения изменений"""
+    return hashlib.md5('|'.join(str(value) for value in values).encode()).hexdigest()
+
+
+class IngestionService:
+    """
+    Запись матчей и коэффициентов от любого провайдера (providers.Provider) в БД.
+    Пачка нормализуется в памяти и сравнивается с сохраненными хэшами
+    (content_hash). Записываются только новые и измененные строки двумя
+    bulk upsert (INSERT ... ON CONFLICT DO UPDATE): матчи по api_id,
+    коэффициенты по (match, bookmaker, outcome). Лучшие цены матчей
+    с новыми коэффициентами пересчитываются одним UPDATE, новые цены
+    дописываются в историю (OddsTick). Число запросов не зависит от
+    размера пачки.
+    """
+
+    MATCH_UPDATE_FIELDS = ['sport', 'home_team', 'away_team', 'commence_time', 'status',
+                           'content_hash', 'updated_at']
+    ODDS_UPDATE_FIELDS = ['price', 'content_hash', 'last_update']
+
+    STATS_KEYS = ['fetched', 'inserted', 'updated', 'skipped', 'odds', 'odds_skipped']
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+
+    def sync(self, provider, sport_keys, full=False, **options):
+        """
+        Синхронизация провайдера: страницы загружаются параллельно
+        и записываются по одной в текущем потоке, не дожидаясь остальных.
+        Матчи запрашиваются начиная с курсора прошлой синхронизации
+        (SyncState <провайдер>:<спорт>), если провайдер отдает modified_at;
+        full=True загружает все заново. Курсор сдвигается только после
+        полной загрузки: без ошибок, окна по времени начала и max_pages.
+        options передаются провайдеру. Возвращает {спорт: статистика записи}
+        """
+        print(f"Загрузка матчей {provider.KEY} для {', '.join(sport_keys)}...")
+
+        # Создаем или получаем спорт
+        sports = {}
+        states = {}
+        for sport_key in sport_keys:
+            sports[sport_key], created = Sport.objects.get_or_create(
+                key=sport_key,
+                defaults={
+                    'title': provider.sport_title(sport_key),
+                    'active': True
+                }
+            )
+            states[sport_key], created = SyncState.objects.get_or_create(key=f'{provider.KEY}:{sport_key}')
+
+        modified_since = {} if full else {sport_key: state.cursor for sport_key, state in states.items()}
+        cursors = {}
+        failed = set()
+
+        results = {sport_key: dict.fromkeys(self.STATS_KEYS, 0) for sport_key in sport_keys}
+
+        for sport_key, page in provider.stream(sport_keys, modified_since=modified_since, failed=failed,
+                                               **options):
+            records = provider.to_records(page)
+            stats = self.ingest(sports[sport_key], records)
+            for key in self.STATS_KEYS:
+                results[sport_key][key] += stats[key]
+
+            # Курсор двигают только предстоящие матчи: текущие загружаются
+            # целиком и без сортировки по modified_at
+            modified = [record.modified_at for record in records
+                        if record.modified_at and record.status == 'upcoming']
+            if modified:
+                cursors[sport_key] = max([cursors.get(sport_key, modified[0])] + modified)
+
+        # Загрузка в окне по времени начала не видит матчи вне окна, а
+        # оборванная (ошибка API, max_pages) - непрочитанные страницы:
+        # курсор по ним двигать нельзя, иначе эти матчи останутся позади него
+        if not (options.get('begin_at') or options.get('end_at') or options.get('max_pages')):
+            for sport_key, cursor in cursors.items():
+                if sport_key in failed:
+                    print(f"⚠️ {sport_key}: загрузка оборвалась, курсор синхронизации не сдвинут")
+                    continue
+                if states[sport_key].cursor is None or cursor > states[sport_key].cursor:
+                    states[sport_key].cursor = cursor
+                    states[sport_key].save(update_fields=['cursor', 'updated_at'])
+
+        for sport_key, stats in results.items():
+            print(f"✅ {sport_key}: получено {stats['fetched']}, создано {stats['inserted']}, "
+                  f"🔄 изменено {stats['updated']}, ⏭️ без изменений {stats['skipped']}, "
+                  f"коэффициентов записано {stats['odds']} (пропущено {stats['odds_skipped']})")
+        return results
+
+    def ingest(self, sport, records):
+        """
+        Записать матчи одного вида спорта.
+        Возвращает {'fetched': ..., 'inserted': ..., 'updated': ..., 'skipped': ...,
+                    'odds': ..., 'odds_skipped': ...}
+        """
+        stats = {'fetched': len(records), 'inserted': 0, 'updated': 0, 'skipped': 0,
+                 'odds': 0, 'odds_skipped': 0}
+
+        # Повторы одного матча в пачке - побеждает последний
+        records = list({record.api_id: record for record in records}.values())
+        if not records:
+            return stats
+
+        api_ids = [record.api_id for record in records]
+
+        with transaction.atomic():
+            bookmakers = self._bookmakers(records)
+
+            stored = {
+                api_id: (match_id, stored_hash)
+                for api_id, match_id, stored_hash in Match.objects.filter(
+                    api_id__in=api_ids
+                ).order_by().values_list('api_id', 'id', 'content_hash')
+            }
+
+            changed = [
+                record for record in records
+                if record.api_id not in stored or stored[record.api_id][1] != record.content_hash
+            ]
+            if changed:
+                Match.objects.bulk_create(
+                    [
+                        Match(
+                            api_id=record.api_id,
+                            sport=sport,
+                            home_team=record.home_team,
+                            away_team=record.away_team,
+                            commence_time=record.commence_time,
+                            status=record.status,
+                            content_hash=record.content_hash,
+                        )
+                        for record in changed
+                    ],
+                    batch_size=self.batch_size,
+                    update_conflicts=True,
+                    unique_fields=['api_id'],
+                    update_fields=self.MATCH_UPDATE_FIELDS,
+                )
+
+            match_ids = {api_id: match_id for api_id, (match_id, stored_hash) in stored.items()}
+            inserted = [record.api_id for record in changed if record.api_id not in stored]
+            if inserted:
+                match_ids.update(
+                    Match.objects.filter(api_id__in=inserted).order_by().values_list('api_id', 'id')
+                )
+                platform_counters.increment(MATCHES, len(inserted))
+
+            stored_odds = {
+                (match_id, bookmaker_id, outcome): stored_hash
+                for match_id, bookmaker_id, outcome, stored_hash in Odds.objects.filter(
+                    match_id__in=match_ids.values()
+                ).order_by().values_list('match_id', 'bookmaker_id', 'outcome', 'content_hash')
+            }
+
+            now = timezone.now()
+            odds = {}
+            for record in records:
+                for odds_record in record.odds:
+                    key = (match_ids[record.api_id], bookmakers[odds_record.bookmaker_key], odds_record.outcome)
+                    odds[key] = Odds(
+                        match_id=key[0],
+                        bookmaker_id=key[1],
+                        outcome=key[2],
+                        price=odds_record.price,
+                        content_hash=odds_record.content_hash,
+                        last_update=now,
+                    )
+
+            changed_odds = [
+                odds_row for key, odds_row in odds.items()
+                if stored_odds.get(key) != odds_row.content_hash
+            ]
+            if changed_odds:
+                Odds.objects.bulk_create(
+                    changed_odds,
+                    batch_size=self.batch_size,
+                    update_conflicts=True,
+                    unique_fields=['match', 'bookmaker', 'outcome'],
+                    update_fields=self.ODDS_UPDATE_FIELDS,
+                )
+
+                # Лучшие цены в колонках матча меняются той же транзакцией
+                update_best_prices(list({odds_row.match_id for odds_row in changed_odds}))
+
+                # Каждое изменение цены дописывается в историю той же транзакцией
+                OddsHistoryService(self.batch_size).record(changed_odds, recorded_at=now)
+
+        stats['inserted'] = len(inserted)
+        stats['updated'] = len(changed) - len(inserted)
+        stats['skipped'] = len(records) - len(changed)
+        stats['odds'] = len(changed_odds)
+        stats['odds_skipped'] = len(odds) - len(changed_odds)
+
+        # Новая версия синхронизации сбрасывает индекс лучших цен в других процессах,
+        # а в этом процессе индекс обновляется только по матчам с новыми ценами.
+        # Если ничего не изменилось, кэши остаются действительными
+        if changed or changed_odds:
+            previous = get_version(SYNC_VERSION)
+            best_odds_index.refresh(
+                list({odds_row.match_id for odds_row in changed_odds}),
+                version=bump_version(SYNC_VERSION, BOARD_VERSION),
+                previous=previous,
+            )
+
+            # Подписчики /stream/ этого процесса получают изменения сразу,
+            # остальные процессы - через PushPoller
+            push_broker.publish_matches(list(
+                {match_ids[record.api_id] for record in changed} | {odds_row.match_id for odds_row in changed_odds}
+            ))
+
+        return stats
+
+    def _bookmakers(self, records):
+        """id букмекеров пачки по ключу, недостающие создаются"""
+        titles = {
+            odds_record.bookmaker_key: odds_record.bookmaker_title
+            for record in records
+            for odds_record in record.odds
+        }
+        if not titles:
+            return {}
+
+        bookmakers = dict(
+            Bookmaker.objects.filter(key__in=titles).values_list('key', 'id')
+        )
+        missing = [key for key in titles if key not in bookmakers]
+        if missing:
+            Bookmaker.objects.bulk_create(
+                [Bookmaker(key=key, title=titles[key], active=True) for key in missing],
+                ignore_conflicts=True,
+            )
+            bookmakers = dict(
+                Bookmaker.objects.filter(key__in=titles).values_list('key', 'id')
+            )
+        return bookmakers
@@ -0,0 +1,71 @@
+import json
+from django.db.models import Count, Q
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .board import best_odds_list
+from .odds_analytics import odds_analytics
+from ..models import Match, Odds, Bet
+
+
+class MatchDetail:
+    """
+    Данные страницы матча с фиксированным числом запросов:
+    матч с видом спорта, коэффициенты с букмекерами (один запрос, из него
+    же лучшие цены и JSON для калькулятора) и распределение ставок по
+    исходам одним условным агрегатом. Аналитика берется из кеша версии
+    синхронизации. Число запросов не зависит от количества букмекеров и ставок.
+    """
+
+    def __init__(self, match_id):
+        self.match = get_object_or_404(Match.objects.select_related('sport'), id=match_id)
+
+        self.odds = list(
+            Odds.objects.filter(match=self.match).select_related('bookmaker').order_by('outcome', '-price', 'id')
+        )
+        self.best = {}
+        for odds in self.odds:
+            # Строки отсортированы по убыванию цены: первая строка исхода - лучшая
+            self.best.setdefault(odds.outcome, {
+                'odds_id': odds.id,
+                'price': odds.price,
+                'bookmaker_id': odds.bookmaker_id,
+                'bookmaker': odds.bookmaker.title,
+            })
+
+        self.analytics = odds_analytics.get(self.match.id)
+        self.best_odds = best_odds_list(self.best, self.analytics)
+
+    @cached_property
+    def bets(self):
+        """Распределение ставок по исходам: {'total': ..., 'home': ..., 'away': ...}"""
+        return Bet.objects.filter(match=self.match).aggregate(
+            total=Count('id'),
+            **{outcome: Count('id', filter=Q(outcome=outcome)) for outcome, label in Bet.OUTCOME_CHOICES}
+        )
+
+    def percentage(self, outcome):
+        """Доля ставок на исход, % (50 без ставок)"""
+        total = self.bets['total']
+        return round(self.bets[outcome] / total * 100, 1) if total else 50
+
+    def odds_json(self):
+        """Коэффициенты для JavaScript (без локализации)"""
+        return json.dumps({odds['odds_id']: float(odds['price']) for odds in self.best_odds})
+
+    def context(self):
+        match = self.match
+        return {
+            'match': match,
+            'home_odds': self.best.get('home'),
+            'away_odds': self.best.get('away'),
+            'odds_json': self.odds_json(),
+            'best_odds': self.best_odds,
+            'analytics': self.analytics,
+            'total_bets': self.bets['total'],
+            'home_percentage': self.percentage('home'),
+            'away_percentage': self.percentage('away'),
+            # Проверить, может ли пользователь делать ставки
+            'can_bet': match.commence_time > timezone.now() and match.status == 'upcoming',
+            'odds': self.odds,
+        }
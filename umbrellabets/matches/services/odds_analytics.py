@@ -0,0 +1,129 @@
+import threading
+import numpy as np
+from django.core.cache import cache
+from .versions import SYNC_VERSION, get_version
+from ..models import Odds
+
+
+class OddsAnalytics:
+    """
+    Аналитика коэффициентов по всей линии (предстоящие и live матчи).
+    Коэффициенты загружаются одним запросом в массив
+    матчи × букмекеры × исходы, метрики считаются векторно:
+      overround      - средняя маржа букмекеров с полной линией по матчу, %;
+      best_overround - маржа по лучшим ценам (меньше нуля - вилка), %;
+      probability    - консенсус-вероятность исхода без маржи, %;
+      consensus      - справедливая цена по консенсус-вероятности;
+      best           - лучшая цена на исход.
+    Результат кешируется по версии синхронизации: в кеше Django (общий для
+    процессов) и в памяти процесса. В кеше Django хранится одна запись
+    (версия, метрики) под постоянным ключом: новая версия перезаписывает
+    старую, и записи прошлых версий не копятся.
+    """
+
+    OUTCOMES = [outcome for outcome, label in Odds.OUTCOME_CHOICES]
+    STATUSES = ['upcoming', 'live']
+    CACHE_KEY = 'matches:odds_analytics'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._board = {}
+
+    def get(self, match_id):
+        """Метрики матча или {}, если по матчу нет коэффициентов"""
+        return self.board().get(match_id, {})
+
+    def get_many(self, match_ids):
+        board = self.board()
+        return {match_id: board.get(match_id, {}) for match_id in match_ids}
+
+    def board(self):
+        """{match_id: метрики} для текущей версии синхронизации"""
+        version = get_version(SYNC_VERSION)
+        if version == self._version:
+            return self._board
+
+        cached = cache.get(self.CACHE_KEY)
+        if cached is not None and cached[0] == version:
+            board = cached[1]
+        else:
+            board = self.compute()
+            cache.set(self.CACHE_KEY, (version, board), timeout=None)
+
+        with self._lock:
+            self._version = version
+            self._board = board
+        return board
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            self._board = {}
+
+    def compute(self):
+        """Посчитать метрики по всей линии"""
+        rows = Odds.objects.filter(match__status__in=self.STATUSES).order_by().values_list(
+            'match_id', 'bookmaker_id', 'outcome', 'price'
+        )
+        match_column, bookmaker_column, outcome_column, price_column = [], [], [], []
+        outcome_index = {outcome: index for index, outcome in enumerate(self.OUTCOMES)}
+        for match_id, bookmaker_id, outcome, price in rows:
+            match_column.append(match_id)
+            bookmaker_column.append(bookmaker_id)
+            outcome_column.append(outcome_index[outcome])
+            price_column.append(float(price))
+
+        if not match_column:
+            return {}
+
+        match_ids, match_index = np.unique(np.array(match_column), return_inverse=True)
+        bookmaker_ids, bookmaker_index = np.unique(np.array(bookmaker_column), return_inverse=True)
+
+        prices = np.full((len(match_ids), len(bookmaker_ids), len(self.OUTCOMES)), np.nan)
+        prices[match_index, bookmaker_index, np.array(outcome_column)] = price_column
+        quoted = ~np.isnan(prices)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Исходы матча - те, на которые есть цена хоть у одного букмекера.
+            # Маржу и консенсус считаем только по букмекерам с полной линией
+            match_outcomes = quoted.any(axis=1)
+            outcome_count = match_outcomes.sum(axis=1)
+            complete = (quoted.sum(axis=2) == outcome_count[:, None]) & (outcome_count[:, None] >= 2)
+            complete_count = complete.sum(axis=1)
+
+            implied = np.where(quoted, 1.0 / prices, 0.0)
+            book_sum = implied.sum(axis=2)
+
+            overround = np.where(complete, book_sum - 1.0, 0.0).sum(axis=1) / complete_count
+
+            fair = np.where(complete[:, :, None], implied / book_sum[:, :, None], 0.0)
+            probability = fair.sum(axis=1) / complete_count[:, None]
+            consensus = 1.0 / probability
+
+            best = np.where(quoted, prices, -np.inf).max(axis=1)
+            best_overround = np.where(match_outcomes, 1.0 / best, 0.0).sum(axis=1) - 1.0
+
+        board = {}
+        for row, match_id in enumerate(match_ids.tolist()):
+            has_consensus = bool(complete_count[row])
+            outcomes = {}
+            for column, outcome in enumerate(self.OUTCOMES):
+                if not match_outcomes[row, column]:
+                    continue
+                outcomes[outcome] = {
+                    'best': round(float(best[row, column]), 2),
+                    'probability': round(float(probability[row, column]) * 100, 1) if has_consensus else None,
+                    'consensus': round(float(consensus[row, column]), 2) if has_consensus else None,
+                }
+
+            board[match_id] = {
+                'outcomes': outcomes,
+                'bookmakers': int(quoted[row].any(axis=1).sum()),
+                'overround': round(float(overround[row]) * 100, 2) if has_consensus else None,
+                'best_overround': round(float(best_overround[row]) * 100, 2),
+            }
+        return board
+
+
+odds_analytics = OddsAnalytics()
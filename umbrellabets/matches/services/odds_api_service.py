@@ -0,0 +1,80 @@
+from decimal import Decimal
+from django.conf import settings
+from django.utils import timezone
+from datetime import datetime
+from .ingestion import MatchRecord, OddsRecord
+from .providers import Provider
+
+
+class OddsAPIService(Provider):
+    KEY = 'oddsapi'
+    SETTINGS_PREFIX = 'ODDS_API'
+    BASE_URL = "https://api.the-odds-api.com/v4"
+
+    def get_sports(self):
+        """Получить список доступных видов спорта"""
+        response = self._get("/sports", {'apiKey': settings.ODDS_API_KEY})
+
+        if response is not None and response.status_code == 200:
+            return response.json()
+        return []
+
+    def get_odds(self, sport_key='cs2', regions='eu', markets='h2h'):
+        """Получить коэффициенты для конкретного спорта"""
+        params = {
+            'apiKey': settings.ODDS_API_KEY,
+            'regions': regions,
+            'markets': markets,
+            'oddsFormat': 'decimal',
+            'dateFormat': 'iso'
+        }
+
+        response = self._get(f"/sports/{sport_key}/odds", params)
+
+        if response is not None and response.status_code == 200:
+            return response.json()
+        elif response is not None:
+            print(f"Ошибка получения коэффициентов: {response.status_code} - {response.text}")
+        return []
+
+    def fetch_jobs(self, sport_key, modified_since=None, regions='eu', **options):
+        """Odds API отдает все матчи спорта одним ответом и не умеет modified_since"""
+        return [lambda: [self.get_odds(sport_key, regions=regions)]]
+
+    def sync_matches_and_odds(self, sport_key='cs2'):
+        """Синхронизация матчей и коэффициентов"""
+        return self.sync([sport_key])[sport_key]
+
+    def to_record(self, match_data):
+        """Преобразовать событие Odds API в нормализованную запись"""
+        commence_time = datetime.fromisoformat(match_data['commence_time'].replace('Z', '+00:00'))
+        home_team = match_data['home_team']
+        away_team = match_data['away_team']
+
+        outcomes = {home_team: 'home', away_team: 'away', 'Draw': 'draw'}
+
+        odds = []
+        for bookmaker_data in match_data.get('bookmakers', []):
+            # Обрабатываем рынки
+            for market in bookmaker_data.get('markets', []):
+                if market['key'] != 'h2h':  # Head to head
+                    continue
+
+                for outcome in market['outcomes']:
+                    if outcome['name'] not in outcomes:
+                        continue
+                    odds.append(OddsRecord(
+                        bookmaker_data['key'],
+                        bookmaker_data['title'],
+                        outcomes[outcome['name']],
+                        Decimal(str(outcome['price'])),
+                    ))
+
+        return MatchRecord(
+            api_id=match_data['id'],
+            home_team=home_team,
+            away_team=away_team,
+            commence_time=commence_time,
+            status='upcoming' if commence_time > timezone.now() else 'live',
+            odds=odds,
+        )
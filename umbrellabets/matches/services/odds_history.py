@@ -0,0 +1,131 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from ..models import OddsTick, OddsCandle
+
+
+class OddsHistoryService:
+    """
+    История коэффициентов.
+    Каждое изменение цены при синхронизации дописывается в OddsTick одной
+    пачкой. Старые дни прореживаются в поминутные свечи OddsCandle,
+    после чего сырые строки дня удаляются.
+    """
+
+    OUTCOMES = {code: outcome for outcome, code in OddsTick.OUTCOME_CODES.items()}
+
+    def __init__(self, batch_size=5000):
+        self.batch_size = batch_size
+
+    def record(self, odds, recorded_at=None):
+        """Дописать в историю новые цены (строки Odds). Возвращает количество строк"""
+        recorded_at = recorded_at or timezone.now()
+        day = timezone.localdate(recorded_at)
+
+        ticks = OddsTick.objects.bulk_create(
+            [
+                OddsTick(
+                    match_id=odds_row.match_id,
+                    bookmaker_id=odds_row.bookmaker_id,
+                    outcome=OddsTick.OUTCOME_CODES[odds_row.outcome],
+                    price=odds_row.price,
+                    recorded_at=recorded_at,
+                    day=day,
+                )
+                for odds_row in odds
+            ],
+            batch_size=self.batch_size,
+        )
+        return len(ticks)
+
+    def price_series(self, match_id, start=None, end=None, resolution='tick'):
+        """
+        Ряд цен матча по времени одним проходом по индексу (match_id, время).
+        resolution='tick' - каждое изменение: {'time', 'bookmaker_id', 'outcome', 'price'};
+        resolution='minute' - прореженные свечи: {'time', 'bookmaker_id', 'outcome',
+        'open', 'high', 'low', 'close', 'ticks'}
+        """
+        if resolution == 'minute':
+            model, time_field, fields = OddsCandle, 'minute', ['open', 'high', 'low', 'close', 'ticks']
+        else:
+            model, time_field, fields = OddsTick, 'recorded_at', ['price']
+
+        queryset = model.objects.filter(match_id=match_id)
+        if start:
+            queryset = queryset.filter(**{f'{time_field}__gte': start})
+        if end:
+            queryset = queryset.filter(**{f'{time_field}__lt': end})
+
+        series = []
+        for row in queryset.order_by(time_field, 'id').values(time_field, 'bookmaker_id', 'outcome', *fields):
+            row['time'] = row.pop(time_field)
+            row['outcome'] = self.OUTCOMES[row['outcome']]
+            series.append(row)
+        return series
+
+    def downsample(self, older_than_days=None):
+        """
+        Прорядить дни старше older_than_days (по умолчанию
+        BET_SETTINGS['ODDS_HISTORY_RAW_DAYS']) в поминутные свечи.
+        Каждый день обрабатывается в своей транзакции.
+        Возвращает {'days': ..., 'ticks': ..., 'candles': ...}
+        """
+        if older_than_days is None:
+            older_than_days = settings.BET_SETTINGS.get('ODDS_HISTORY_RAW_DAYS', 7)
+        cutoff = timezone.localdate() - timedelta(days=older_than_days)
+
+        stats = {'days': 0, 'ticks': 0, 'candles': 0}
+        days = OddsTick.objects.filter(day__lt=cutoff).order_by('day').values_list('day', flat=True).distinct()
+        for day in list(days):
+            ticks, candles = self.downsample_day(day)
+            stats['days'] += 1
+            stats['ticks'] += ticks
+            stats['candles'] += candles
+        return stats
+
+    def downsample_day(self, day):
+        """Свернуть сырые строки дня в свечи и удалить их. Возвращает (строк, свечей)"""
+        with transaction.atomic():
+            ticks = OddsTick.objects.filter(day=day).order_by(
+                'match_id', 'bookmaker_id', 'outcome', 'recorded_at', 'id'
+            ).values_list('match_id', 'bookmaker_id', 'outcome', 'recorded_at', 'price')
+
+            candles = []
+            count = 0
+            saved = 0
+            candle = None
+            for match_id, bookmaker_id, outcome, recorded_at, price in ticks.iterator(chunk_size=self.batch_size):
+                count += 1
+                minute = recorded_at.replace(second=0, microsecond=0)
+
+                if candle is None or (candle.match_id, candle.bookmaker_id, candle.outcome, candle.minute) != (
+                    match_id, bookmaker_id, outcome, minute
+                ):
+                    # Готовые свечи пишутся пачками, чтобы не держать в памяти весь день
+                    if len(candles) >= self.batch_size:
+                        OddsCandle.objects.bulk_create(candles)
+                        saved += len(candles)
+                        candles = []
+
+                    candle = OddsCandle(
+                        match_id=match_id,
+                        bookmaker_id=bookmaker_id,
+                        outcome=outcome,
+                        minute=minute,
+                        open=price,
+                        high=price,
+                        low=price,
+                        ticks=0,
+                    )
+                    candles.append(candle)
+
+                candle.high = max(candle.high, price)
+                candle.low = min(candle.low, price)
+                candle.close = price
+                candle.ticks += 1
+
+            OddsCandle.objects.bulk_create(candles)
+            OddsTick.objects.filter(day=day).delete()
+
+        return count, saved + len(candles)
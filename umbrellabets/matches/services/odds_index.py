@@ -0,0 +1,88 @@
+import threading
+from .versions import SYNC_VERSION, get_version
+from ..models import Odds
+
+
+class BestOddsIndex:
+    """
+    Индекс лучших коэффициентов в памяти процесса:
+    {match_id: {outcome: {'odds_id', 'price', 'bookmaker_id', 'bookmaker'}}}.
+
+    Матчи подгружаются лениво одним запросом на пачку. Синхронизация в этом
+    процессе обновляет только затронутые матчи (refresh), а смена версии
+    синхронизации в кеше сбрасывает индекс во всех остальных процессах.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._version = None
+
+    def get(self, match_id):
+        """Лучшие коэффициенты матча по исходам"""
+        return self.get_many([match_id])[match_id]
+
+    def get_many(self, match_ids):
+        """Лучшие коэффициенты для нескольких матчей"""
+        self._check_version()
+
+        missing = [match_id for match_id in match_ids if match_id not in self._entries]
+        if missing:
+            self._store(self._load(missing))
+
+        return {match_id: self._entries.get(match_id, {}) for match_id in match_ids}
+
+    def best(self, match_id, outcome):
+        """Лучший коэффициент на исход или None"""
+        return self.get(match_id).get(outcome)
+
+    def refresh(self, match_ids, version=None, previous=None):
+        """
+        Перечитать затронутые синхронизацией матчи.
+        Если передана новая версия, индекс принимает ее без полного сброса,
+        только когда он был актуален для предыдущей версии (previous).
+        Иначе индекс пропустил синхронизацию другого процесса и сбрасывается.
+        """
+        entries = self._load(match_ids)
+        with self._lock:
+            if version is not None:
+                if previous is None or previous != self._version:
+                    self._entries = {}
+                self._version = version
+            self._entries.update(entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._version = None
+
+    def _check_version(self):
+        version = get_version(SYNC_VERSION)
+        if version != self._version:
+            with self._lock:
+                self._entries = {}
+                self._version = version
+
+    def _store(self, entries):
+        with self._lock:
+            self._entries.update(entries)
+
+    def _load(self, match_ids):
+        entries = {match_id: {} for match_id in match_ids}
+        rows = Odds.objects.filter(match_id__in=match_ids).values_list(
+            'id', 'match_id', 'outcome', 'price', 'bookmaker_id', 'bookmaker__title'
+        )
+        for odds_id, match_id, outcome, price, bookmaker_id, bookmaker in rows:
+            current = entries[match_id].get(outcome)
+            if current is None or price > current['price']:
+                entries[match_id][outcome] = {
+                    'odds_id': odds_id,
+                    'price': price,
+                    'bookmaker_id': bookmaker_id,
+                    'bookmaker': bookmaker,
+                }
+        return entries
+
+
+# Общий индекс процесса
+best_odds_index = BestOddsIndex()
@@ -1,35 +1,50 @@
+import random
 import requests
 from decimal import Decimal
 from django.conf import settings
 from django.utils import timezone
-from datetime import datetime
-from ..models import Sport, Match, Bookmaker, Odds
+from datetime import datetime, timedelta
+from .ingestion import MatchRecord, OddsRecord
+from .providers import FetchIncomplete, Provider
 
 
-class PandaScoreService:
+class PandaScoreService(Provider):
+    KEY = 'pandascore'
+    SETTINGS_PREFIX = 'PANDASCORE'
     BASE_URL = "https://api.pandascore.co"
 
-    def __init__(self):
-        self.api_key = settings.PANDASCORE_API_KEY
-        self.headers = {
-            'Authorization': f'Bearer {self.api_key}',
+    SPORT_TITLES = {
+        'cs-go': 'CS2',
+        'dota2': 'Dota 2',
+        'lol': 'League of Legends',
+        'valorant': 'Valorant'
+    }
+
+    # Максимальный размер страницы PandaScore
+    PAGE_SIZE = 100
+
+    # Букмекер, под которым записываются коэффициенты PandaScore
+    BOOKMAKER_KEY = 'ggbet'
+    BOOKMAKER_TITLE = 'ggbet'
+
+    def get_headers(self):
+        return {
+            'Authorization': f'Bearer {settings.PANDASCORE_API_KEY}',
             'Accept': 'application/json'
         }
 
     def get_videogames(self):
         """Получить список поддерживаемых игр"""
-        url = f"{self.BASE_URL}/videogames"
-        response = requests.get(url, headers=self.headers)
+        response = self._get("/videogames")
 
-        if response.status_code == 200:
+        if response is not None and response.status_code == 200:
             return response.json()
-        else:
+        elif response is not None:
             print(f"Ошибка получения игр: {response.status_code} - {response.text}")
-            return []
+        return []
 
     def get_upcoming_matches(self, videogame_slug=None, per_page=50):
         """Получить предстоящие матчи"""
-        url = f"{self.BASE_URL}/matches/upcoming"
         params = {
             'per_page': per_page,
             'sort': 'begin_at'
@@ -38,133 +53,148 @@ class PandaScoreService:
         if videogame_slug:
             params['filter[videogame]'] = videogame_slug
 
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self._get("/matches/upcoming", params)
 
-        if response.status_code == 200:
+        if response is not None and response.status_code == 200:
             return response.json()
-        else:
+        elif response is not None:
             print(f"Ошибка получения матчей: {response.status_code} - {response.text}")
-            return []
+        return []
+
+    def iter_upcoming_pages(self, videogame_slug=None, per_page=None, max_pages=None,
+                            begin_at=None, end_at=None, modified_since=None, sort=None):
+        """
+        Генератор страниц предстоящих матчей.
+        Идет по ссылке rel="next" из заголовка Link, пока она есть,
+        или до max_pages страниц. begin_at/end_at ограничивают окно
+        по времени начала (range[begin_at]), modified_since - только
+        матчи, измененные после этого времени (range[modified_at]).
+        sort - поле сортировки: по умолчанию begin_at, с modified_since -
+        modified_at. Ошибка запроса посреди загрузки - FetchIncomplete.
+        """
+        params = {
+            'per_page': per_page or self.PAGE_SIZE,
+            'sort': sort or ('modified_at' if modified_since else 'begin_at')
+        }
 
-    def get_running_matches(self, videogame_slug=None):
-        """Получить текущие матчи"""
-        url = f"{self.BASE_URL}/matches/running"
-        params = {}
+        if modified_since:
+            params['range[modified_at]'] = (
+                f"{self._format_time(modified_since)},"
+                f"{self._format_time(timezone.now() + timedelta(days=365))}"
+            )
 
         if videogame_slug:
             params['filter[videogame]'] = videogame_slug
 
-        response = requests.get(url, headers=self.headers, params=params)
-
-        if response.status_code == 200:
-            return response.json()
-        else:
-            print(f"Ошибка получения текущих матчей: {response.status_code}")
-            return []
-
-    def sync_matches_from_pandascore(self, videogame_slug):
-        """Синхронизация матчей из PandaScore"""
-        print(f"Синхронизация матчей для {videogame_slug}...")
-
-        # Создаем или получаем спорт
-        sport_mapping = {
-            'cs-go': 'CS2',
-            'dota2': 'Dota 2',
-            'lol': 'League of Legends',
-            'valorant': 'Valorant'
-        }
-
-        sport, created = Sport.objects.get_or_create(
-            key=videogame_slug,
-            defaults={
-                'title': sport_mapping.get(videogame_slug, videogame_slug.upper()),
-                'active': True
-            }
-        )
+        if begin_at or end_at:
+            begin_at = begin_at or timezone.now()
+            end_at = end_at or begin_at + timedelta(days=365)
+            params['range[begin_at]'] = f"{self._format_time(begin_at)},{self._format_time(end_at)}"
 
-        # Получаем предстоящие матчи
-        upcoming_matches = self.get_upcoming_matches(videogame_slug)
-        running_matches = self.get_running_matches(videogame_slug)
+        url = f"{self.base_url}/matches/upcoming"
+        pages = 0
+        while url and (max_pages is None or pages < max_pages):
+            try:
+                response = self.session.get(url, params=params, timeout=self.TIMEOUT)
+            except requests.RequestException as e:
+                raise FetchIncomplete(f"Ошибка соединения с PandaScore (страница {pages + 1}): {e}")
 
-        all_matches = upcoming_matches + running_matches
+            if response.status_code != 200:
+                raise FetchIncomplete(
+                    f"Ошибка получения матчей (страница {pages + 1}): {response.status_code} - {response.text}"
+                )
 
-        print(f"Найдено {len(all_matches)} матчей")
+            page = response.json()
+            if not page:
+                return
 
-        # Создаем букмекера PandaScore
-        bookmaker, created = Bookmaker.objects.get_or_create(
-            key='ggbet',
-            defaults={'title': 'ggbet', 'active': True}
-        )
+            pages += 1
+            yield page
 
-        for match_data in all_matches:
-            try:
-                # Парсим время начала
-                begin_at = match_data.get('begin_at')
-                if begin_at:
-                    commence_time = datetime.fromisoformat(begin_at.replace('Z', '+00:00'))
-                else:
-                    commence_time = timezone.now()
-
-                # Получаем команды
-                opponents = match_data.get('opponents', [])
-                if len(opponents) >= 2:
-                    home_team = opponents[0].get('opponent', {}).get('name', 'Team 1')
-                    away_team = opponents[1].get('opponent', {}).get('name', 'Team 2')
-                else:
-                    continue  # Пропускаем матчи без команд
-
-                # Определяем статус
-                status = 'upcoming'
-                if match_data.get('status') == 'running':
-                    status = 'live'
-                elif match_data.get('status') in ['finished', 'canceled']:
-                    status = 'completed'
-
-                # Создаем или обновляем матч
-                match, created = Match.objects.update_or_create(
-                    api_id=str(match_data['id']),
-                    defaults={
-                        'sport': sport,
-                        'home_team': home_team,
-                        'away_team': away_team,
-                        'commence_time': commence_time,
-                        'status': status
-                    }
-                )
+            # Ссылка на следующую страницу уже содержит все параметры
+            url = response.links.get('next', {}).get('url')
+            params = None
 
-                # Создаем базовые коэффициенты (PandaScore не всегда предоставляет коэффициенты в бесплатном тарифе)
-                # Генерируем реалистичные коэффициенты
-                import random
-                home_odds = round(random.uniform(1.4, 2.5), 2)
-                away_odds = round(random.uniform(1.4, 2.5), 2)
-
-                Odds.objects.update_or_create(
-                    match=match,
-                    bookmaker=bookmaker,
-                    outcome='home',
-                    defaults={
-                        'price': Decimal(str(home_odds)),
-                        'last_update': timezone.now()
-                    }
-                )
+    def get_running_matches(self, videogame_slug=None):
+        """Получить текущие матчи"""
+        params = {}
 
-                Odds.objects.update_or_create(
-                    match=match,
-                    bookmaker=bookmaker,
-                    outcome='away',
-                    defaults={
-                        'price': Decimal(str(away_odds)),
-                        'last_update': timezone.now()
-                    }
-                )
+        if videogame_slug:
+            params['filter[videogame]'] = videogame_slug
 
-                if created:
-                    print(f"✅ Создан матч: {home_team} vs {away_team}")
-                else:
-                    print(f"🔄 Обновлен матч: {home_team} vs {away_team}")
+        response = self._get("/matches/running", params)
 
-            except Exception as e:
-                print(f"❌ Ошибка обработки матча: {e}")
-                continue
+        if response is not None and response.status_code == 200:
+            return response.json()
+        elif response is not None:
+            print(f"Ошибка получения текущих матчей: {response.status_code}")
+        return []
+
+    def fetch_jobs(self, videogame_slug, modified_since=None, upcoming=True, running=True, **page_options):
+        """
+        Загрузчики игры: страницы предстоящих матчей (page_options передаются
+        в iter_upcoming_pages) и текущие матчи одной страницей.
+        Предстоящие матчи идут по возрастанию modified_at и при первой
+        загрузке: матч, измененный во время загрузки, переместится в конец
+        и будет прочитан, а не останется позади курсора синхронизации
+        """
+        jobs = []
+        if upcoming:
+            jobs.append(lambda: self.iter_upcoming_pages(
+                videogame_slug, modified_since=modified_since, sort='modified_at', **page_options
+            ))
+        if running:
+            jobs.append(lambda: [self.get_running_matches(videogame_slug)])
+        return jobs
+
+    def sync_matches_from_pandascore(self, videogame_slug, **page_options):
+        """Синхронизация матчей из PandaScore"""
+        return self.sync([videogame_slug], **page_options)[videogame_slug]
+
+    def to_record(self, match_data):
+        """Преобразовать матч PandaScore в нормализованную запись или None"""
+        # Парсим время начала
+        begin_at = match_data.get('begin_at')
+        if begin_at:
+            commence_time = datetime.fromisoformat(begin_at.replace('Z', '+00:00'))
+        else:
+            commence_time = timezone.now()
 
-        print(f"Синхронизация {videogame_slug} завершена!")
+        # Получаем команды
+        opponents = match_data.get('opponents', [])
+        if len(opponents) >= 2:
+            home_team = opponents[0].get('opponent', {}).get('name', 'Team 1')
+            away_team = opponents[1].get('opponent', {}).get('name', 'Team 2')
+        else:
+            return None  # Пропускаем матчи без команд
+
+        # Определяем статус
+        status = 'upcoming'
+        if match_data.get('status') == 'running':
+            status = 'live'
+        elif match_data.get('status') in ['finished', 'canceled']:
+            status = 'completed'
+
+        # Создаем базовые коэффициенты (PandaScore не всегда предоставляет коэффициенты в бесплатном тарифе)
+        # Генерируем реалистичные коэффициенты, одинаковые для матча от синхронизации
+        # к синхронизации, иначе каждый запуск перезаписывал бы все коэффициенты
+        rng = random.Random(match_data['id'])
+        home_odds = round(rng.uniform(1.4, 2.5), 2)
+        away_odds = round(rng.uniform(1.4, 2.5), 2)
+
+        modified_at = match_data.get('modified_at')
+        if modified_at:
+            modified_at = datetime.fromisoformat(modified_at.replace('Z', '+00:00'))
+
+        return MatchRecord(
+            api_id=str(match_data['id']),
+            home_team=home_team,
+            away_team=away_team,
+            commence_time=commence_time,
+            status=status,
+            odds=[
+                OddsRecord(self.BOOKMAKER_KEY, self.BOOKMAKER_TITLE, 'home', Decimal(str(home_odds))),
+                OddsRecord(self.BOOKMAKER_KEY, self.BOOKMAKER_TITLE, 'away', Decimal(str(away_odds))),
+            ],
+            modified_at=modified_at
+        )
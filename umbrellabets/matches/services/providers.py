@@ -0,0 +1,168 @@
+import queue
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone as dt_timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+from .ingestion import IngestionService
+
+
+class FetchIncomplete(Exception):
+    """Загрузка страниц оборвалась: часть матчей не прочитана"""
+
+
+class Provider:
+    """
+    Адаптер провайдера матчей и коэффициентов.
+    Провайдер только загружает данные и переводит их в MatchRecord/OddsRecord,
+    запись в БД делает IngestionService. Новый провайдер определяет:
+      KEY - ключ провайдера (курсоры синхронизации хранятся как KEY:спорт);
+      SETTINGS_PREFIX - префикс настроек <PREFIX>_BASE_URL, <PREFIX>_SYNC_CONCURRENCY;
+      fetch_jobs() - загрузчики страниц сырых матчей одного спорта;
+      to_record() - преобразование сырого матча.
+    """
+
+    KEY = None
+    SETTINGS_PREFIX = None
+    BASE_URL = None
+    SPORT_TITLES = {}
+
+    # Таймаут запроса к API, секунды
+    TIMEOUT = 30
+
+    # Повторы запроса при ошибках 429 и 5xx
+    RETRIES = 3
+
+    def __init__(self, base_url=None, concurrency=None):
+        self.base_url = (
+            base_url or getattr(settings, f'{self.SETTINGS_PREFIX}_BASE_URL', self.BASE_URL)
+        ).rstrip('/')
+        self.concurrency = concurrency or getattr(settings, f'{self.SETTINGS_PREFIX}_SYNC_CONCURRENCY', 8)
+
+        # Пул keep-alive соединений: TLS-рукопожатие один раз на соединение,
+        # а не на каждый запрос. Временные ошибки API повторяются с паузой,
+        # иначе одна ошибка обрывает постраничную загрузку
+        self.session = requests.Session()
+        self.session.headers.update(self.get_headers())
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.concurrency,
+            max_retries=Retry(
+                total=self.RETRIES,
+                backoff_factor=0.2,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=['GET'],
+                raise_on_status=False,
+            )
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_headers(self):
+        """Заголовки всех запросов к API"""
+        return {'Accept': 'application/json'}
+
+    def _get(self, path, params=None):
+        """GET к API. Возвращает ответ или None при сетевой ошибке"""
+        try:
+            return self.session.get(f"{self.base_url}{path}", params=params, timeout=self.TIMEOUT)
+        except requests.RequestException as e:
+            print(f"Ошибка соединения с {self.KEY} ({path}): {e}")
+            return None
+
+    def sport_title(self, sport_key):
+        return self.SPORT_TITLES.get(sport_key, sport_key.upper())
+
+    def fetch_jobs(self, sport_key, modified_since=None, **options):
+        """
+        Загрузчики одного спорта: список функций без аргументов, каждая
+        возвращает итерируемое страниц (списков сырых матчей)
+        """
+        raise NotImplementedError
+
+    def to_record(self, raw):
+        """Преобразовать сырой матч в MatchRecord или None, если матч пропускается"""
+        raise NotImplementedError
+
+    def to_records(self, page):
+        """Нормализовать страницу матчей, пропуская некорректные"""
+        records = []
+        for raw in page:
+            try:
+                record = self.to_record(raw)
+            except Exception as e:
+                print(f"❌ Ошибка обработки матча: {e}")
+                continue
+
+            if record is not None:
+                records.append(record)
+        return records
+
+    def stream(self, sport_keys, modified_since=None, failed=None, **options):
+        """
+        Генератор (спорт, страница сырых матчей) для нескольких видов спорта.
+        Страницы загружаются параллельно (не больше self.concurrency запросов
+        одновременно) и отдаются по мере поступления. Очередь ограничена,
+        поэтому загрузчики ждут, пока запись не разберет готовые страницы.
+        modified_since - {спорт: время} для инкрементальной загрузки,
+        в failed (множество) добавляются виды спорта, загрузка которых
+        оборвалась ошибкой. options передаются в fetch_jobs.
+        """
+        modified_since = modified_since or {}
+        pages = queue.Queue(maxsize=self.concurrency * 2)
+        stopped = threading.Event()
+        finished = object()
+
+        def put(item):
+            while not stopped.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce(sport_key, fetch):
+            try:
+                for page in fetch():
+                    if not put((sport_key, page)):
+                        return
+            except Exception as e:
+                print(f"❌ Ошибка загрузки матчей {sport_key}: {e}")
+                if failed is not None:
+                    failed.add(sport_key)
+            finally:
+                put((sport_key, finished))
+
+        jobs = [
+            (sport_key, fetch)
+            for sport_key in sport_keys
+            for fetch in self.fetch_jobs(sport_key, modified_since=modified_since.get(sport_key), **options)
+        ]
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for sport_key, fetch in jobs:
+                executor.submit(produce, sport_key, fetch)
+
+            try:
+                remaining = len(jobs)
+                while remaining:
+                    sport_key, page = pages.get()
+                    if page is finished:
+                        remaining -= 1
+                    elif page:
+                        yield sport_key, page
+            finally:
+                # Потребитель мог остановиться раньше - отпускаем загрузчиков
+                stopped.set()
+
+    def sync(self, sport_keys, full=False, **options):
+        """Синхронизировать виды спорта. Возвращает {спорт: статистика записи}"""
+        return IngestionService().sync(self, sport_keys, full=full, **options)
+
+    @staticmethod
+    def _format_time(value):
+        """Время в UTC в формате ISO 8601"""
+        return value.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
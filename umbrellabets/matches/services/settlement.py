@@ -0,0 +1,373 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+from ..models import Match, Bet, SettlementJob, SettlementCheckpoint
+
+
+class SettlementService:
+    """
+    Расчет ставок на матч.
+    Работает с набором ставок целиком: статусы обновляются массово,
+    каждому пользователю начисляется одна агрегированная выплата,
+    записи о транзакциях вставляются одним bulk_create.
+    Количество запросов зависит от числа пользователей, а не ставок.
+    """
+
+    def finish_match(self, match, winner, stream=None, chunk_size=None):
+        """
+        Завершить матч и рассчитать ставки.
+        Обычный расчет выполняется в одной транзакции вместе со сменой статуса.
+        Потоковый расчет фиксирует статус матча вместе с контрольной точкой,
+        а ставки рассчитывает отдельными транзакциями по частям; повторный
+        вызов после сбоя продолжает расчет с сохраненной контрольной точки.
+        """
+        with transaction.atomic():
+            locked = Match.objects.select_for_update().get(pk=match.pk)
+            if locked.status == 'completed' and locked.result:
+                checkpoint = SettlementCheckpoint.objects.filter(match=locked, completed=False).first()
+                if checkpoint is None:
+                    return False, "Матч уже завершен"
+                stream = True
+            else:
+                locked.status = 'completed'
+                locked.result = winner
+                locked.save(update_fields=['status', 'result', 'updated_at'])
+
+            match.status = locked.status
+            match.result = locked.result
+            match.updated_at = locked.updated_at
+
+            if stream is None:
+                stream = self.should_stream(locked)
+            if not stream:
+                return self.settle(locked, stream=False)
+
+            # Контрольная точка создается в транзакции смены статуса: иначе сбой
+            # между ними оставил бы завершенный матч, который никто не рассчитает
+            SettlementCheckpoint.objects.get_or_create(match=locked, defaults={'result': locked.result})
+
+        return self.settle(match, stream=True, chunk_size=chunk_size)
+
+    def settle(self, match, stream=None, chunk_size=None):
+        """Рассчитать все активные ставки на матч"""
+        if not match.result:
+            return False, "Результат матча не установлен"
+
+        if stream is None:
+            stream = self.should_stream(match)
+
+        if stream:
+            stats = self.settle_streaming(match, chunk_size)
+        else:
+            with transaction.atomic():
+                pending_bets = Bet.objects.filter(match=match, status='pending')
+                stats = self.settle_bets(match, pending_bets)
+
+        if match.result == 'cancelled':
+            return True, f"Матч отменен. Возвращены деньги по {stats['refunded']} ставкам"
+        return True, (
+            f"Обработано ставок: {stats['winners']} выигрышных, {stats['losers']} проигрышных. "
+            f"Выплачено: {stats['payout']} 🪙"
+        )
+
+    def should_stream(self, match):
+        """Крупные матчи рассчитываются потоково"""
+        threshold = settings.BET_SETTINGS.get('SETTLEMENT_STREAMING_THRESHOLD')
+        if not threshold:
+            return False
+        if SettlementCheckpoint.objects.filter(match=match, completed=False).exists():
+            return True
+        return Bet.objects.filter(match=match, status='pending').count() > threshold
+
+    def settle_streaming(self, match, chunk_size=None):
+        """
+        Потоковый расчет: активные ставки читаются частями по ключу id
+        (WHERE id > last ORDER BY id LIMIT n), каждая часть рассчитывается
+        и фиксируется в своей транзакции вместе с контрольной точкой.
+        В памяти держатся только id текущей части.
+        """
+        chunk_size = chunk_size or settings.BET_SETTINGS.get('SETTLEMENT_CHUNK_SIZE', 5000)
+
+        checkpoint, created = SettlementCheckpoint.objects.get_or_create(
+            match=match,
+            defaults={'result': match.result}
+        )
+
+        while True:
+            with transaction.atomic():
+                checkpoint = SettlementCheckpoint.objects.select_for_update().get(pk=checkpoint.pk)
+                if checkpoint.completed:
+                    break
+
+                pending_bets = Bet.objects.filter(
+                    match=match,
+                    status='pending',
+                    id__gt=checkpoint.last_bet_id
+                )
+                chunk_ids = list(
+                    pending_bets.order_by('id').values_list('id', flat=True)[:chunk_size]
+                )
+                if not chunk_ids:
+                    checkpoint.completed = True
+                    checkpoint.save(update_fields=['completed', 'updated_at'])
+                    break
+
+                stats = self.settle_bets(match, pending_bets.filter(id__lte=chunk_ids[-1]))
+
+                checkpoint.last_bet_id = chunk_ids[-1]
+                checkpoint.winners += stats['winners']
+                checkpoint.losers += stats['losers']
+                checkpoint.refunded += stats['refunded']
+                checkpoint.payout += stats['payout']
+                checkpoint.save()
+
+        return {
+            'winners': checkpoint.winners,
+            'losers': checkpoint.losers,
+            'refunded': checkpoint.refunded,
+            'payout': checkpoint.payout,
+        }
+
+    def preview(self, match):
+        """
+        Предпросмотр расчета одним сгруппированным запросом:
+        количество и сумма активных ставок по исходам и результат
+        букмекера (P&L) для каждого возможного результата матча.
+        """
+        rows = (
+            Bet.objects.filter(match=match, status='pending')
+            .order_by()
+            .values('outcome')
+            .annotate(count=Count('id'), stake=Sum('amount'), payout=Sum('potential_win'))
+        )
+
+        outcomes = {
+            outcome: {'count': 0, 'stake': Decimal('0.00'), 'payout': Decimal('0.00')}
+            for outcome, label in Bet.OUTCOME_CHOICES
+        }
+        for row in rows:
+            outcomes[row['outcome']] = {
+                'count': row['count'],
+                'stake': row['stake'],
+                'payout': row['payout'],
+            }
+
+        total_stake = sum((data['stake'] for data in outcomes.values()), Decimal('0.00'))
+        house_pnl = {
+            outcome: total_stake - data['payout']
+            for outcome, data in outcomes.items()
+        }
+        # При отмене все ставки возвращаются
+        house_pnl['cancelled'] = Decimal('0.00')
+
+        return {
+            'pending_count': sum(data['count'] for data in outcomes.values()),
+            'total_stake': total_stake,
+            'outcomes': outcomes,
+            'house_pnl': house_pnl,
+        }
+
+    def settle_bets(self, match, bets):
+        """
+        Рассчитать переданный набор активных ставок.
+        Должен вызываться внутри transaction.atomic().
+        Строки ставок блокируются, а их id читаются один раз: начисления
+        и смена статусов работают с одним и тем же набором, даже если
+        параллельно появились или изменились другие ставки матча.
+        """
+        stats = {'winners': 0, 'losers': 0, 'refunded': 0, 'payout': 0}
+        now = timezone.now()
+
+        bet_ids = list(bets.select_for_update().order_by('id').values_list('id', flat=True))
+        if not bet_ids:
+            return stats
+        bets = Bet.objects.filter(id__in=bet_ids)
+
+        if match.result == 'cancelled':
+            # При отмене матча - вернуть деньги
+            credits = self._credit_users(bets, 'amount')
+            stats['refunded'] = bets.update(status='cancelled', updated_at=now)
+            self._create_transactions(
+                credits, 'refund',
+                f'Возврат за отмененный матч {match.home_team} vs {match.away_team}'
+            )
+            return stats
+
+        winning_bets = bets.filter(outcome=match.result)
+        credits = self._credit_users(winning_bets, 'potential_win')
+
+        stats['winners'] = winning_bets.update(status='won', updated_at=now)
+        # Все остальные ставки из набора - проигрышные
+        stats['losers'] = bets.exclude(outcome=match.result).update(status='lost', updated_at=now)
+        stats['payout'] = sum(credit['total'] for credit in credits)
+
+        self._create_transactions(
+            credits, 'win',
+            f'Выигрыш по ставке на {match.home_team} vs {match.away_team}'
+        )
+        return stats
+
+    def _credit_users(self, bets, field):
+        """
+        Начислить каждому пользователю сумму по его ставкам одним UPDATE.
+        Возвращает агрегаты по пользователям для записи транзакций.
+        """
+        from accounts.models import UserProfile
+
+        bets = bets.order_by()
+        credits = list(
+            bets.values('user_id').annotate(total=Sum(field), bets_count=Count('id'))
+        )
+        if not credits:
+            return credits
+
+        user_total = (
+            bets.filter(user_id=OuterRef('user_id'))
+            .values('user_id')
+            .annotate(total=Sum(field))
+            .values('total')
+        )
+        UserProfile.objects.filter(
+            user_id__in=[credit['user_id'] for credit in credits]
+        ).update(balance=F('balance') + Subquery(user_total))
+
+        return credits
+
+    def _create_transactions(self, credits, transaction_type, comment):
+        """
+        Записать транзакции без сигналов: баланс уже изменен в _credit_users
+        """
+        from accounts.models import Transaction
+
+        Transaction.objects.bulk_create(
+            [
+                Transaction(
+                    user_id=credit['user_id'],
+                    amount=credit['total'],
+                    transaction_type=transaction_type,
+                    status='completed',
+                    comment=comment if credit['bets_count'] == 1
+                    else f"{comment} (ставок: {credit['bets_count']})",
+                )
+                for credit in credits
+            ],
+            batch_size=1000,
+        )
+
+
+class SettlementQueue:
+    """
+    Очередь расчета матчей.
+    Админка ставит матчи в очередь, воркеры забирают задания с блокировкой
+    строки (SELECT ... FOR UPDATE SKIP LOCKED), поэтому несколько процессов
+    рассчитывают разные матчи параллельно и не берут одно задание дважды.
+    Забранное задание арендуется на SETTLEMENT_JOB_TIMEOUT секунд от
+    started_at: задание воркера, который упал, не закончив расчет, снова
+    забирается после истечения аренды. Повторный расчет безопасен -
+    finish_match продолжает его с контрольной точки под блокировкой матча.
+    Итог записывается только при действующей аренде (воркер и started_at
+    не изменились), поэтому медленный воркер с истекшей арендой не затирает
+    итог воркера, забравшего задание после него.
+    """
+
+    def lease_deadline(self):
+        """Задания, забранные раньше этого времени и не завершенные, брошены"""
+        timeout = settings.BET_SETTINGS.get('SETTLEMENT_JOB_TIMEOUT', 3600)
+        return timezone.now() - timedelta(seconds=timeout)
+
+    def enqueue(self, matches, result):
+        """Поставить матчи в очередь. Возвращает количество созданных заданий"""
+        match_ids = [match.pk for match in matches if match.status != 'completed']
+        deadline = self.lease_deadline()
+        already_queued = set(
+            SettlementJob.objects.filter(
+                match_id__in=match_ids,
+                status__in=['queued', 'running'],
+            ).exclude(
+                status='running', started_at__lt=deadline
+            ).values_list('match_id', flat=True)
+        )
+        # Брошенные задания заменяются новыми
+        SettlementJob.objects.filter(
+            match_id__in=match_ids,
+            status='running',
+            started_at__lt=deadline,
+        ).exclude(match_id__in=already_queued).update(
+            status='failed', message="Воркер не завершил расчет", finished_at=timezone.now()
+        )
+        jobs = SettlementJob.objects.bulk_create([
+            SettlementJob(match_id=match_id, result=result)
+            for match_id in match_ids
+            if match_id not in already_queued
+        ])
+        return len(jobs)
+
+    def claim(self, worker):
+        """
+        Забрать следующее задание из очереди или брошенное задание
+        с истекшей арендой. None, если заданий нет
+        """
+        with transaction.atomic():
+            job = (
+                SettlementJob.objects.select_for_update(skip_locked=True)
+                .filter(
+                    Q(status='queued') | Q(status='running', started_at__lt=self.lease_deadline())
+                )
+                .order_by('created_at', 'id')
+                .first()
+            )
+            if job is None:
+                return None
+
+            job.status = 'running'
+            job.worker = worker
+            job.started_at = timezone.now()
+            job.save(update_fields=['status', 'worker', 'started_at'])
+        return job
+
+    def run(self, job):
+        """Рассчитать матч по заданию и записать итог"""
+        try:
+            success, message = job.match.finish_match(job.result)
+        except Exception as e:
+            success, message = False, str(e)
+
+        # Задание с истекшей арендой мог рассчитать до конца другой воркер
+        if not success and self.is_settled(job):
+            success, message = True, "Матч уже рассчитан"
+
+        job.status = 'done' if success else 'failed'
+        job.message = message
+        job.finished_at = timezone.now()
+        saved = SettlementJob.objects.filter(
+            pk=job.pk, status='running', worker=job.worker, started_at=job.started_at
+        ).update(status=job.status, message=job.message, finished_at=job.finished_at)
+        if not saved:
+            # Аренду забрал другой воркер - итог записывает он
+            job.refresh_from_db(fields=['status', 'message', 'worker', 'started_at', 'finished_at'])
+        return job
+
+    def is_settled(self, job):
+        """Матч завершен с результатом задания и все ставки рассчитаны"""
+        return (
+            Match.objects.filter(pk=job.match_id, status='completed', result=job.result).exists()
+            and not SettlementCheckpoint.objects.filter(match_id=job.match_id, completed=False).exists()
+        )
+
+    def work(self, worker, stop_when_empty=True, poll_interval=2):
+        """Цикл воркера. Возвращает количество обработанных заданий"""
+        processed = 0
+        while True:
+            job = self.claim(worker)
+            if job is None:
+                if stop_when_empty:
+                    return processed
+                time.sleep(poll_interval)
+                continue
+
+            self.run(job)
+            processed += 1
@@ -0,0 +1,123 @@
+import threading
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+from .pandascore_service import PandaScoreService
+from ..models import Match, SyncState
+
+
+class SyncScheduler:
+    """
+    Адаптивное расписание синхронизации с PandaScore.
+    Матчи разделены на уровни, у каждого свой интервал из BET_SETTINGS:
+      live - матчи в прямом эфире (DEFAULT_ODDS_UPDATE_INTERVAL, секунды);
+      soon - матчи, начинающиеся в течение часа (SOON_ODDS_UPDATE_INTERVAL);
+      far  - все остальные предстоящие, инкрементально (FAR_ODDS_UPDATE_INTERVAL).
+    Пока в уровне live или soon нет матчей, он проверяется с интервалом
+    IDLE_ODDS_UPDATE_INTERVAL. В уровне live учитываются только матчи,
+    начавшиеся не раньше LIVE_WINDOW назад: матч, который провайдер так и не
+    отметил завершенным, не держит частое обновление бесконечно. Расписание хранится в SyncState (daemon:<уровень>),
+    поэтому переживает перезапуск и видно команде sync_status.
+    """
+
+    TIERS = ['live', 'soon', 'far']
+    SOON_WINDOW = timedelta(hours=1)
+    LIVE_WINDOW = timedelta(hours=12)
+
+    def __init__(self, videogame_slugs, service=None):
+        self.videogame_slugs = list(videogame_slugs)
+        self.service = service or PandaScoreService()
+
+    @staticmethod
+    def state_key(tier):
+        return f'daemon:{tier}'
+
+    def interval(self, tier):
+        """Интервал уровня в секундах с учетом того, есть ли в нем матчи"""
+        bet_settings = settings.BET_SETTINGS
+        idle = bet_settings.get('IDLE_ODDS_UPDATE_INTERVAL', 60)
+        now = timezone.now()
+
+        if tier == 'live':
+            # Начавшиеся, но еще не отмеченные как live матчи тоже ждут обновления
+            active = Match.objects.filter(
+                status__in=['live', 'upcoming'], commence_time__gte=now - self.LIVE_WINDOW
+            ).filter(
+                Q(status='live') | Q(commence_time__lte=now)
+            ).exists()
+            return bet_settings['DEFAULT_ODDS_UPDATE_INTERVAL'] if active else idle
+
+        if tier == 'soon':
+            active = Match.objects.filter(
+                status='upcoming', commence_time__gt=now, commence_time__lte=now + self.SOON_WINDOW
+            ).exists()
+            return bet_settings.get('SOON_ODDS_UPDATE_INTERVAL', 60) if active else idle
+
+        return bet_settings.get('FAR_ODDS_UPDATE_INTERVAL', 1800)
+
+    def sync_tier(self, tier):
+        """Синхронизировать матчи уровня. Возвращает {игра: статистика}"""
+        if tier == 'live':
+            return self.service.sync(self.videogame_slugs, upcoming=False)
+
+        if tier == 'soon':
+            begin_at = timezone.now()
+            return self.service.sync(
+                self.videogame_slugs, running=False, full=True,
+                begin_at=begin_at, end_at=begin_at + self.SOON_WINDOW
+            )
+
+        return self.service.sync(self.videogame_slugs, running=False)
+
+    def run_tier(self, tier):
+        """Выполнить уровень и записать результат и следующий запуск"""
+        state, created = SyncState.objects.get_or_create(key=self.state_key(tier))
+        state.last_run_at = timezone.now()
+
+        try:
+            results = self.sync_tier(tier)
+        except Exception as e:
+            state.last_error = f"{e}\n{traceback.format_exc()}"
+            print(f"❌ Ошибка синхронизации уровня {tier}: {e}")
+        else:
+            state.last_error = ''
+            state.last_result = results
+
+        state.interval = self.interval(tier)
+        state.next_run_at = timezone.now() + timedelta(seconds=state.interval)
+        state.save()
+        return state
+
+    def run_pending(self):
+        """
+        Выполнить уровни, время которых пришло.
+        Возвращает количество секунд до следующего запуска
+        """
+        states = {
+            state.key: state
+            for state in SyncState.objects.filter(key__in=[self.state_key(tier) for tier in self.TIERS])
+        }
+
+        next_runs = []
+        for tier in self.TIERS:
+            state = states.get(self.state_key(tier))
+            if state is None or state.next_run_at is None or state.next_run_at <= timezone.now():
+                state = self.run_tier(tier)
+            next_runs.append(state.next_run_at)
+
+        return max(0.0, (min(next_runs) - timezone.now()).total_seconds())
+
+    def run_forever(self, stop_event=None):
+        """
+        Цикл демона. Останавливается, когда установлен stop_event:
+        начатый проход по уровням дописывается, ожидание прерывается сразу
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            # Долгоживущий процесс: закрываем соединения с БД, которые успели устареть
+            close_old_connections()
+            wait = self.run_pending()
+            stop_event.wait(wait)
@@ -0,0 +1,42 @@
+"""
+Версии данных, общие для всех процессов (хранятся в кеше).
+Версия - случайный токен: любое изменение данных выдает новый токен,
+поэтому процессам достаточно сравнить его с тем, что они видели раньше.
+"""
+import uuid
+from django.core.cache import cache
+from django.db import transaction
+
+# Версия коэффициентов и матчей - меняется при каждой синхронизации
+SYNC_VERSION = 'sync'
+
+# Версия доски матчей - меняется при синхронизации, расчете и смене статусов
+BOARD_VERSION = 'board'
+
+CACHE_KEY_PREFIX = 'matches:version:'
+
+
+def get_version(name):
+    """Текущая версия данных"""
+    key = CACHE_KEY_PREFIX + name
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(*names):
+    """Отметить изменение данных"""
+    token = uuid.uuid4().hex
+    cache.set_many({CACHE_KEY_PREFIX + name: token for name in names}, timeout=None)
+    return token
+
+
+def bump_version_on_commit(*names):
+    """
+    Отметить изменение данных после фиксации текущей транзакции.
+    Иначе параллельный читатель увидит новую версию раньше новых строк
+    и сохранит кеш из старых данных под новой версией
+    """
+    transaction.on_commit(lambda: bump_version(*names))
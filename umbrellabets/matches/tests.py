@@ -1,3 +1,1300 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import time
+from io import StringIO
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import UserProfile, Transaction
+from .models import Sport, Match, Bookmaker, Odds, Bet, SyncState, OddsTick, SettlementCheckpoint, SettlementJob
+from .push import PushPoller, push_broker, stream
+from .replay import ReplayServer, load_corpus, pandascore_corpus, scale_corpus
+from .services.betting import BetPlacementService, BetPlacementError
+from .services.ingestion import IngestionService
+from .services.odds_history import OddsHistoryService
+from .services.odds_api_service import OddsAPIService
+from .services.pandascore_service import PandaScoreService
+from .services.providers import FetchIncomplete
+from .services.settlement import SettlementService, SettlementQueue
+from .services.sync_scheduler import SyncScheduler
+from .services.odds_index import best_odds_index
+from .services.odds_analytics import odds_analytics
+from .services.counters import platform_counters
+from .services.versions import SYNC_VERSION, BOARD_VERSION, bump_version, get_version
 
-# Create your tests here.
+
+def create_match(api_id='m1', sport=None, **kwargs):
+    sport = sport or Sport.objects.get_or_create(key='cs-go', defaults={'title': 'CS2'})[0]
+    defaults = {
+        'home_team': 'NAVI',
+        'away_team': 'Vitality',
+        'commence_time': timezone.now() + timedelta(hours=2),
+        'status': 'upcoming',
+    }
+    defaults.update(kwargs)
+    match = Match.objects.create(api_id=api_id, sport=sport, **defaults)
+    # Версии меняются после фиксации, а TestCase транзакцию не фиксирует
+    bump_version(SYNC_VERSION, BOARD_VERSION)
+    return match
+
+
+def create_odds(match, bookmaker_key='ggbet', home='1.80', away='2.10'):
+    bookmaker = Bookmaker.objects.get_or_create(key=bookmaker_key, defaults={'title': bookmaker_key})[0]
+    for outcome, price in (('home', home), ('away', away)):
+        if price is None:
+            continue
+        Odds.objects.create(
+            match=match,
+            bookmaker=bookmaker,
+            outcome=outcome,
+            price=Decimal(price),
+            last_update=timezone.now()
+        )
+    bump_version(SYNC_VERSION, BOARD_VERSION)
+    return bookmaker
+
+
+def create_user(username, balance='5000.00'):
+    user = User.objects.create_user(username=username, password='pass')
+    UserProfile.objects.filter(user=user).update(balance=Decimal(balance))
+    return user
+
+
+class BestOddsIndexTests(TestCase):
+    def setUp(self):
+        best_odds_index.clear()
+        self.match = create_match()
+        create_odds(self.match, 'ggbet', home='1.50', away='2.50')
+        create_odds(self.match, 'pari', home='1.65', away='2.20')
+
+    def test_best_price_is_served_from_memory(self):
+        self.assertEqual(best_odds_index.best(self.match.id, 'home')['price'], Decimal('1.65'))
+        self.assertEqual(best_odds_index.best(self.match.id, 'away')['bookmaker'], 'ggbet')
+
+        with self.assertNumQueries(0):
+            best_odds_index.get(self.match.id)
+
+    def test_version_bump_invalidates(self):
+        best_odds_index.get(self.match.id)
+        Odds.objects.filter(match=self.match, outcome='home').update(price=Decimal('1.10'))
+        bump_version(SYNC_VERSION)
+
+        self.assertEqual(best_odds_index.best(self.match.id, 'home')['price'], Decimal('1.10'))
+
+    def test_refresh_does_not_adopt_version_after_missed_sync(self):
+        other = create_match('m2')
+        create_odds(other, 'ggbet', home='2.00', away='1.80')
+        best_odds_index.get_many([self.match.id, other.id])
+
+        # Синхронизация другого процесса, индекс этого процесса ее не видел
+        Odds.objects.filter(match=other, outcome='home').update(price=Decimal('2.40'))
+        previous = bump_version(SYNC_VERSION)
+
+        best_odds_index.refresh([self.match.id], version=bump_version(SYNC_VERSION), previous=previous)
+        self.assertEqual(best_odds_index.best(other.id, 'home')['price'], Decimal('2.40'))
+
+        # Актуальный индекс принимает новую версию без сброса
+        previous = get_version(SYNC_VERSION)
+        best_odds_index.refresh([self.match.id], version=bump_version(SYNC_VERSION), previous=previous)
+        with self.assertNumQueries(0):
+            best_odds_index.get_many([self.match.id, other.id])
+
+    def test_pages_render_best_prices(self):
+        response = self.client.get(reverse('matches:matches_list'))
+        self.assertContains(response, '1,65')
+        self.assertNotContains(response, '1,50')
+
+        response = self.client.get(reverse('matches:match_detail', args=[self.match.id]))
+        self.assertEqual(response.status_code, 200)
+
+
+class OddsAnalyticsTests(TestCase):
+    def setUp(self):
+        bump_version(SYNC_VERSION)
+        odds_analytics.clear()
+        self.match = create_match()
+        create_odds(self.match, 'ggbet', home='1.50', away='2.50')
+        create_odds(self.match, 'pari', home='1.65', away='2.20')
+        # Неполная линия: участвует в лучшей цене, но не в марже и консенсусе
+        create_odds(self.match, 'fonbet', home='1.80', away=None)
+
+    def test_metrics_match_scalar_calculation(self):
+        books = [(1.50, 2.50), (1.65, 2.20)]
+        overround = sum(1 / home + 1 / away - 1 for home, away in books) / 2
+        probability = sum((1 / home) / (1 / home + 1 / away) for home, away in books) / 2
+
+        analytics = odds_analytics.get(self.match.id)
+
+        self.assertEqual(analytics['bookmakers'], 3)
+        self.assertEqual(analytics['overround'], round(overround * 100, 2))
+        self.assertEqual(analytics['best_overround'], round((1 / 1.80 + 1 / 2.50 - 1) * 100, 2))
+        home = analytics['outcomes']['home']
+        self.assertEqual(home['best'], 1.80)
+        self.assertEqual(home['probability'], round(probability * 100, 1))
+        self.assertEqual(home['consensus'], round(1 / probability, 2))
+        self.assertNotIn('draw', analytics['outcomes'])
+
+    def test_board_is_cached_per_sync_version(self):
+        odds_analytics.get(self.match.id)
+        with self.assertNumQueries(0):
+            odds_analytics.get(self.match.id)
+
+        # Другой процесс: память пуста, но результат есть в общем кеше
+        odds_analytics.clear()
+        with self.assertNumQueries(0):
+            odds_analytics.get(self.match.id)
+
+        Odds.objects.filter(match=self.match, bookmaker__key='fonbet').update(price=Decimal('3.00'))
+        bump_version(SYNC_VERSION)
+        self.assertEqual(odds_analytics.get(self.match.id)['outcomes']['home']['best'], 3.00)
+
+    def test_cache_keeps_only_current_version(self):
+        odds_analytics.get(self.match.id)
+        bump_version(SYNC_VERSION)
+        odds_analytics.get(self.match.id)
+
+        version, board = cache.get(odds_analytics.CACHE_KEY)
+        self.assertEqual(version, get_version(SYNC_VERSION))
+        self.assertIn(self.match.id, board)
+
+
+class BestPriceColumnsTests(TestCase):
+    def setUp(self):
+        self.match = create_match()
+        create_odds(self.match, 'ggbet', home='1.50', away='2.50')
+        self.pari = create_odds(self.match, 'pari', home='1.65', away='2.20')
+
+    def test_columns_follow_odds_and_backfill(self):
+        self.match.refresh_from_db()
+        self.assertEqual((self.match.best_home_price, self.match.best_home_bookmaker), (Decimal('1.65'), self.pari))
+        self.assertEqual(self.match.best_away_price, Decimal('2.50'))
+
+        Match.objects.update(best_home_price=None, best_home_bookmaker=None,
+                             best_away_price=None, best_away_bookmaker=None)
+        board_version = get_version(BOARD_VERSION)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('backfill_best_prices', stdout=StringIO())
+        # Доска матчей показывает лучшие цены - ее кеш сбрасывается
+        self.assertNotEqual(get_version(BOARD_VERSION), board_version)
+
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.best_prices(), {
+            'home': {'price': Decimal('1.65'), 'bookmaker_id': self.pari.id},
+            'away': {'price': Decimal('2.50'), 'bookmaker_id': self.match.best_away_bookmaker_id},
+        })
+
+    def test_list_does_not_read_odds(self):
+        # Аналитика читает линию один раз на версию синхронизации
+        odds_analytics.board()
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            response = self.client.get(reverse('matches:matches_list'))
+
+        self.assertContains(response, '1,65')
+        self.assertFalse([sql for sql in queries if 'matches_odds' in sql and 'matches_oddstick' not in sql])
+
+
+class MatchDetailTests(TestCase):
+    def setUp(self):
+        self.match = create_match()
+        create_odds(self.match, 'ggbet', home='1.50', away='2.50')
+
+    def add_bets(self, count):
+        user = create_user(f'player{Bet.objects.count()}')
+        Bet.objects.bulk_create([
+            Bet(user=user, match=self.match, outcome='home' if i % 4 else 'away', amount=Decimal('10.00'),
+                odds=Decimal('1.50'), potential_win=Decimal('15.00'))
+            for i in range(count)
+        ])
+
+    def render_page(self):
+        # Аналитика строится один раз на версию синхронизации
+        odds_analytics.board()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('matches:match_detail', args=[self.match.id]))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_bookmakers_and_bets(self):
+        self.add_bets(4)
+        response, baseline = self.render_page()
+        self.assertEqual(response.context['home_percentage'], 75.0)
+
+        for i in range(10):
+            create_odds(self.match, f'bookmaker{i}', home=f'1.{60 + i}', away='2.00')
+        self.add_bets(40)
+        response, queries = self.render_page()
+
+        self.assertEqual(queries, baseline)
+        self.assertLessEqual(queries, 3)
+        self.assertEqual(response.context['total_bets'], 44)
+        self.assertEqual(response.context['home_odds']['price'], Decimal('1.69'))
+        self.assertEqual(json.loads(response.context['odds_json'])[str(response.context['home_odds']['odds_id'])], 1.69)
+
+
+class MatchBoardTests(TestCase):
+    def setUp(self):
+        self.match = create_match()
+        create_odds(self.match, 'ggbet', home='1.50', away='2.50')
+
+    def match_queries(self, url):
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, [sql for sql in queries if '"matches_' in sql]
+
+    def test_board_is_served_from_cache_until_version_changes(self):
+        self.match_queries(reverse('matches:matches_list'))
+
+        response, queries = self.match_queries(reverse('matches:matches_list'))
+        self.assertEqual(queries, [])
+        self.assertContains(response, 'NAVI')
+
+        # Фильтр вида спорта выбирается из общей доски
+        response, queries = self.match_queries(reverse('matches:matches_list') + '?sport=cs-go')
+        self.assertEqual(queries, [])
+        self.assertContains(response, 'NAVI')
+
+        user = create_user('viewer')
+        self.client.force_login(user)
+        UserProfile.objects.filter(user=user).update(email_confirmed=True)
+        response, queries = self.match_queries(reverse('matches:matches_list'))
+        self.assertEqual(queries, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SettlementService().finish_match(self.match, 'home')
+        response, queries = self.match_queries(reverse('matches:matches_list'))
+        self.assertNotEqual(queries, [])
+        self.assertNotContains(response, 'NAVI')
+
+    @override_settings(BET_SETTINGS=dict(settings.BET_SETTINGS, BOARD_PAGE_SIZE=2))
+    def test_upcoming_matches_are_paged_by_keyset(self):
+        start = timezone.now() + timedelta(hours=3)
+        # Одинаковое время начала: порядок внутри страницы задает id
+        for i in range(4):
+            create_match(f'p{i}', home_team=f'Home {i}', commence_time=start + timedelta(hours=i // 2))
+
+        response = self.client.get(reverse('matches:matches_list'))
+        section = response.context['matches_by_sport']['cs-go']
+        self.assertEqual(section['count'], 5)
+        self.assertEqual([match['home_team'] for match in section['matches']], ['NAVI', 'Home 0'])
+
+        seen = []
+        after = section['next']
+        while after:
+            response = self.client.get(reverse('matches:upcoming_page'), {'sport': 'cs-go', 'after': after})
+            seen += [match['home_team'] for match in response.context['matches']]
+            after = response.context['next']
+        self.assertEqual(seen, ['Home 1', 'Home 2', 'Home 3'])
+
+        for after in ('bad', '9999999999999999999.1', '-9999999999999999999.1', '1.99999999999999999999'):
+            with self.subTest(after=after):
+                response = self.client.get(reverse('matches:upcoming_page'), {'sport': 'cs-go', 'after': after})
+                self.assertEqual(response.status_code, 400)
+
+
+def pandascore_match(match_id, status='not_started', begin_at='2030-01-01T18:00:00Z'):
+    return {
+        'id': match_id,
+        'status': status,
+        'begin_at': begin_at,
+        'opponents': [
+            {'opponent': {'name': f'Team {match_id}A'}},
+            {'opponent': {'name': f'Team {match_id}B'}},
+        ],
+    }
+
+
+class IngestionTests(TestCase):
+    def setUp(self):
+        self.sport = Sport.objects.create(key='cs-go', title='CS2')
+        self.service = PandaScoreService.__new__(PandaScoreService)
+
+    def records(self, count):
+        return [self.service.to_record(pandascore_match(i)) for i in range(count)]
+
+    def test_batch_is_written_with_fixed_number_of_queries(self):
+        # Букмекер создается при первой записи
+        with self.assertNumQueries(14):
+            stats = IngestionService().ingest(self.sport, self.records(50))
+
+        self.assertEqual(stats, {'fetched': 50, 'inserted': 50, 'updated': 0, 'skipped': 0,
+                                 'odds': 100, 'odds_skipped': 0})
+        self.assertEqual(Match.objects.count(), 50)
+        self.assertEqual(Odds.objects.count(), 100)
+
+        with self.assertNumQueries(12):
+            stats = IngestionService().ingest(self.sport, self.records(60))
+
+        self.assertEqual(stats, {'fetched': 60, 'inserted': 10, 'updated': 0, 'skipped': 50,
+                                 'odds': 20, 'odds_skipped': 100})
+        self.assertEqual(Odds.objects.count(), 120)
+
+    def test_unchanged_rows_are_not_rewritten(self):
+        IngestionService().ingest(self.sport, self.records(3))
+        updated_at = dict(Match.objects.values_list('api_id', 'updated_at'))
+
+        records = self.records(3)
+        records[1].status = 'live'
+        records[2].odds[0].price = Decimal('3.33')
+        stats = IngestionService().ingest(self.sport, records)
+
+        self.assertEqual((stats['updated'], stats['skipped'], stats['odds'], stats['odds_skipped']), (1, 2, 1, 5))
+        self.assertEqual(Match.objects.get(api_id='0').updated_at, updated_at['0'])
+        self.assertGreater(Match.objects.get(api_id='1').updated_at, updated_at['1'])
+        self.assertEqual(Odds.objects.get(match__api_id='2', outcome='home').price, Decimal('3.33'))
+        self.assertEqual(Match.objects.get(api_id='2').best_home_price, Decimal('3.33'))
+
+        # Повтор без изменений ничего не пишет
+        with self.assertNumQueries(5):
+            stats = IngestionService().ingest(self.sport, records)
+        self.assertEqual((stats['skipped'], stats['odds_skipped']), (3, 6))
+
+    def test_running_match_is_live(self):
+        record = self.service.to_record(pandascore_match(7, status='running'))
+        IngestionService().ingest(self.sport, [record])
+
+        self.assertEqual(Match.objects.get(api_id='7').status, 'live')
+        self.assertIsNone(self.service.to_record({'id': 8, 'opponents': []}))
+
+
+class PandaScoreSyncTests(TestCase):
+    GAMES = ['cs-go', 'dota2', 'lol', 'valorant']
+
+    def responses(self):
+        responses = {}
+        for number, game in enumerate(self.GAMES):
+            responses[('/matches/upcoming', game)] = [pandascore_match(number * 10 + i) for i in range(3)]
+            responses[('/matches/running', game)] = [pandascore_match(number * 10 + 5, status='running')]
+        return responses
+
+    def test_games_are_fetched_concurrently_over_pooled_connections(self):
+        with ReplayServer(self.responses(), latency=0.2) as server:
+            service = PandaScoreService(base_url=server.url, concurrency=8)
+            started = time.monotonic()
+            results = service.sync(self.GAMES)
+            elapsed = time.monotonic() - started
+
+        # 8 запросов по 0.2с последовательно заняли бы 1.6с
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(len(server.requests), 8)
+        self.assertLessEqual(server.connections, 8)
+        self.assertEqual({game: stats['inserted'] for game, stats in results.items()},
+                         dict.fromkeys(self.GAMES, 4))
+        self.assertEqual(Match.objects.filter(sport__key='dota2').count(), 4)
+        self.assertEqual(Match.objects.filter(status='live').count(), 4)
+
+    def test_connections_are_reused_between_requests(self):
+        with ReplayServer(self.responses()) as server:
+            service = PandaScoreService(base_url=server.url, concurrency=1)
+            for game in self.GAMES:
+                service.get_upcoming_matches(game)
+
+        self.assertEqual(len(server.requests), 4)
+        self.assertEqual(server.connections, 1)
+
+    def test_incremental_sync_requests_only_modified_matches(self):
+        corpus = pandascore_corpus(5)
+        responses = {'/matches/upcoming': corpus, '/matches/running': []}
+        with ReplayServer(responses) as server:
+            service = PandaScoreService(base_url=server.url)
+            first = service.sync_matches_from_pandascore('cs-go')
+
+            corpus[0]['modified_at'] = '2026-02-01T00:00:00Z'
+            corpus[0]['status'] = 'running'
+            corpus[1]['modified_at'] = '2026-02-01T00:00:00Z'
+            second = service.sync_matches_from_pandascore('cs-go')
+
+        self.assertEqual((first['fetched'], first['inserted']), (5, 5))
+        # Матчи с modified_at, равным курсору, запрашиваются повторно, но не пишутся
+        self.assertEqual((second['fetched'], second['updated'], second['skipped']), (5, 1, 4))
+        last_upcoming = [params for path, params in server.requests if path == '/matches/upcoming'][-1]
+        self.assertEqual(last_upcoming['range[modified_at]'][0].split(',')[0], '2026-01-01T00:00:00Z')
+        self.assertEqual(
+            SyncState.objects.get(key='pandascore:cs-go').cursor,
+            datetime(2026, 2, 1, tzinfo=dt_timezone.utc)
+        )
+
+    def test_recorded_corpus_survives_injected_errors(self):
+        responses = scale_corpus(load_corpus('pandascore'), 300, paths=['/matches/upcoming'])
+        self.assertEqual(len(responses[('/matches/upcoming', 'dota2')]), 300)
+        self.assertEqual(len(responses[('/matches/running', 'dota2')]), 2)
+
+        with ReplayServer(responses, error_rate=0.1, seed=31) as server:
+            results = PandaScoreService(base_url=server.url).sync(['dota2'])
+
+        # Ошибки повторяются, ни одна страница не теряется
+        self.assertGreater(server.errors, 0)
+        self.assertEqual(results['dota2']['inserted'], 302)
+        self.assertEqual(Match.objects.filter(sport__key='dota2').count(), 302)
+
+    def test_upcoming_pages_follow_link_header(self):
+        corpus = pandascore_corpus(250)
+        with ReplayServer({'/matches/upcoming': corpus}) as server:
+            service = PandaScoreService(base_url=server.url)
+            pages = service.iter_upcoming_pages('cs-go', per_page=100)
+            self.assertEqual(len(next(pages)), 100)
+            # Следующая страница запрашивается только по мере потребления
+            self.assertEqual(len(server.requests), 1)
+            self.assertEqual([len(page) for page in pages], [100, 50])
+
+            self.assertEqual(len(list(service.iter_upcoming_pages(per_page=100, max_pages=2))), 2)
+
+            # Матчи идут каждые 10 минут с 2030-01-01 00:00 UTC
+            begin_at = datetime(2030, 1, 1, 1, 0, tzinfo=dt_timezone.utc)
+            window = list(service.iter_upcoming_pages(
+                per_page=100, begin_at=begin_at, end_at=begin_at + timedelta(hours=1)
+            ))
+        self.assertEqual([match['id'] for match in window[0]], list(range(100006, 100013)))
+
+    def test_truncated_run_does_not_move_cursor(self):
+        corpus = pandascore_corpus(250)
+        with ReplayServer({'/matches/upcoming': corpus, '/matches/running': []}) as server:
+            service = PandaScoreService(base_url=server.url)
+            first = service.sync_matches_from_pandascore('cs-go', per_page=100, max_pages=1)
+            self.assertEqual(first['inserted'], 100)
+            self.assertIsNone(SyncState.objects.get(key='pandascore:cs-go').cursor)
+
+            # Вторая страница отвечает ошибкой после всех повторов
+            resolve = server.resolve
+
+            def failing_resolve(path, params):
+                if params.get('page') == ['2']:
+                    return 503, {'error': 'Unavailable'}, {}
+                return resolve(path, params)
+
+            server.resolve = failing_resolve
+            with self.assertRaises(FetchIncomplete):
+                list(service.iter_upcoming_pages('cs-go', per_page=100))
+            service.sync_matches_from_pandascore('cs-go', per_page=100)
+            self.assertIsNone(SyncState.objects.get(key='pandascore:cs-go').cursor)
+
+            server.resolve = resolve
+            server.requests.clear()
+            last = service.sync_matches_from_pandascore('cs-go', per_page=100)
+
+        self.assertEqual(last['inserted'], 150)
+        self.assertEqual(Match.objects.count(), 250)
+        self.assertEqual(SyncState.objects.get(key='pandascore:cs-go').cursor,
+                         datetime(2026, 1, 1, tzinfo=dt_timezone.utc))
+        # Первая загрузка тоже идет по возрастанию modified_at
+        upcoming = [params for path, params in server.requests if path == '/matches/upcoming']
+        self.assertEqual(upcoming[0]['sort'], ['modified_at'])
+
+
+class RecordingSyncService:
+    """Записывает вызовы sync вместо обращения к API"""
+
+    def __init__(self):
+        self.calls = []
+
+    def sync(self, sport_keys, **options):
+        self.calls.append(options)
+        return {slug: {'inserted': 0, 'updated': 0, 'skipped': 1} for slug in sport_keys}
+
+
+class SyncSchedulerTests(TestCase):
+    def setUp(self):
+        self.service = RecordingSyncService()
+        self.scheduler = SyncScheduler(['cs-go'], service=self.service)
+
+    def test_intervals_follow_match_tiers(self):
+        self.assertEqual([self.scheduler.interval(tier) for tier in SyncScheduler.TIERS], [60, 60, 1800])
+
+        # Зависшие матчи, которые провайдер не отметил завершенными
+        stale = timezone.now() - SyncScheduler.LIVE_WINDOW - timedelta(hours=1)
+        create_match('stale-live', status='live', commence_time=stale)
+        create_match('stale-upcoming', commence_time=stale)
+        self.assertEqual(self.scheduler.interval('live'), 60)
+
+        create_match('live', status='live')
+        create_match('soon', commence_time=timezone.now() + timedelta(minutes=30))
+        self.assertEqual([self.scheduler.interval(tier) for tier in SyncScheduler.TIERS], [5, 60, 1800])
+
+    def test_only_due_tiers_run_and_schedule_is_stored(self):
+        create_match('live', status='live')
+        wait = self.scheduler.run_pending()
+
+        self.assertEqual(len(self.service.calls), 3)
+        self.assertEqual(self.service.calls[0], {'upcoming': False})
+        self.assertTrue(self.service.calls[1]['full'])
+        self.assertAlmostEqual(wait, 5, delta=1)
+
+        # Расписание читается из БД: повторный проход ничего не запускает
+        self.assertGreater(SyncScheduler(['cs-go'], service=self.service).run_pending(), 0)
+        self.assertEqual(len(self.service.calls), 3)
+
+        SyncState.objects.filter(key='daemon:live').update(next_run_at=timezone.now())
+        self.scheduler.run_pending()
+        self.assertEqual(self.service.calls[-1], {'upcoming': False})
+        self.assertEqual(
+            SyncState.objects.get(key='daemon:far').last_result,
+            {'cs-go': {'inserted': 0, 'updated': 0, 'skipped': 1}}
+        )
+
+
+class OddsHistoryTests(TestCase):
+    def setUp(self):
+        self.sport = Sport.objects.create(key='cs-go', title='CS2')
+        self.service = PandaScoreService.__new__(PandaScoreService)
+
+    def test_price_changes_are_appended_and_downsampled(self):
+        record = self.service.to_record(pandascore_match(1))
+        IngestionService().ingest(self.sport, [record])
+        IngestionService().ingest(self.sport, [record])
+        record.odds[0].price = Decimal('1.95')
+        IngestionService().ingest(self.sport, [record])
+
+        match = Match.objects.get(api_id='1')
+        series = OddsHistoryService().price_series(match.id)
+        # Повтор без изменений историю не пополняет
+        self.assertEqual([point['outcome'] for point in series], ['home', 'away', 'home'])
+        self.assertEqual(series[-1]['price'], Decimal('1.95'))
+
+        # Старый день: три тика одной минуты сворачиваются в свечу
+        old = timezone.now() - timedelta(days=10)
+        old = old.replace(second=0, microsecond=0)
+        OddsTick.objects.bulk_create([
+            OddsTick(match_id=match.id, bookmaker_id=1, outcome=1, price=Decimal(price),
+                     recorded_at=old + timedelta(seconds=second), day=timezone.localdate(old))
+            for second, price in ((5, '2.00'), (20, '2.40'), (50, '1.70'))
+        ])
+        stats = OddsHistoryService().downsample()
+
+        self.assertEqual(stats, {'days': 1, 'ticks': 3, 'candles': 1})
+        self.assertEqual(OddsTick.objects.count(), 3)
+        candle = OddsHistoryService().price_series(match.id, resolution='minute')[0]
+        self.assertEqual(
+            (candle['open'], candle['high'], candle['low'], candle['close'], candle['ticks']),
+            (Decimal('2.00'), Decimal('2.40'), Decimal('1.70'), Decimal('1.70'), 3)
+        )
+
+        with self.assertNumQueries(1):
+            OddsHistoryService().price_series(match.id, start=timezone.now() - timedelta(hours=1))
+
+    def test_view_validates_time_bounds(self):
+        match = create_match()
+        OddsTick.objects.create(match_id=match.id, bookmaker_id=1, outcome=1, price=Decimal('1.80'),
+                                recorded_at=timezone.now(), day=timezone.localdate())
+        analyst = create_user('analyst')
+        self.client.force_login(analyst)
+        User.objects.filter(pk=analyst.pk).update(is_staff=True)
+        UserProfile.objects.filter(user=analyst).update(email_confirmed=True)
+        url = reverse('matches:odds_history', args=[match.id])
+
+        for value in ('yesterday', '2024-13-45T00:00:00'):
+            response = self.client.get(url, {'from': value})
+            self.assertEqual(response.status_code, 400)
+
+        # Время без смещения - время сервера, а не ошибка сравнения naive/aware
+        start = timezone.localtime() - timedelta(hours=1)
+        response = self.client.get(url, {'from': start.replace(tzinfo=None).isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['series']), 1)
+
+
+class PushTests(TestCase):
+    def setUp(self):
+        self.sport = Sport.objects.create(key='cs-go', title='CS2')
+        self.service = PandaScoreService.__new__(PandaScoreService)
+
+    def test_ingestion_updates_are_coalesced_per_match(self):
+        subscription = push_broker.subscribe(sports=['cs-go'])
+        try:
+            record = self.service.to_record(pandascore_match(1))
+            IngestionService().ingest(self.sport, [record])
+            record.odds[0].price = Decimal('2.50')
+            IngestionService().ingest(self.sport, [record])
+
+            events = subscription.drain()
+        finally:
+            push_broker.unsubscribe(subscription)
+
+        match = Match.objects.get(api_id='1')
+        self.assertEqual(
+            sorted((event['type'], event['match']) for event in events),
+            [('prices', match.id), ('status', match.id)]
+        )
+        prices = next(event for event in events if event['type'] == 'prices')
+        self.assertEqual(prices[record.odds[0].outcome], '2.50')
+        self.assertFalse(push_broker.active)
+
+    def test_poller_rereads_rows_committed_behind_watermark(self):
+        match = create_match()
+        other = create_match('m2')
+        poller = PushPoller(push_broker)
+        poller.poll()
+
+        # Транзакция с более ранним временем изменения зафиксирована позже
+        # уже прочитанной строки
+        Match.objects.filter(pk=match.pk).update(updated_at=timezone.now() + timedelta(seconds=1))
+        bump_version(BOARD_VERSION)
+        self.assertEqual({event['match'] for event in poller.poll()}, {match.id})
+
+        create_odds(other)
+        Odds.objects.filter(match=other).update(last_update=poller.watermark - timedelta(seconds=5))
+        bump_version(SYNC_VERSION)
+        self.assertEqual({event['match'] for event in poller.poll()}, {other.id})
+
+        # Разосланные строки окна не повторяются
+        bump_version(SYNC_VERSION)
+        self.assertEqual(poller.poll(), [])
+
+    @override_settings(BET_SETTINGS=dict(settings.BET_SETTINGS, PUSH_TICK=0.05))
+    def test_stream_sends_coalesced_events_until_disconnect(self):
+        async def scenario():
+            incoming = asyncio.Queue()
+            sent = asyncio.Queue()
+            scope = {'type': 'http', 'method': 'GET', 'path': '/stream/', 'query_string': b'match=7'}
+            handler = asyncio.create_task(stream(scope, incoming.get, sent.put))
+
+            self.assertEqual((await sent.get())['status'], 200)
+            self.assertIn(b'connected', (await sent.get())['body'])
+
+            for price in ('1.90', '2.10'):
+                push_broker.publish([{'type': 'prices', 'match': 7, 'sport': 'cs-go', 'home': price, 'away': None}])
+            # Событие другого матча подписчику не приходит
+            push_broker.publish([{'type': 'prices', 'match': 8, 'sport': 'cs-go', 'home': '3.00', 'away': None}])
+
+            body = (await asyncio.wait_for(sent.get(), 1))['body'].decode()
+            await incoming.put({'type': 'http.disconnect'})
+            await asyncio.wait_for(handler, 1)
+            # Опрос БД держит соединение в своем потоке - закрываем его
+            await push_broker.stop()
+            return body
+
+        body = asyncio.run(scenario())
+
+        self.assertTrue(body.startswith('event: update\n'))
+        events = json.loads(body.split('data: ', 1)[1])
+        self.assertEqual([(event['match'], event['home']) for event in events], [(7, '2.10')])
+        self.assertFalse(push_broker.active)
+
+
+class OddsAPISyncTests(TestCase):
+    def test_recorded_odds_are_ingested_through_shared_pipeline(self):
+        responses = load_corpus('oddsapi')
+        events = responses['/sports/cs2/odds']
+
+        with ReplayServer(responses) as server:
+            service = OddsAPIService(base_url=server.url)
+            stats = service.sync_matches_and_odds('cs2')
+            again = service.sync_matches_and_odds('cs2')
+
+        prices = sum(len(bookmaker['markets'][0]['outcomes']) for event in events for bookmaker in event['bookmakers'])
+        self.assertEqual((stats['inserted'], stats['odds']), (len(events), prices))
+        self.assertEqual((again['skipped'], again['odds']), (len(events), 0))
+
+        event = events[0]
+        match = Match.objects.get(api_id=event['id'])
+        best_home = max(
+            bookmaker['markets'][0]['outcomes'][0]['price'] for bookmaker in event['bookmakers']
+        )
+        self.assertEqual(best_odds_index.get(match.id)['home']['price'], Decimal(str(best_home)))
+
+
+class SettlementTests(TestCase):
+    def setUp(self):
+        self.match = create_match()
+        self.alice = create_user('alice', balance='0.00')
+        self.bob = create_user('bob', balance='0.00')
+
+    def add_bets(self, *bets):
+        Bet.objects.bulk_create([
+            Bet(user=user, match=self.match, outcome=outcome, amount=Decimal(amount),
+                odds=Decimal('2.00'), potential_win=Decimal(amount) * 2)
+            for user, outcome, amount in bets
+        ])
+
+    def balance(self, user):
+        return UserProfile.objects.get(user=user).balance
+
+    def test_finish_match_settles_bets(self):
+        self.add_bets((self.alice, 'home', '10'), (self.alice, 'home', '15'), (self.bob, 'away', '20'))
+
+        success, message = SettlementService().finish_match(self.match, 'home')
+
+        self.assertTrue(success)
+        self.assertEqual((self.balance(self.alice), self.balance(self.bob)), (Decimal('50.00'), Decimal('0.00')))
+        self.assertEqual(
+            sorted(Bet.objects.values_list('outcome', 'status')),
+            [('away', 'lost'), ('home', 'won'), ('home', 'won')]
+        )
+        self.assertEqual(
+            list(Transaction.objects.filter(transaction_type='win').values_list('user__username', 'amount')),
+            [('alice', Decimal('50.00'))]
+        )
+        self.assertEqual(SettlementService().finish_match(self.match, 'away'), (False, "Матч уже завершен"))
+
+    def test_cancelled_match_refunds_stakes(self):
+        self.add_bets((self.alice, 'home', '10'), (self.bob, 'away', '20'))
+
+        SettlementService().finish_match(self.match, 'cancelled')
+
+        self.assertEqual((self.balance(self.alice), self.balance(self.bob)), (Decimal('10.00'), Decimal('20.00')))
+        self.assertEqual(Bet.objects.filter(status='cancelled').count(), 2)
+
+    def test_streaming_resumes_from_checkpoint(self):
+        self.add_bets(*[(self.alice if i % 2 else self.bob, 'home', '10') for i in range(5)])
+        settle_bets = SettlementService.settle_bets
+        calls = []
+
+        def crash_on_second_chunk(service, match, bets):
+            calls.append(match)
+            if len(calls) == 2:
+                raise RuntimeError('crash')
+            return settle_bets(service, match, bets)
+
+        with mock.patch.object(SettlementService, 'settle_bets', crash_on_second_chunk):
+            with self.assertRaisesMessage(RuntimeError, 'crash'):
+                SettlementService().finish_match(self.match, 'home', stream=True, chunk_size=2)
+
+        # Первая часть зафиксирована вместе с контрольной точкой
+        checkpoint = SettlementCheckpoint.objects.get(match=self.match)
+        self.assertEqual((checkpoint.winners, checkpoint.completed), (2, False))
+        self.assertEqual(Bet.objects.filter(status='pending').count(), 3)
+
+        success, message = SettlementService().finish_match(self.match, 'home', chunk_size=2)
+
+        self.assertTrue(success)
+        checkpoint.refresh_from_db()
+        self.assertEqual((checkpoint.winners, checkpoint.payout, checkpoint.completed), (5, Decimal('100.00'), True))
+        self.assertEqual((self.balance(self.alice), self.balance(self.bob)), (Decimal('40.00'), Decimal('60.00')))
+        # Одна транзакция на игрока в каждой части: 2 + 2 + 1
+        self.assertEqual(Transaction.objects.filter(transaction_type='win').count(), 5)
+
+    def test_checkpoint_is_committed_with_match_status(self):
+        self.add_bets((self.alice, 'home', '10'))
+
+        with mock.patch.object(SettlementService, 'settle_streaming', side_effect=RuntimeError('crash')):
+            with self.assertRaises(RuntimeError):
+                SettlementService().finish_match(self.match, 'home', stream=True)
+
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.status, 'completed')
+        self.assertTrue(SettlementCheckpoint.objects.filter(match=self.match, completed=False).exists())
+
+        # Повторный вызов (воркер очереди, админка) доводит расчет до конца
+        self.assertTrue(SettlementService().finish_match(self.match, 'home')[0])
+        self.assertEqual(self.balance(self.alice), Decimal('20.00'))
+
+    def test_settles_exactly_the_locked_bets(self):
+        self.add_bets((self.alice, 'home', '10'), (self.bob, 'away', '20'))
+        credit_users = SettlementService._credit_users
+
+        def credit_then_insert(service, bets, field):
+            credits = credit_users(service, bets, field)
+            # Ставка, появившаяся между начислением и сменой статусов
+            self.add_bets((self.bob, 'home', '30'))
+            return credits
+
+        self.match.result = 'home'
+        with mock.patch.object(SettlementService, '_credit_users', credit_then_insert):
+            with transaction.atomic():
+                stats = SettlementService().settle_bets(
+                    self.match, Bet.objects.filter(match=self.match, status='pending')
+                )
+
+        self.assertEqual((stats['winners'], stats['losers'], stats['payout']), (1, 1, Decimal('20.00')))
+        self.assertEqual(self.balance(self.bob), Decimal('0.00'))
+        self.assertEqual(Bet.objects.get(amount=Decimal('30')).status, 'pending')
+
+    def test_streaming_matches_single_transaction_result(self):
+        users = [self.alice, self.bob, create_user('carol', balance='0.00')]
+        other = create_match('m2')
+
+        def settle(match, threshold):
+            Bet.objects.bulk_create([
+                Bet(user=users[i % 3], match=match, outcome='home' if i % 4 else 'away',
+                    amount=Decimal(10 + i), odds=Decimal('1.75'), potential_win=Decimal(10 + i) * Decimal('1.75'))
+                for i in range(11)
+            ])
+            service = SettlementService()
+            with override_settings(BET_SETTINGS=dict(settings.BET_SETTINGS, SETTLEMENT_STREAMING_THRESHOLD=threshold,
+                                                     SETTLEMENT_CHUNK_SIZE=3)):
+                streaming = service.should_stream(match)
+                result = service.finish_match(match, 'home')
+            balances = {user.username: self.balance(user) for user in users}
+            transactions = dict(
+                Transaction.objects.filter(transaction_type='win', user__in=users)
+                .values('user__username').annotate(total=Sum('amount')).values_list('user__username', 'total')
+            )
+            Transaction.objects.filter(transaction_type='win').delete()
+            UserProfile.objects.filter(user__in=users).update(balance=Decimal('0.00'))
+            return streaming, result, balances, transactions
+
+        single = settle(self.match, threshold=1000)
+        streamed = settle(other, threshold=5)
+
+        self.assertEqual((single[0], streamed[0]), (False, True))
+        self.assertEqual(streamed[1:], single[1:])
+        self.assertTrue(SettlementCheckpoint.objects.get(match=other).completed)
+        self.assertFalse(SettlementCheckpoint.objects.filter(match=self.match).exists())
+        self.assertEqual(Bet.objects.filter(match=other, status='pending').count(), 0)
+
+    def test_preview(self):
+        self.add_bets((self.alice, 'home', '10'), (self.alice, 'home', '15'), (self.bob, 'away', '20'))
+
+        with self.assertNumQueries(1):
+            preview = SettlementService().preview(self.match)
+
+        self.assertEqual((preview['pending_count'], preview['total_stake']), (3, Decimal('45.00')))
+        self.assertEqual(preview['outcomes']['home'],
+                         {'count': 2, 'stake': Decimal('25.00'), 'payout': Decimal('50.00')})
+        self.assertEqual(preview['house_pnl'], {
+            'home': Decimal('-5.00'), 'away': Decimal('5.00'), 'cancelled': Decimal('0.00'),
+        })
+
+
+class SettlementQueueTests(TestCase):
+    def setUp(self):
+        self.first = create_match('m1')
+        self.second = create_match('m2')
+        self.queue = SettlementQueue()
+
+    def test_jobs_are_claimed_once(self):
+        self.assertEqual(self.queue.enqueue([self.first, self.second], 'home'), 2)
+        # Матч уже в очереди - второе задание не создается
+        self.assertEqual(self.queue.enqueue([self.first], 'away'), 0)
+
+        first = self.queue.claim('worker-1')
+        second = self.queue.claim('worker-2')
+        self.assertEqual((first.match, first.status, first.worker), (self.first, 'running', 'worker-1'))
+        self.assertEqual(second.match, self.second)
+        self.assertIsNone(self.queue.claim('worker-3'))
+
+        self.queue.run(first)
+        self.assertEqual(SettlementJob.objects.get(pk=first.pk).status, 'done')
+        self.first.refresh_from_db()
+        self.assertEqual((self.first.status, self.first.result), ('completed', 'home'))
+
+    def test_abandoned_job_is_reclaimed_after_lease(self):
+        self.queue.enqueue([self.first], 'home')
+        job = self.queue.claim('dead-worker')
+        self.assertIsNone(self.queue.claim('worker-2'))
+        self.assertEqual(self.queue.enqueue([self.first], 'home'), 0)
+
+        SettlementJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=2))
+
+        reclaimed = self.queue.claim('worker-2')
+        self.assertEqual((reclaimed.pk, reclaimed.worker), (job.pk, 'worker-2'))
+        self.assertIsNone(self.queue.claim('worker-3'))
+        self.assertEqual(self.queue.work('worker-2'), 0)
+        self.assertEqual(self.queue.run(reclaimed).status, 'done')
+
+    def test_expired_lease_does_not_overwrite_result(self):
+        self.queue.enqueue([self.first], 'home')
+        slow = self.queue.claim('worker-1')
+        SettlementJob.objects.filter(pk=slow.pk).update(started_at=timezone.now() - timedelta(hours=2))
+
+        # Воркер перезапущен с тем же именем и забрал задание заново
+        reclaimed = self.queue.claim('worker-1')
+        self.assertEqual(reclaimed.pk, slow.pk)
+        self.assertEqual(self.queue.run(reclaimed).status, 'done')
+
+        # Первый воркер закончил позже: матч уже рассчитан, итог не затирается
+        with mock.patch.object(Match, 'finish_match', side_effect=RuntimeError('timeout')):
+            self.assertEqual(self.queue.run(slow).status, 'done')
+        job = SettlementJob.objects.get(pk=slow.pk)
+        self.assertEqual((job.status, job.message), ('done', reclaimed.message))
+
+    def test_abandoned_job_does_not_block_enqueue(self):
+        self.queue.enqueue([self.first], 'home')
+        job = self.queue.claim('dead-worker')
+        SettlementJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=2))
+
+        self.assertEqual(self.queue.enqueue([self.first], 'away'), 1)
+        self.assertEqual(SettlementJob.objects.get(pk=job.pk).status, 'failed')
+        self.assertEqual(self.queue.work('worker-2'), 1)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.result, 'away')
+
+
+class BetPlacementTests(TestCase):
+    def setUp(self):
+        self.match = create_match()
+        create_odds(self.match)
+        self.user = create_user('player', balance='100.00')
+
+    def test_place_debits_balance_and_records_transaction(self):
+        bet = BetPlacementService().place(self.user, self.match, 'home', '40')
+
+        self.assertEqual(bet.potential_win, Decimal('72.00'))
+        self.assertEqual(UserProfile.objects.get(user=self.user).balance, Decimal('60.00'))
+        self.assertEqual(
+            list(Transaction.objects.filter(user=self.user).values_list('amount', 'transaction_type')),
+            [(Decimal('-40.00'), 'bet')]
+        )
+
+    def test_counters_follow_placement_and_reconcile(self):
+        other = create_match('m2')
+        create_odds(other)
+        platform_counters.reconcile()
+        with self.captureOnCommitCallbacks(execute=True):
+            BetPlacementService().place(self.user, self.match, 'home', '20')
+        with self.captureOnCommitCallbacks(execute=True):
+            BetPlacementService().place(self.user, other, 'away', '20')
+
+        with self.assertNumQueries(1):
+            counters = platform_counters.get()
+        self.assertEqual(counters, {'matches': 2, 'bets': 2, 'bettors': 1})
+
+        Bet.objects.filter(match__api_id='m2').delete()
+        self.assertEqual(platform_counters.reconcile(), {'bets': -1})
+        self.assertEqual(platform_counters.get()['bets'], 1)
+
+    def test_insufficient_funds_leaves_no_rows(self):
+        with self.assertRaisesMessage(BetPlacementError, "Недостаточно средств"):
+            BetPlacementService().place(self.user, self.match, 'home', '150')
+
+        self.assertFalse(Bet.objects.exists())
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+        self.assertEqual(UserProfile.objects.get(user=self.user).balance, Decimal('100.00'))
+
+    def test_rejects_started_match_and_limits(self):
+        Match.objects.filter(pk=self.match.pk).update(status='live')
+        self.match.refresh_from_db()
+        with self.assertRaisesMessage(BetPlacementError, "больше не принимаются"):
+            BetPlacementService().place(self.user, self.match, 'home', '20')
+
+        with self.assertRaisesMessage(BetPlacementError, "Минимальная ставка"):
+            BetPlacementService().place(self.user, self.match, 'home', '5')
+
+
+class BetSlipTests(TestCase):
+    def setUp(self):
+        self.first = create_match('m1')
+        self.second = create_match('m2', home_team='FaZe', away_team='G2')
+        create_odds(self.first, 'ggbet', home='1.50', away='2.50')
+        create_odds(self.first, 'pari', home='1.65', away='2.20')
+        create_odds(self.second, 'ggbet', home='3.00', away='1.30')
+        self.user = create_user('slipper', balance='300.00')
+
+    def test_slip_commits_all_selections_with_best_prices(self):
+        bets = BetPlacementService().place_slip(self.user, [
+            {'match_id': self.first.id, 'outcome': 'home', 'amount': '100'},
+            {'match_id': self.second.id, 'outcome': 'away', 'amount': '50'},
+        ])
+
+        self.assertEqual([bet.odds for bet in bets], [Decimal('1.65'), Decimal('1.30')])
+        self.assertEqual(Bet.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(UserProfile.objects.get(user=self.user).balance, Decimal('150.00'))
+        self.assertEqual(Transaction.objects.filter(user=self.user, transaction_type='bet').count(), 2)
+
+    def test_slip_is_rejected_as_a_whole(self):
+        Match.objects.filter(pk=self.second.pk).update(status='live')
+
+        with self.assertRaises(BetPlacementError):
+            BetPlacementService().place_slip(self.user, [
+                {'match_id': self.first.id, 'outcome': 'home', 'amount': '100'},
+                {'match_id': self.second.id, 'outcome': 'away', 'amount': '50'},
+            ])
+
+        self.assertFalse(Bet.objects.exists())
+        self.assertEqual(UserProfile.objects.get(user=self.user).balance, Decimal('300.00'))
+
+    def test_malformed_selections_are_rejected(self):
+        for selection in (
+            {'match_id': self.first.id, 'outcome': ['home'], 'amount': '100'},
+            {'match_id': self.first.id, 'outcome': {'home': 1}, 'amount': '100'},
+            {'match_id': [self.first.id], 'outcome': 'home', 'amount': '100'},
+            {'match_id': True, 'outcome': 'home', 'amount': '100'},
+            ['home'],
+        ):
+            with self.subTest(selection=selection):
+                with self.assertRaisesMessage(BetPlacementError, "Некорректные данные ставки"):
+                    BetPlacementService().place_slip(self.user, [selection])
+
+        bet = BetPlacementService().place_slip(self.user, [
+            {'match_id': str(self.first.id), 'outcome': 'home', 'amount': '100'},
+        ])[0]
+        self.assertEqual(bet.match_id, self.first.id)
+
+        self.client.force_login(self.user)
+        UserProfile.objects.filter(user=self.user).update(email_confirmed=True)
+        response = self.client.post(
+            reverse('matches:place_bet_slip'),
+            data=json.dumps({'selections': [{'match_id': self.first.id, 'outcome': ['home'], 'amount': '10'}]}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_slip_endpoint(self):
+        self.client.force_login(self.user)
+        # Вход пересохраняет профиль из кеша пользователя, поэтому баланс выставляется после
+        UserProfile.objects.filter(user=self.user).update(email_confirmed=True, balance=Decimal('300.00'))
+
+        response = self.client.post(
+            reverse('matches:place_bet_slip'),
+            data=json.dumps({'selections': [
+                {'match_id': self.first.id, 'outcome': 'away', 'amount': '400'},
+            ]}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Недостаточно средств', response.json()['error'])
+
+
+class BetApiTests(TestCase):
+    def setUp(self):
+        self.match = create_match()
+        create_odds(self.match)
+        self.user = create_user('mobile')
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get(reverse('matches_api:balance'))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_unconfirmed_email_cannot_bet(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        await UserProfile.objects.filter(user=self.user).aupdate(email_confirmed=False, balance=Decimal('500.00'))
+
+        response = await self.async_client.post(
+            reverse('matches_api:place_bet'),
+            data={'match_id': self.match.id, 'outcome': 'away', 'amount': '100'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('error', response.json())
+        self.assertFalse(await Bet.objects.filter(user=self.user).aexists())
+        self.assertEqual(
+            await UserProfile.objects.filter(user=self.user).values_list('balance', flat=True).aget(),
+            Decimal('500.00')
+        )
+
+    async def test_place_bet_and_read_balance(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        await UserProfile.objects.filter(user=self.user).aupdate(email_confirmed=True, balance=Decimal('500.00'))
+
+        response = await self.async_client.post(
+            reverse('matches_api:place_bet'),
+            data={'match_id': self.match.id, 'outcome': 'away', 'amount': '100'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['balance'], '400.00')
+        self.assertEqual(response.json()['bets'][0]['potential_win'], '210.00')
+
+        response = await self.async_client.get(reverse('matches_api:balance'))
+        self.assertEqual(response.json(), {'balance': '400.00'})
+
+        response = await self.async_client.post(
+            reverse('matches_api:place_bet'),
+            data={'match_id': self.match.id, 'outcome': ['home'], 'amount': '100'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class MatchReadApiTests(TestCase):
+    def setUp(self):
+        self.match = create_match()
+        create_odds(self.match, 'ggbet', home='1.50', away='2.50')
+        create_match('m2', home_team='Spirit', status='live')
+
+        # ETag зависит от интервала времени: часы остановлены, чтобы
+        # граница интервала не попала между запросами теста
+        clock = mock.patch('matches.api.time.time', return_value=1_700_000_000.0)
+        self.clock = clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_unchanged_polls_return_304_without_queries(self):
+        url = reverse('matches_api:matches') + '?sport=cs-go&status=upcoming'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('s-maxage=5', response['Cache-Control'])
+        sport = response.json()['sports'][0]
+        self.assertEqual(sport['key'], 'cs-go')
+        self.assertEqual([match['home_team'] for match in sport['matches']], ['NAVI'])
+        self.assertEqual(sport['matches'][0]['best_odds'][0]['price'], '1.50')
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        detail_url = reverse('matches_api:match_detail', args=[self.match.id])
+        detail = self.client.get(detail_url)
+        self.assertEqual(detail.json()['odds'][0]['bookmaker'], 'ggbet')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail['ETag']).status_code, 304)
+
+        # Расчет матча меняет версию доски - прежний ETag больше не подходит
+        with self.captureOnCommitCallbacks(execute=True):
+            SettlementService().finish_match(self.match, 'home')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['sports'], [])
+
+    def test_etag_expires_with_max_age(self):
+        url = reverse('matches_api:matches') + '?status=upcoming'
+        etag = self.client.get(url)['ETag']
+
+        self.clock.return_value += 4
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Матч мог начаться без смены версий - через max-age список читается заново
+        self.clock.return_value += 5
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_versions_change_only_after_commit(self):
+        url = reverse('matches_api:matches')
+        etag = self.client.get(url)['ETag']
+        versions = (get_version(SYNC_VERSION), get_version(BOARD_VERSION))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.match.home_team = 'Spirit'
+            self.match.save()
+            odds = Odds.objects.filter(match=self.match, outcome='home').get()
+            odds.price = Decimal('1.40')
+            odds.save()
+
+            # До фиксации читатели получают прежнюю версию и прежние данные
+            self.assertEqual((get_version(SYNC_VERSION), get_version(BOARD_VERSION)), versions)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.assertEqual(len(callbacks), 2)
+        for callback in callbacks:
+            callback()
+
+        self.assertNotEqual(get_version(SYNC_VERSION), versions[0])
+        self.assertNotEqual(get_version(BOARD_VERSION), versions[1])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_filters_are_validated(self):
+        response = self.client.get(reverse('matches_api:matches'), {'status': 'live'})
+        self.assertEqual(response.json()['sports'][0]['matches'][0]['home_team'], 'Spirit')
+
+        self.assertEqual(self.client.get(reverse('matches_api:matches'), {'status': 'bad'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('matches_api:matches'), {'after': 'bad'}).status_code, 400)
+        self.assertEqual(
+            self.client.get(reverse('matches_api:matches'), {'after': '9999999999999999999.1'}).status_code, 400
+        )
+        self.assertEqual(self.client.get(reverse('matches_api:match_detail', args=[999])).status_code, 404)
+
+
+class ConcurrentBetPlacementTests(TransactionTestCase):
+    """Параллельные ставки не должны списывать больше, чем есть на балансе"""
+
+    def test_no_double_spend(self):
+        match = create_match()
+        create_odds(match)
+        user = create_user('racer', balance='100.00')
+
+        attempts = 10
+        barrier = threading.Barrier(attempts)
+        results = []
+
+        def place():
+            try:
+                barrier.wait()
+                BetPlacementService().place(user, match, 'home', '30')
+                results.append('ok')
+            except BetPlacementError:
+                results.append('rejected')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=place) for _ in range(attempts)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count('ok'), 3)
+        self.assertEqual(results.count('rejected'), attempts - 3)
+        self.assertEqual(Bet.objects.filter(user=user).count(), 3)
+        self.assertEqual(UserProfile.objects.get(user=user).balance, Decimal('10.00'))
+        self.assertEqual(
+            Transaction.objects.filter(user=user, transaction_type='bet').count(), 3
+        )
+
+
+class HotQueryIndexTests(TestCase):
+    """
+    Планы горячих запросов на заполненной БД: каждый должен читать таблицу
+    по индексу. SQLite - EXPLAIN QUERY PLAN без строки 'SCAN <таблица>'
+    (кроме покрывающего индекса); PostgreSQL - EXPLAIN с enable_seqscan = off
+    без 'Seq Scan', чтобы размер тестовых таблиц не влиял на выбор плана.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('indexed')
+        cls.match = create_match('idx-0')
+        for number in range(1, 30):
+            match = create_match(f'idx-{number}', commence_time=timezone.now() + timedelta(hours=number))
+            create_odds(match)
+        create_odds(cls.match)
+        Bet.objects.bulk_create([
+            Bet(user=cls.user, match=cls.match, outcome='home', amount=Decimal('10'),
+                odds=Decimal('1.80'), potential_win=Decimal('18.00'))
+            for _ in range(20)
+        ])
+        Transaction.objects.create(user=cls.user, amount=Decimal('5000'), transaction_type='referral_bonus',
+                                   status='pending')
+
+    def hot_queries(self):
+        now = timezone.now()
+        return {
+            # Доска и API: предстоящие матчи всех видов спорта и одного вида
+            'board upcoming': Match.objects.filter(status='upcoming', commence_time__gte=now)
+            .order_by('commence_time', 'id'),
+            'board sport page': Match.objects.filter(sport=self.match.sport, status='upcoming',
+                                                     commence_time__gte=now).order_by('commence_time', 'id'),
+            # Демон синхронизации: начавшиеся матчи
+            'scheduler started': Match.objects.filter(status='upcoming', commence_time__lte=now),
+            # PushPoller: изменения после отметки
+            'poller odds': Odds.objects.filter(last_update__gt=now).order_by(),
+            'poller matches': Match.objects.filter(updated_at__gt=now).order_by(),
+            # Лучшая цена исхода
+            'best price': Odds.objects.filter(match=self.match, outcome='home').order_by('-price'),
+            # Расчет матча
+            'settlement': Bet.objects.filter(match=self.match, status='pending').order_by('id'),
+            # Страница матча и профиль
+            'bets by outcome': Bet.objects.filter(match=self.match, outcome='home'),
+            'user bets': Bet.objects.filter(user=self.user, status='won'),
+            # Подтверждение email: ожидающие бонусы
+            'pending bonus': Transaction.objects.filter(user=self.user, status='pending',
+                                                        transaction_type='referral_bonus'),
+        }
+
+    def sequential_scans(self, queryset):
+        """Строки плана с полным чтением таблицы"""
+        table = queryset.model._meta.db_table
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            return [line for line in queryset.explain().splitlines() if f'Seq Scan on {table}' in line]
+
+        return [
+            line for line in queryset.explain().splitlines()
+            if f'SCAN {table}' in line and 'INDEX' not in line
+        ]
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(name):
+                self.assertEqual(self.sequential_scans(queryset), [], queryset.explain())
@@ -5,6 +5,10 @@ app_name = 'matches'
 
 urlpatterns = [
     path('', views.matches_list, name='matches_list'),
+    path('upcoming/', views.upcoming_page, name='upcoming_page'),
     path('<int:match_id>/', views.match_detail, name='match_detail'),
     path('<int:match_id>/bet/', views.place_bet, name='place_bet'),
+    path('bet-slip/', views.place_bet_slip, name='place_bet_slip'),
+    path('<int:match_id>/settlement-preview/', views.settlement_preview, name='settlement_preview'),
+    path('<int:match_id>/odds-history/', views.odds_history, name='odds_history'),
 ]
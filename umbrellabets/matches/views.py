@@ -1,11 +1,17 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse, HttpResponseBadRequest
+from django.views.decorators.http import require_POST
 from django.contrib import messages
 from django.utils import timezone
-from decimal import Decimal
-from .models import Match, Sport, Odds, Bet
-from accounts.models import User
-from accounts.models import Transaction
+from django.utils.dateparse import parse_datetime
+from .models import Match
+from .services.board import match_board
+from .services.match_detail import MatchDetail
+from .services.betting import BetPlacementService, BetPlacementError
+from .services.settlement import SettlementService
+from .services.odds_history import OddsHistoryService
 import json
 
 
@@ -13,99 +19,28 @@ def matches_list(request):
     """Список всех матчей"""
     sport_filter = request.GET.get('sport', 'all')
 
-    # Получить live матчи
-    live_matches = Match.objects.filter(
-        status='live'
-    ).select_related('sport').prefetch_related('odds__bookmaker')
-
-    if sport_filter != 'all':
-        live_matches = live_matches.filter(sport__key=sport_filter)
-
-    # Получить предстоящие матчи
-    upcoming_matches = Match.objects.filter(
-        commence_time__gte=timezone.now(),
-        status='upcoming'
-    ).select_related('sport').prefetch_related('odds__bookmaker')
-
-    if sport_filter != 'all':
-        upcoming_matches = upcoming_matches.filter(sport__key=sport_filter)
-
-    sports = Sport.objects.filter(active=True)
-
-    # Группируем предстоящие матчи по спорту
-    matches_by_sport = {}
-    for match in upcoming_matches:
-        sport_key = match.sport.key
-        if sport_key not in matches_by_sport:
-            matches_by_sport[sport_key] = {
-                'sport': match.sport,
-                'matches': []
-            }
-        matches_by_sport[sport_key]['matches'].append(match)
-
-    # Добавить статистику
-    total_matches = Match.objects.count()
-    total_bets = Bet.objects.count()
-    total_users = User.objects.filter(bets__isnull=False).distinct().count()
-    upcoming_count = matches_by_sport.values() if matches_by_sport else 0
-
-    context = {
-        'live_matches': live_matches,
-        'matches_by_sport': matches_by_sport,
-        'sports': sports,
-        'current_sport': sport_filter,
-        'total_matches': total_matches,
-        'total_bets': total_bets,
-        'total_users': total_users,
-        'upcoming_count': sum(
-            len(sport_data['matches']) for sport_data in matches_by_sport.values()) if matches_by_sport else 0
-    }
+    # Доска собирается один раз на версию и отдается из кеша
+    context = dict(match_board.get(sport_filter), current_sport=sport_filter)
     return render(request, 'matches/matches_list.html', context)
 
 
-def match_detail(request, match_id):
-    """Детальная страница матча"""
-    match = get_object_or_404(Match, id=match_id)
-
-    # Получить лучшие коэффициенты для каждого исхода
-    home_odds = match.odds.filter(outcome='home').order_by('-price').first()
-    away_odds = match.odds.filter(outcome='away').order_by('-price').first()
-
-    # Подготовить коэффициенты для JavaScript (без локализации)
-    odds_data = {}
-    for odds in match.odds.all():
-        odds_data[odds.id] = float(odds.price)
+def upcoming_page(request):
+    """Следующая страница предстоящих матчей вида спорта (HTML-фрагмент для догрузки)"""
+    sport_key = request.GET.get('sport')
+    if not sport_key:
+        return HttpResponseBadRequest('sport')
 
-    odds_json = json.dumps(odds_data)
+    try:
+        page = match_board.page(sport_key, after=request.GET.get('after'))
+    except ValueError:
+        return HttpResponseBadRequest('after')
 
-    # Получить лучшие коэффициенты для каждого исхода
-    home_odds = match.odds.filter(outcome='home').order_by('-price').first()
-    away_odds = match.odds.filter(outcome='away').order_by('-price').first()
+    return render(request, 'matches/_upcoming_cards.html', dict(page, sport_key=sport_key))
 
-    # Статистика ставок на этот матч
-    total_bets = match.bets.count()
-    home_bets_count = match.bets.filter(outcome='home').count()
-    away_bets_count = match.bets.filter(outcome='away').count()
 
-    # Проценты ставок
-    home_percentage = (home_bets_count / total_bets * 100) if total_bets > 0 else 50
-    away_percentage = (away_bets_count / total_bets * 100) if total_bets > 0 else 50
-
-    # Проверить, может ли пользователь делать ставки
-    can_bet = match.commence_time > timezone.now() and match.status == 'upcoming'
-
-    context = {
-         'match': match,
-        'home_odds': home_odds,
-        'away_odds': away_odds,
-        'odds_json': odds_json,
-        'total_bets': total_bets,
-        'home_percentage': round(home_percentage, 1),
-        'away_percentage': round(away_percentage, 1),
-        'can_bet': can_bet,
-        'odds': match.odds.select_related('bookmaker').order_by('outcome')
-    }
-    return render(request, 'matches/match_detail.html', context)
+def match_detail(request, match_id):
+    """Детальная страница матча"""
+    return render(request, 'matches/match_detail.html', MatchDetail(match_id).context())
 
 
 @login_required
@@ -114,61 +49,119 @@ def place_bet(request, match_id):
     if request.method == 'POST':
         match = get_object_or_404(Match, id=match_id)
 
-        # Проверяем, что матч еще не начался
-        if match.commence_time <= timezone.now() or match.status != 'upcoming':
-            messages.error(request, "Ставки на этот матч больше не принимаются")
+        try:
+            bet = BetPlacementService().place(
+                request.user,
+                match,
+                request.POST.get('outcome'),
+                request.POST.get('amount')
+            )
+        except BetPlacementError as e:
+            messages.error(request, str(e))
             return redirect('matches:match_detail', match_id=match_id)
 
-        outcome = request.POST.get('outcome')
-        amount = request.POST.get('amount')
+        messages.success(request, f"✅ Ставка размещена! Возможный выигрыш: {bet.potential_win} 🪙")
+        return redirect('accounts:profile')
 
-        try:
-            amount = Decimal(amount)
-
-            # Минимальная ставка
-            if amount < 10:
-                messages.error(request, "Минимальная ставка: 10 🪙")
-                return redirect('matches:match_detail', match_id=match_id)
-
-            # Проверяем баланс
-            if request.user.profile.balance < amount:
-                messages.error(request, "Недостаточно средств на счете")
-                return redirect('matches:match_detail', match_id=match_id)
-
-            # Найти актуальный коэффициент
-            odds_obj = match.odds.filter(outcome=outcome).first()
-            if not odds_obj:
-                messages.error(request, "Коэффициент не найден")
-                return redirect('matches:match_detail', match_id=match_id)
-
-            # Создаем ставку
-            bet = Bet.objects.create(
-                user=request.user,
-                match=match,
-                outcome=outcome,
-                amount=amount,
-                odds=odds_obj.price,
-                potential_win=amount * odds_obj.price
-            )
+    return redirect('matches:match_detail', match_id=match_id)
 
-            # Списываем средства с баланса
-            request.user.profile.balance -= amount
-            request.user.profile.save()
-
-            # Создаем транзакцию
-            from accounts.models import Transaction
-            Transaction.objects.create(
-                user=request.user,
-                amount=-amount,  # Отрицательная сумма для списания
-                transaction_type='bet',
-                status='completed',
-                comment=f'Ставка на матч {match.home_team} vs {match.away_team}'
-            )
 
-            messages.success(request, f"✅ Ставка размещена! Возможный выигрыш: {bet.potential_win} 🪙")
-            return redirect('accounts:profile')
+@login_required
+@require_POST
+def place_bet_slip(request):
+    """
+    Размещение купона из нескольких ставок (JSON).
+    Тело запроса: {"selections": [{"match_id": 1, "outcome": "home", "amount": "100"}, ...]}
+    """
+    try:
+        selections = json.loads(request.body).get('selections')
+    except (ValueError, AttributeError):
+        selections = None
+
+    if not isinstance(selections, list):
+        return JsonResponse({'error': "Некорректные данные ставки"}, status=400)
+
+    try:
+        bets = BetPlacementService().place_slip(request.user, selections)
+    except BetPlacementError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'bets': [
+            {
+                'id': bet.id,
+                'match_id': bet.match_id,
+                'outcome': bet.outcome,
+                'amount': str(bet.amount),
+                'odds': str(bet.odds),
+                'potential_win': str(bet.potential_win),
+            }
+            for bet in bets
+        ],
+        'total_amount': str(sum(bet.amount for bet in bets)),
+    }, status=201)
 
-        except (ValueError, TypeError):
-            messages.error(request, "Некорректные данные ставки")
 
-    return redirect('matches:match_detail', match_id=match_id)
+@staff_member_required
+def settlement_preview(request, match_id):
+    """Предпросмотр расчета матча для риск-менеджмента (JSON)"""
+    match = get_object_or_404(Match, id=match_id)
+    preview = SettlementService().preview(match)
+
+    return JsonResponse({
+        'match_id': match.id,
+        'status': match.status,
+        'result': match.result,
+        'pending_count': preview['pending_count'],
+        'total_stake': str(preview['total_stake']),
+        'outcomes': {
+            outcome: {
+                'count': data['count'],
+                'stake': str(data['stake']),
+                'payout': str(data['payout']),
+            }
+            for outcome, data in preview['outcomes'].items()
+        },
+        'house_pnl': {
+            result: str(pnl) for result, pnl in preview['house_pnl'].items()
+        },
+    })
+
+
+@staff_member_required
+def odds_history(request, match_id):
+    """
+    Ряд коэффициентов матча для риск-аналитиков (JSON).
+    Параметры: resolution=tick|minute, from/to - время в ISO 8601
+    """
+    resolution = request.GET.get('resolution', 'tick')
+    if resolution not in ('tick', 'minute'):
+        return JsonResponse({'error': 'resolution: tick или minute'}, status=400)
+
+    bounds = {}
+    for param, name in (('from', 'start'), ('to', 'end')):
+        if request.GET.get(param):
+            # parse_datetime возвращает None для неверного формата и бросает
+            # ValueError для верного формата с несуществующей датой
+            try:
+                value = parse_datetime(request.GET[param])
+            except ValueError:
+                value = None
+            if value is None:
+                return JsonResponse({'error': f'Некорректное время: {param}'}, status=400)
+            # Время без смещения считаем временем сервера (TIME_ZONE)
+            if timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            bounds[name] = value
+
+    series = OddsHistoryService().price_series(match_id, resolution=resolution, **bounds)
+
+    return JsonResponse({
+        'match_id': match_id,
+        'resolution': resolution,
+        'series': [
+            {key: str(value) if key in ('price', 'open', 'high', 'low', 'close') else value
+             for key, value in point.items()}
+            for point in series
+        ],
+    })
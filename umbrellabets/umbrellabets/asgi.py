@@ -13,4 +13,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'umbrellabets.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Импорт после инициализации Django: модуль использует модели
+from matches.push import stream  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Канал обновлений /stream/ обслуживается в обход Django, остальное - Django"""
+    if scope['type'] == 'http' and scope['path'] == '/stream/':
+        return await stream(scope, receive, send)
+    return await django_application(scope, receive, send)
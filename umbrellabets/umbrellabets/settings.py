@@ -105,6 +105,18 @@ DATABASES = {
 }
 
 
+# Cache
+# Общий кеш процессов: версии данных (синхронизация, расчет) и кеши витрин.
+# Для нескольких серверов укажите CACHE_URL=rediscache://...
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default=f"filecache://{os.path.join(BASE_DIR, 'cache')}"),
+    # Доска матчей главной страницы (matches.services.board): locmemcache://,
+    # filecache:///путь или rediscache://host:6379/1. По умолчанию - память процесса
+    'board': env.cache('BOARD_CACHE_URL', default='locmemcache://board'),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -173,12 +185,33 @@ EMAIL_USE_TLS = False  # Используйте либо SSL, либо TLS
 DEFAULT_CHARSET = 'utf-8'
 
 PANDASCORE_API_KEY = config('PANDASCORE_API_KEY')
+PANDASCORE_BASE_URL = config('PANDASCORE_BASE_URL', default='https://api.pandascore.co')
+PANDASCORE_SYNC_CONCURRENCY = config('PANDASCORE_SYNC_CONCURRENCY', default=8, cast=int)  # одновременных запросов
+
+ODDS_API_KEY = config('ODDS_API_KEY', default='')
+ODDS_API_BASE_URL = config('ODDS_API_BASE_URL', default='https://api.the-odds-api.com/v4')
+ODDS_API_SYNC_CONCURRENCY = config('ODDS_API_SYNC_CONCURRENCY', default=4, cast=int)  # одновременных запросов
 
 # Настройки для ставок
 BET_SETTINGS = {
     'MIN_BET_AMOUNT': 10.00,
     'MAX_BET_AMOUNT': 100000.00,
-    'DEFAULT_ODDS_UPDATE_INTERVAL': 5,  # секунды
+    'MAX_SLIP_SELECTIONS': 20,  # ставок в одном купоне
+    'DEFAULT_ODDS_UPDATE_INTERVAL': 5,  # секунды, матчи в прямом эфире
+    'SOON_ODDS_UPDATE_INTERVAL': 60,  # секунды, матчи, начинающиеся в течение часа
+    'FAR_ODDS_UPDATE_INTERVAL': 1800,  # секунды, остальные предстоящие матчи
+    'IDLE_ODDS_UPDATE_INTERVAL': 60,  # секунды, проверка уровня, в котором нет матчей
+    'SETTLEMENT_CHUNK_SIZE': 5000,  # ставок в одной транзакции потокового расчета
+    'SETTLEMENT_STREAMING_THRESHOLD': 50000,  # с какого числа ставок расчет потоковый
+    'SETTLEMENT_JOB_TIMEOUT': 3600,  # секунды, после которых задание упавшего воркера забирает другой
+    'ODDS_HISTORY_RAW_DAYS': 7,  # сколько дней хранится каждое изменение коэффициента
+    'BOARD_CACHE_TIMEOUT': 60,  # секунды, наибольшее отставание счетчиков на доске матчей
+    'BOARD_PAGE_SIZE': 24,  # предстоящих матчей вида спорта на странице доски
+    'PUSH_TICK': 1.0,  # секунды, обновления матча за тик уходят клиенту одним сообщением
+    'PUSH_HEARTBEAT': 15.0,  # секунды, пинг простаивающих соединений /stream/
+    'PUSH_OVERLAP': 30.0,  # секунды, PushPoller перечитывает изменения транзакций, зафиксированных с опозданием
+    'API_PAGE_SIZE': 100,  # матчей на странице /api/matches/
+    'API_CACHE_MAX_AGE': 5,  # секунды, срок хранения ответов /api/matches/ в общих кешах
 }
 
 # Настройки Jazzmin админки
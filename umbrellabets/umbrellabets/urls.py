@@ -21,6 +21,7 @@ from django.conf.urls.static import static
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('accounts.urls')),
+    path('api/', include('matches.api_urls')),  # JSON API (async, ASGI)
     path('', include('matches.urls')),  # Главная страница - список матчей
 ]
 